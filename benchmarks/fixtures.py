@@ -0,0 +1,98 @@
+import datetime
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+# Option chain snapshot captured from Polygon (flat list of contracts)
+OPTION_CHAIN_FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test.json')
+
+# Date the fixture chain was captured; expiries are shifted so the chain looks as fresh relative to today
+FIXTURE_DATE = datetime.date(2025, 4, 1)
+
+
+def load_fixture_contracts(path=OPTION_CHAIN_FIXTURE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def synthetic_candles(n, start_price=100.0, daily_vol=0.02, step_ms=86_400_000, seed=0):
+    """Random-walk OHLCV candles in the tos_get_price_hist format."""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, daily_vol, n)))
+    open_ = close * np.exp(rng.normal(0, daily_vol / 4, n))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, daily_vol / 2, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, daily_vol / 2, n)))
+    volume = rng.integers(1_000, 1_000_000, n)
+    start = int(datetime.datetime(2020, 1, 1).timestamp() * 1000)
+    return [
+        {"open": o, "high": h, "low": l, "close": c, "volume": int(v), "datetime": start + i * step_ms}
+        for i, (o, h, l, c, v) in enumerate(zip(open_, high, low, close, volume))
+    ]
+
+
+def synthetic_price_df(n, **kwargs):
+    return pd.DataFrame(synthetic_candles(n, **kwargs))
+
+
+def fixture_snapshots(contracts=None, scale=1, today=None, underlying_price=190.0):
+    """Polygon-style option snapshot objects built from the fixture.
+
+    scale > 1 repeats the chain with strikes shifted by the fixture's strike range to mimic larger (SPY-sized) chains.
+    """
+    contracts = contracts if contracts is not None else load_fixture_contracts()
+    shift = (today or datetime.date.today()) - FIXTURE_DATE
+    strike_span = max(c['strike_price'] for c in contracts)
+    snapshots = []
+    for copy in range(scale):
+        for c in contracts:
+            expiry = (datetime.date.fromisoformat(c['expiration_date']) + shift).isoformat()
+            strike = c['strike_price'] + copy * strike_span
+            snapshots.append(SimpleNamespace(
+                details=SimpleNamespace(contract_type=c['contract_type'], strike_price=strike, expiration_date=expiry),
+                greeks=SimpleNamespace(delta=c['delta'], gamma=None, theta=None, vega=None),
+                implied_volatility=None,
+                last_quote=SimpleNamespace(bid=c['bid'], ask=c['ask']),
+                last_trade=SimpleNamespace(price=c['last_trade_price']) if c['last_trade_price'] is not None else None,
+                open_interest=c['open_interest'],
+                day=SimpleNamespace(volume=c['volume']),
+                underlying_asset=SimpleNamespace(price=underlying_price),
+            ))
+    return snapshots
+
+
+class FixtureClient:
+    """Offline stand-in for polygon.RESTClient serving the fixture chain and synthetic candles."""
+
+    def __init__(self, api_key=None, chain_scale=1, underlying_price=190.0):
+        self.underlying_price = underlying_price
+        self.snapshots = fixture_snapshots(scale=chain_scale, underlying_price=underlying_price)
+
+    def list_snapshot_options_chain(self, ticker, params=None):
+        contract_type = (params or {}).get('contract_type')
+        return iter([s for s in self.snapshots if contract_type is None or s.details.contract_type == contract_type])
+
+    def get_aggs(self, ticker, multiplier, timespan, from_, to, limit=50000):
+        start = datetime.datetime.strptime(str(from_)[:10], '%Y-%m-%d')
+        end = datetime.datetime.strptime(str(to)[:10], '%Y-%m-%d')
+        step_ms = (60_000 if timespan == 'minute' else 86_400_000) * multiplier
+        n = min(limit, max(1, int((end - start).total_seconds() * 1000 // step_ms)))
+        seed = sum(map(ord, ticker))
+        return [
+            SimpleNamespace(timestamp=c['datetime'], **{k: c[k] for k in ('open', 'high', 'low', 'close', 'volume')})
+            for c in synthetic_candles(n, start_price=self.underlying_price, step_ms=step_ms, seed=seed)
+        ]
+
+    def get_last_trade(self, ticker):
+        return SimpleNamespace(price=self.underlying_price)
+
+    def get_last_quote(self, ticker):
+        return SimpleNamespace(bid_price=self.underlying_price - 0.05, ask_price=self.underlying_price + 0.05)
+
+    def list_tickers(self, search, limit=100):
+        return [SimpleNamespace(ticker=search.upper(), name=f'{search.upper()} Fixture Corp')]
+
+    def get_ticker_details(self, ticker):
+        return SimpleNamespace(ticker=ticker, name=f'{ticker} Fixture Corp', market_cap=0, share_class_shares_outstanding=0)
@@ -0,0 +1,570 @@
+"""Concurrent-session load test: simulated browser sessions drive the real Dash callback endpoints over HTTP.
+
+The app is started in a server subprocess with the fixture provider (benchmarks.fixtures.FixtureClient, plus a
+simulated network round trip per provider call) in place of Polygon. Each session replays what the Dash renderer does
+for a user: it loads the page (layout, dependencies and the initial callbacks), then per iteration submits a ticker,
+clicks through the chart tabs and pages/sorts the tables. Every action posts the triggered callbacks to
+/_dash-update-component and follows the chain of callbacks their outputs trigger, firing the ready ones in parallel
+(at most BROWSER_CONNECTIONS at a time, like a browser) and holding back callbacks that wait on a pending output.
+
+Reports throughput, callback and action latency percentiles, errors, payload bytes and server memory per session for
+each concurrency level, so worker counts can be sized and scaling regressions caught.
+
+Usage (from the repository root):
+    python -m benchmarks.loadtest                                  # 1, 4 and 16 concurrent sessions
+    python -m benchmarks.loadtest --sessions 8 --iterations 5 --think 1.0
+    python -m benchmarks.loadtest --workers 4                      # gunicorn with 4 workers instead of one threaded server
+    python -m benchmarks.loadtest --url http://127.0.0.1:8050      # an already running server (its own provider)
+    python -m benchmarks.loadtest --save loadtest.json / --compare loadtest.json
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+# Seconds added to every provider call, standing in for the Polygon round trip
+PROVIDER_LATENCY = 0.05
+
+# Concurrent requests per session; browsers open at most six HTTP/1.1 connections per host
+BROWSER_CONNECTIONS = 6
+
+# Tickers the sessions submit, round-robin; sessions sharing a ticker share the server's cache entries
+TICKERS = ['AAPL', 'MSFT', 'SPY', 'QQQ']
+
+# Tab groups clicked through after every submit, and the tables paged and sorted
+CHART_TABS = ['tabs_price_chart', 'tabs_vol_chart', 'tabs_prob_chart', 'tabs_prob_surface']
+PAGED_TABLES = ['option-chain-table', 'ticker-data-table', 'strategy-table']
+
+# Seconds to wait for the server subprocess to answer
+SERVER_START_TIMEOUT = 120
+
+
+class LatentClient:
+    """Wraps a provider client so every method call first sleeps for latency seconds."""
+
+    def __init__(self, client, latency):
+        self._client = client
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self._latency)
+            return attr(*args, **kwargs)
+        return call
+
+
+def fixture_server(latency=None):
+    """WSGI app of the dashboard served from the fixture provider (gunicorn: 'benchmarks.loadtest:fixture_server()')."""
+    import lib.tos_api_calls as tos_api_calls
+    from benchmarks.fixtures import FixtureClient
+    from dashboard import create_app
+
+    latency = float(os.environ.get('LOADTEST_LATENCY', PROVIDER_LATENCY)) if latency is None else latency
+    client = LatentClient(FixtureClient(), latency)
+    tos_api_calls.RESTClient = lambda api_key=None: client
+    return create_app('loadtest').server
+
+
+def _serve(port, latency):
+    # Server subprocess body: the Flask app on one threaded WSGI server, like `python dashboard.py` without debug
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    make_server('127.0.0.1', port, fixture_server(latency), threaded=True).serve_forever()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, latency, cache):
+    """Start the fixture server subprocess; returns (process, base_url). workers=0 serves from one threaded process."""
+    port = _free_port()
+    env = dict(os.environ, LOADTEST_LATENCY=str(latency))
+    # A private cache file per run: sessions share entries with each other but not with earlier runs
+    env['DASHBOARD_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'shared_cache.db')
+    if not cache:
+        env['DASHBOARD_CACHE'] = '0'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if workers:
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+               'benchmarks.loadtest:fixture_server()']
+    else:
+        cmd = [sys.executable, '-m', 'benchmarks.loadtest', '--serve', str(port), '--latency', str(latency)]
+    process = subprocess.Popen(cmd, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}: {' '.join(cmd)}")
+        try:
+            _Http(base_url).get('/_dash-layout')
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server didn't answer within {SERVER_START_TIMEOUT}s")
+
+
+def server_rss(pid):
+    """Resident memory in bytes of pid and its child processes (gunicorn workers), or None where /proc is missing."""
+    if pid is None or not os.path.isdir('/proc'):
+        return None
+    total = 0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            if int(entry) != pid and ppid != pid:
+                continue
+            with open(f'/proc/{entry}/status') as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration, ValueError, IndexError):
+            continue
+    return total
+
+
+class _Http:
+    # One keep-alive connection per thread to the server
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=600)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def get(self, path):
+        status, data = self.request('GET', path)
+        if status != 200:
+            raise OSError(f"GET {path} returned {status}")
+        return data
+
+
+def _js_float(text):
+    # JavaScript has one number type: the renderer sends 28.0 back as 28, which callbacks then see as an int
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _loads(data):
+    return json.loads(data, parse_float=_js_float)
+
+
+def _walk(node):
+    if isinstance(node, list):
+        for child in node:
+            yield from _walk(child)
+    elif isinstance(node, dict) and 'props' in node:
+        yield node
+        yield from _walk(node['props'].get('children'))
+
+
+def _split_outputs(output):
+    # Dash callback ids: 'id.prop' or '..id1.prop1...id2.prop2..' for multi-output callbacks
+    if output.startswith('..'):
+        return [part.rsplit('.', 1) for part in output[2:-2].split('...')], True
+    return [output.rsplit('.', 1)], False
+
+
+class CallbackGraph:
+    """The app's server-side callbacks (from /_dash-dependencies) and which props each one waits on."""
+
+    def __init__(self, dependencies):
+        self.callbacks = []
+        for dep in dependencies:
+            if dep.get('clientside_function'):
+                continue
+            outputs, multi = _split_outputs(dep['output'])
+            self.callbacks.append({
+                'output': dep['output'],
+                'outputs': outputs,
+                'multi': multi,
+                # Readable name: the first output, without the allow_duplicate suffix
+                'name': '.'.join(outputs[0]).split('@')[0],
+                'inputs': [(item['id'], item['property']) for item in dep['inputs']],
+                'state': [(item['id'], item['property']) for item in dep['state']],
+                'initial': not dep.get('prevent_initial_call'),
+            })
+        # Props each callback can change, directly or through the callbacks its outputs trigger
+        self.downstream = [self._downstream(i) for i in range(len(self.callbacks))]
+
+    def _props_out(self, i):
+        return {(component, prop.split('@')[0]) for component, prop in self.callbacks[i]['outputs']}
+
+    def _downstream(self, i):
+        props, frontier = set(), [i]
+        while frontier:
+            new = self._props_out(frontier.pop()) - props
+            props |= new
+            frontier.extend(j for j, cb in enumerate(self.callbacks) if new.intersection(cb['inputs']))
+        return props
+
+    def triggered_by(self, props):
+        return [i for i, cb in enumerate(self.callbacks) if props.intersection(cb['inputs'])]
+
+    def blocked(self, i, busy):
+        # Like the renderer: a callback waits while a pending or running callback may still change one of its inputs
+        inputs = set(self.callbacks[i]['inputs'])
+        return any(inputs & self.downstream[j] for j in busy if j != i)
+
+
+class Session:
+    """One simulated browser tab: the props it holds and the callbacks it fires."""
+
+    def __init__(self, http, graph, layout, stats):
+        self.http = http
+        self.graph = graph
+        self.stats = stats
+        self.props = {}
+        self.tabs = {}
+        self.columns = {}
+        self._read_layout(layout)
+        self.pool = ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS)
+
+    def _read_layout(self, layout):
+        for node in _walk(layout):
+            component = node['props'].get('id')
+            if not isinstance(component, str):
+                continue
+            for prop, value in node['props'].items():
+                if prop != 'children':
+                    self.props[(component, prop)] = value
+            if node['type'] == 'Tabs':
+                self.tabs[component] = [child['props'].get('value') for child in _walk(node['props'].get('children')) if child['type'] == 'Tab']
+            if node['type'] == 'DataTable':
+                self.columns[component] = [column['id'] for column in node['props'].get('columns') or []]
+
+    def _payload(self, i, changed):
+        cb = self.graph.callbacks[i]
+        outputs = [{'id': component, 'property': prop} for component, prop in cb['outputs']]
+        return json.dumps({
+            'output': cb['output'],
+            'outputs': outputs if cb['multi'] else outputs[0],
+            'inputs': [{'id': c, 'property': p, 'value': self.props.get((c, p))} for c, p in cb['inputs']],
+            'state': [{'id': c, 'property': p, 'value': self.props.get((c, p))} for c, p in cb['state']],
+            'changedPropIds': [f'{c}.{p}' for c, p in changed],
+        }).encode()
+
+    def _post(self, name, body):
+        start = time.perf_counter()
+        try:
+            status, data = self.http.request('POST', '/_dash-update-component', body)
+        except OSError as e:
+            status, data = None, str(e).encode()
+        self.stats.record_request(name, time.perf_counter() - start, status, len(body), len(data), data)
+        return status, data
+
+    def _apply(self, status, data):
+        # Store the outputs of a finished callback; returns the props that changed
+        if status != 200:
+            return set()
+        changed = set()
+        for component, props in _loads(data).get('response', {}).items():
+            for prop, value in props.items():
+                prop = prop.split('@')[0]
+                # Patch updates would need the renderer's patch logic; they still count as changes downstream
+                if not (isinstance(value, dict) and '__dash_patch_update' in value):
+                    self.props[(component, prop)] = value
+                changed.add((component, prop))
+        return changed
+
+    def _run(self, pending):
+        # pending: callback index -> props that triggered it
+        running = {}
+        while pending or running:
+            busy = set(pending) | set(running.values())
+            for i in list(pending):
+                if i not in running.values() and not self.graph.blocked(i, busy):
+                    changed = pending.pop(i)
+                    running[self.pool.submit(self._post, self.graph.callbacks[i]['name'], self._payload(i, changed))] = i
+            if not running:
+                # Circular waits: fire everything left, as the renderer eventually does
+                for i, changed in list(pending.items()):
+                    del pending[i]
+                    running[self.pool.submit(self._post, self.graph.callbacks[i]['name'], self._payload(i, changed))] = i
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                running.pop(future)
+                changed = self._apply(*future.result())
+                for j in self.graph.triggered_by(changed):
+                    pending.setdefault(j, set()).update(changed & set(self.graph.callbacks[j]['inputs']))
+
+    def action(self, name, updates=None):
+        """Set props like a user interaction would and run every callback it triggers; returns the wall time."""
+        start = time.perf_counter()
+        if updates is None:
+            pending = {i: set() for i, cb in enumerate(self.graph.callbacks) if cb['initial']}
+        else:
+            self.props.update(updates)
+            changed = set(updates)
+            pending = {i: changed & set(self.graph.callbacks[i]['inputs']) for i in self.graph.triggered_by(changed)}
+        self._run(pending)
+        elapsed = time.perf_counter() - start
+        self.stats.record_action(name, elapsed)
+        return elapsed
+
+    def load(self):
+        # The page's HTML and the renderer's bootstrap requests, then the initial callbacks. Each page load serves its
+        # own layout (with a new session id), which the session keeps like a browser tab would
+        self.http.get('/')
+        self._read_layout(_loads(self.http.get('/_dash-layout')))
+        self.http.get('/_dash-dependencies')
+        self.action('page_load')
+
+    def iteration(self, ticker, think=0.0):
+        clicks = self.props.get(('submit-button-state', 'n_clicks')) or 0
+        self.action('submit', {('memory-ticker', 'value'): ticker, ('submit-button-state', 'n_clicks'): clicks + 1})
+        time.sleep(think)
+        for tabs in CHART_TABS:
+            values = self.tabs.get(tabs) or []
+            # Every other tab, then back to the first one
+            for value in values[1:] + values[:1]:
+                self.action('tab', {(tabs, 'value'): value})
+                time.sleep(think)
+        for table in PAGED_TABLES:
+            column = (self.columns.get(table) or [None, None])[1]
+            for key, value in (('page_current', 1), ('sort_by', [{'column_id': column, 'direction': 'desc'}]), ('page_current', 0)):
+                self.action('table', {(table, key): value})
+                time.sleep(think)
+
+    def state_bytes(self):
+        return len(json.dumps([value for value in self.props.values()], default=str))
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class Stats:
+    """Latencies, errors and payload bytes recorded by every session of one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.actions = {}
+        self.errors = []
+        self.bytes_up = 0
+        self.bytes_down = 0
+
+    def record_request(self, name, seconds, status, bytes_up, bytes_down, data):
+        with self._lock:
+            self.requests.setdefault(name, []).append(seconds)
+            self.bytes_up += bytes_up
+            self.bytes_down += bytes_down
+            # 204 is a PreventUpdate
+            if status not in (200, 204):
+                self.errors.append(f"{name}: {status} {data[:200].decode(errors='replace')}")
+
+    def record_action(self, name, seconds):
+        with self._lock:
+            self.actions.setdefault(name, []).append(seconds)
+
+
+def _percentiles(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {'count': len(ordered), 'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': ordered[-1], 'mean': statistics.fmean(ordered)}
+
+
+def run_level(base_url, sessions, iterations, think, tickers, pid=None):
+    """Run sessions concurrent sessions for iterations each; returns the summary of the run."""
+    http = _Http(base_url)
+    graph = CallbackGraph(_loads(http.get('/_dash-dependencies')))
+    layout = _loads(http.get('/_dash-layout'))
+    stats = Stats()
+    rss_start = server_rss(pid)
+    rss_peak = [rss_start or 0]
+    state_bytes = []
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.5):
+            rss_peak[0] = max(rss_peak[0], server_rss(pid) or 0)
+
+    def run_session(index):
+        session = Session(http, graph, layout, stats)
+        try:
+            session.load()
+            for iteration in range(iterations):
+                session.iteration(tickers[(index + iteration) % len(tickers)], think)
+            state_bytes.append(session.state_bytes())
+        finally:
+            session.close()
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_session, args=(index,)) for index in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    rss_end = server_rss(pid)
+    rss_peak[0] = max(rss_peak[0], rss_end or 0)
+
+    all_requests = [seconds for samples in stats.requests.values() for seconds in samples]
+    n_actions = sum(len(samples) for samples in stats.actions.values())
+    return {
+        'sessions': sessions,
+        'iterations': iterations,
+        'wall_seconds': wall,
+        'requests': len(all_requests),
+        'requests_per_second': len(all_requests) / wall,
+        'actions_per_second': n_actions / wall,
+        'errors': len(stats.errors),
+        'error_samples': stats.errors[:5],
+        'request_latency': _percentiles(all_requests),
+        'action_latency': {name: _percentiles(samples) for name, samples in sorted(stats.actions.items())},
+        'callback_latency': {name: _percentiles(samples) for name, samples in sorted(stats.requests.items())},
+        'mb_up_per_session': stats.bytes_up / sessions / 1e6,
+        'mb_down_per_session': stats.bytes_down / sessions / 1e6,
+        'client_state_kb_per_session': statistics.fmean(state_bytes) / 1e3 if state_bytes else None,
+        'server_rss_mb': None if rss_start is None else {'start': rss_start / 1e6, 'peak': rss_peak[0] / 1e6, 'end': rss_end / 1e6},
+        'server_mb_per_session': None if rss_start is None else (rss_peak[0] - rss_start) / sessions / 1e6,
+    }
+
+
+def print_level(result, by_callback=False):
+    ms = lambda seconds: f"{seconds * 1000:8.0f}"
+    lat = result['request_latency']
+    rss = result['server_rss_mb']
+    print(f"\n== {result['sessions']} session(s) x {result['iterations']} iteration(s): {result['wall_seconds']:.1f}s, "
+          f"{result['requests']} requests, {result['requests_per_second']:.1f} req/s, {result['actions_per_second']:.2f} actions/s, "
+          f"{result['errors']} error(s)")
+    if lat['count']:
+        print(f"   callback latency ms   p50 {ms(lat['p50'])}  p90 {ms(lat['p90'])}  p99 {ms(lat['p99'])}  max {ms(lat['max'])}")
+    for name, action in result['action_latency'].items():
+        print(f"   {name:<20}  ms   p50 {ms(action['p50'])}  p90 {ms(action['p90'])}  p99 {ms(action['p99'])}  (n={action['count']})")
+    print(f"   per session: {result['mb_up_per_session']:.1f} MB up, {result['mb_down_per_session']:.1f} MB down, "
+          f"{result['client_state_kb_per_session'] or 0:.0f} KB client state", end='')
+    if rss is not None:
+        print(f", {result['server_mb_per_session']:.1f} MB server RSS (server {rss['start']:.0f} -> peak {rss['peak']:.0f} MB)")
+    else:
+        print()
+    if by_callback:
+        for name, callback in sorted(result['callback_latency'].items(), key=lambda item: -item[1]['p90']):
+            print(f"     {name:<40} ms   p50 {ms(callback['p50'])}  p90 {ms(callback['p90'])}  (n={callback['count']})")
+    for sample in result['error_samples']:
+        print(f"   error: {sample}")
+
+
+def compare(results, baseline, threshold):
+    """Flag levels whose submit p90 grew or whose throughput fell by more than threshold. Returns the regressed levels."""
+    regressions = []
+    print(f"\n{'sessions':>8} {'submit p90 base':>16} {'current':>10} {'req/s base':>12} {'current':>10}")
+    for key, result in results.items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+        p90, base_p90 = result['action_latency']['submit']['p90'], base['action_latency']['submit']['p90']
+        rate, base_rate = result['requests_per_second'], base['requests_per_second']
+        regressed = p90 > base_p90 * threshold or rate * threshold < base_rate or result['errors'] > base['errors']
+        print(f"{result['sessions']:>8} {base_p90 * 1000:14.0f}ms {p90 * 1000:8.0f}ms {base_rate:12.1f} {rate:10.1f}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the dashboard with concurrent simulated sessions")
+    parser.add_argument('--sessions', default='1,4,16', help="Comma-separated concurrency levels, run one after another")
+    parser.add_argument('--iterations', type=int, default=2, help="Submit/tabs/tables rounds per session")
+    parser.add_argument('--think', type=float, default=0.0, help="Seconds a session waits between actions")
+    parser.add_argument('--tickers', default=','.join(TICKERS), help="Tickers the sessions submit, round-robin")
+    parser.add_argument('--latency', type=float, default=PROVIDER_LATENCY, help="Seconds added to every provider call")
+    parser.add_argument('--workers', type=int, default=0, help="Serve with gunicorn and this many workers (0: one threaded server)")
+    parser.add_argument('--no-cache', action='store_true', help="Disable the shared cache in the server")
+    parser.add_argument('--url', help="Load-test an already running server instead of starting the fixture server")
+    parser.add_argument('--by-callback', action='store_true', help="Print latency per callback")
+    parser.add_argument('--save', help="Write results as a baseline JSON file")
+    parser.add_argument('--compare', help="Compare results with a baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=1.3, help="Slowdown ratio reported as a regression")
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        _serve(args.serve, args.latency)
+        return 0
+
+    process, pid = None, None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_server(args.workers, args.latency, cache=not args.no_cache)
+        pid = process.pid
+    tickers = [ticker.strip().upper() for ticker in args.tickers.split(',') if ticker.strip()]
+    results = {}
+    try:
+        # One warm-up session so lazy imports and first-call costs don't land on the first level
+        run_level(base_url, 1, 1, 0.0, tickers, pid)
+        for sessions in [int(level) for level in args.sessions.split(',')]:
+            result = run_level(base_url, sessions, args.iterations, args.think, tickers, pid)
+            results[f'sessions={sessions}'] = result
+            print_level(result, args.by_callback)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {
+                    'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'python': platform.python_version(),
+                    'machine': platform.platform(),
+                    'cpus': os.cpu_count(),
+                    'workers': args.workers,
+                    'latency': args.latency,
+                    'cache': not args.no_cache,
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} level(s) regressed by more than {args.threshold}x")
+            return 1
+    return 1 if any(result['errors'] for result in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
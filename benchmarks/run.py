@@ -0,0 +1,377 @@
+"""Benchmarks for the analytics hot paths. Runs fully offline on synthetic and fixture data.
+
+Usage (from the repository root):
+    python -m benchmarks.run                            # run everything and print timings
+    python -m benchmarks.run --filter hist_volatility   # only cases whose name contains the filter
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json
+"""
+import argparse
+import atexit
+import contextlib
+import ctypes
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import lib.tos_api_calls as tos_api_calls
+from benchmarks.fixtures import FixtureClient, fixture_snapshots, synthetic_candles, synthetic_price_df
+from lib.backtest import backtest, synthetic_chain_history
+from lib.candles import Candles
+from lib.chain_warehouse import OptionChainWarehouse
+from lib.gamma_exposure import gamma_exposure
+from lib.gbm import gbm_sim, geo_brownian_paths, heston_paths, merton_paths
+from lib.option_chain import CONTRACT_KEY, diff_option_chain, flatten_option_chain, oi_profile, oi_summary, score_option_chain, select_contracts
+from lib.stats import INTRADAY_ESTIMATORS, fit_garch_many, get_hist_volatility, get_prob, get_realized_volatility, prob_cone, prob_surface
+from lib.strategies import search_strategies
+
+# Time the provider code itself rather than shared cache hits
+os.environ['DASHBOARD_CACHE'] = '0'
+
+VOL_ESTIMATORS = ['log_returns', 'garman_klass', 'hodges_tompkins', 'parkinson', 'rogers_satchell', 'yang_zhang', 'ewma', 'garch']
+
+# Registered cases: (name, sizes, setup). setup(size) returns a zero-argument callable to time.
+CASES = []
+
+# Fast cases keep running past --repeat until this much time is sampled (or MAX_RUNS runs), so the min of a
+# sub-millisecond case isn't one lucky or unlucky scheduler slice
+MIN_SAMPLE_TIME = 0.2
+MAX_RUNS = 1000
+
+# Slowdowns smaller than this many seconds are timer and scheduler noise, whatever their ratio
+NOISE_FLOOR = 0.001
+
+# Times a case flagged as a regression is re-timed before it is reported
+RETIMES = 2
+
+# glibc mallopt parameters and the values pinned by pin_allocator()
+M_TRIM_THRESHOLD, M_TOP_PAD, M_MMAP_THRESHOLD = -1, -2, -3
+MALLOC_SETTINGS = {M_MMAP_THRESHOLD: 32 << 20, M_TRIM_THRESHOLD: 64 << 20, M_TOP_PAD: 64 << 20}
+
+
+def benchmark(name, sizes):
+    def register(setup):
+        CASES.append((name, sizes, setup))
+        return setup
+    return register
+
+
+@benchmark('geo_brownian_paths', sizes=[10_000, 100_000, 1_000_000])
+def bench_geo_brownian_paths(n_paths):
+    return lambda: geo_brownian_paths(100, 28 / 252, 0.01, 0.007, 0.3, 1, n_paths)
+
+
+@benchmark('geo_brownian_paths_100_steps', sizes=[1_000, 10_000, 100_000])
+def bench_geo_brownian_paths_steps(n_paths):
+    return lambda: geo_brownian_paths(100, 28 / 252, 0.01, 0.007, 0.3, 100, n_paths)
+
+
+@benchmark('merton_paths[terminal]', sizes=[100_000, 1_000_000])
+def bench_merton_paths(n_paths):
+    return lambda: merton_paths(100, 28 / 252, 0.01, 0.007, 0.3, 1, n_paths, seed=0, terminal=True)
+
+
+@benchmark('heston_paths[20_steps]', sizes=[10_000, 100_000, 300_000])
+def bench_heston_paths(n_paths):
+    return lambda: heston_paths(100, 28 / 252, 0.01, 0.007, 0.3, 20, n_paths, seed=0, terminal=True)
+
+
+@benchmark('gbm_sim', sizes=[10_000, 100_000])
+def bench_gbm_sim(n_paths):
+    price_df = synthetic_price_df(252)
+    stock_price = price_df['close'].iloc[-1]
+    return lambda: gbm_sim(price_df, stock_price, 28 / 252, 0.01, 0.007, 0.3, 1, n_paths, bin_size=10)
+
+
+def _register_vol_estimator(estimator):
+    @benchmark(f'get_hist_volatility[{estimator}]', sizes=[252, 2_520, 25_200])
+    def bench_hist_volatility(n_candles):
+        price_df = synthetic_price_df(n_candles)
+        return lambda: get_hist_volatility(price_df, 30, estimator=estimator)
+
+
+for _estimator in VOL_ESTIMATORS:
+    _register_vol_estimator(_estimator)
+
+
+def _register_intraday_estimator(estimator):
+    @benchmark(f'get_realized_volatility[{estimator}]', sizes=[96_000, 960_000])
+    def bench_realized_volatility(n_bars):
+        candles = Candles.from_records(synthetic_candles(n_bars, daily_vol=0.001, step_ms=60_000))
+        return lambda: get_realized_volatility(candles, estimator, window=14)
+
+
+for _estimator in INTRADAY_ESTIMATORS:
+    _register_intraday_estimator(_estimator)
+
+
+@benchmark('fit_garch_many[1000_returns]', sizes=[10, 100, 500])
+def bench_fit_garch_many(n_tickers):
+    # Refitting a watchlist: after the warm-up call every ticker warm-starts from its previous fit
+    watchlist = {f'T{i}': np.diff(np.log(synthetic_price_df(1_001, seed=i)['close'].to_numpy())) for i in range(n_tickers)}
+    return lambda: fit_garch_many(watchlist)
+
+
+@benchmark('get_prob', sizes=[1_000, 10_000])
+def bench_get_prob(n_contracts):
+    strikes = np.linspace(50, 150, n_contracts).tolist()
+    return lambda: [get_prob(100, strike, 0.3, 30) for strike in strikes]
+
+
+@benchmark('prob_cone', sizes=[1_000, 10_000])
+def bench_prob_cone(n_days):
+    return lambda: [prob_cone(100, 0.3, day, 0.7) for day in range(n_days)]
+
+
+@benchmark('prob_surface[30_expiries]', sizes=[100, 500, 2_000])
+def bench_prob_surface(n_strikes):
+    strikes = np.linspace(50, 150, n_strikes)
+    days = np.arange(1, 31) * 7
+    return lambda: prob_surface(100, strikes, days, 0.3, 0.7)
+
+
+@benchmark('build_option_chain', sizes=[1, 4, 16])
+def bench_build_option_chain(scale):
+    snapshots = fixture_snapshots(scale=scale)
+    return lambda: tos_api_calls.build_option_chain(snapshots, 190.0)
+
+
+@benchmark('tos_get_option_chain', sizes=[1, 4])
+def bench_tos_get_option_chain(scale):
+    client = FixtureClient(chain_scale=scale)
+
+    def run():
+        # Serve the fixture in place of the Polygon REST client for the duration of the call
+        rest_client = tos_api_calls.RESTClient
+        tos_api_calls.RESTClient = lambda api_key=None: client
+        try:
+            return tos_api_calls.tos_get_option_chain('FIXT', apiKey='offline')
+        finally:
+            tos_api_calls.RESTClient = rest_client
+    return run
+
+
+@benchmark('tos_get_price_hist[years]', sizes=[1, 5, 20])
+def bench_tos_get_price_hist(years):
+    client = FixtureClient()
+    start = (datetime.date.today() - datetime.timedelta(days=365 * years)).strftime('%Y-%m-%d')
+
+    def run():
+        rest_client = tos_api_calls.RESTClient
+        tos_api_calls.RESTClient = lambda api_key=None: client
+        try:
+            return tos_api_calls.tos_get_price_hist('FIXT', startDate=start, apiKey='offline')
+        finally:
+            tos_api_calls.RESTClient = rest_client
+    return run
+
+
+@benchmark('candles_store_to_frame', sizes=[252, 2_520, 25_200])
+def bench_candles_store_to_frame(n_candles):
+    # The per-callback cost of reading price history back out of the dcc.Store
+    stored = Candles.from_records(synthetic_candles(n_candles)).to_store()
+    return lambda: Candles.from_store(stored).to_frame()
+
+
+@benchmark('score_option_chain', sizes=[1, 4, 16])
+def bench_score_option_chain(scale):
+    option_chain = tos_api_calls.build_option_chain(fixture_snapshots(scale=scale), 190.0)
+    return lambda: score_option_chain(option_chain, 'FIXT', 190.0, 0.3, 10_000, 0.7)
+
+
+
+@benchmark('refresh_option_chain[1%_changed]', sizes=[1, 4, 16])
+def bench_refresh_option_chain(scale):
+    # One auto-refresh cycle after a Submit: flatten the new chain, diff it against the previous one and rescore
+    # only the contracts whose quotes moved (compare with score_option_chain, the full rescore)
+    snapshots = fixture_snapshots(scale=scale)
+    previous_df = flatten_option_chain(tos_api_calls.build_option_chain(snapshots, 190.0))
+    for snapshot in snapshots[::100]:
+        snapshot.last_quote = SimpleNamespace(bid=(snapshot.last_quote.bid or 0) + 0.05, ask=snapshot.last_quote.ask)
+    option_chain = tos_api_calls.build_option_chain(snapshots, 190.0)
+
+    def run():
+        chain_df = flatten_option_chain(option_chain)
+        _, changed = diff_option_chain(previous_df, chain_df)
+        contracts = chain_df.loc[changed, CONTRACT_KEY].itertuples(index=False, name=None)
+        return score_option_chain(select_contracts(option_chain, contracts), 'FIXT', 190.0, 0.3, 10_000, 0.7)
+    return run
+
+
+@benchmark('oi_profile+oi_summary', sizes=[1, 4, 16])
+def bench_oi_profile(scale):
+    chain_df = flatten_option_chain(tos_api_calls.build_option_chain(fixture_snapshots(scale=scale), 190.0))
+    return lambda: oi_summary(oi_profile(chain_df))
+
+
+@benchmark('gamma_exposure', sizes=[1, 4, 16])
+def bench_gamma_exposure(scale):
+    chain_df = flatten_option_chain(tos_api_calls.build_option_chain(fixture_snapshots(scale=scale), 190.0))
+    # The fixture snapshots carry no implied volatility; give every contract a smile around the stock price
+    chain_df['impliedVolatility'] = 0.25 + 0.5 * np.abs(np.log(chain_df['strikePrice'] / 190.0))
+    return lambda: gamma_exposure(chain_df, 190.0)
+
+
+@benchmark('warehouse_query_as_of[100_contracts_hourly]', sizes=[1, 10, 60])
+def bench_warehouse_query_as_of(n_days):
+    # As-of reconstruction against a growing history: 100 contracts snapshotted every hour for n_days. The lookback
+    # bound keeps the cost flat in the history length
+    chain_df = flatten_option_chain(tos_api_calls.build_option_chain(fixture_snapshots(), 190.0)).iloc[::22]
+    directory = tempfile.mkdtemp(prefix='bench_warehouse_')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    warehouse = OptionChainWarehouse(path=os.path.join(directory, 'warehouse.db'))
+    start = 1_700_000_000_000
+    warehouse.ingest_many(('FIXT', chain_df, start + hour * 3_600_000) for hour in range(n_days * 24))
+    as_of = start + n_days * 86_400_000
+    return lambda: warehouse.query_as_of('FIXT', as_of)
+
+
+@benchmark('search_strategies', sizes=[1, 4, 16])
+def bench_search_strategies(scale):
+    chain_df = flatten_option_chain(tos_api_calls.build_option_chain(fixture_snapshots(scale=scale), 190.0))
+    return lambda: search_strategies(chain_df, 190.0, 0.3, 56)
+
+
+
+@benchmark('backtest[1000_candles]', sizes=[16, 256, 2_048])
+def bench_backtest(n_combos):
+    history = synthetic_chain_history(synthetic_price_df(1_000))
+    roi = np.linspace(0, 5, n_combos // 16)
+    return lambda: backtest(history, roi=roi, delta=[0.2, 0.3, 0.4, 1.0], confidence=[0.3, 0.5, 0.7, 0.9])
+
+
+def pin_allocator():
+    """Fix glibc's malloc thresholds for the whole run (no-op on other C libraries).
+
+    glibc raises its mmap threshold as large blocks are freed, so whether a case's mid-sized arrays come from the heap
+    or from fresh, page-faulting mmaps depends on what ran earlier in the process; a few-millisecond case moved by 50%
+    between a full and a --quick run. With fixed thresholds every run allocates the same way.
+    """
+    try:
+        mallopt = ctypes.CDLL(None).mallopt
+    except (OSError, AttributeError):
+        return
+    for param, value in MALLOC_SETTINGS.items():
+        mallopt(param, value)
+
+
+def time_case(func, repeat, budget):
+    """Time func repeat times (stopping early once budget seconds are spent) after one warm-up call. Fast cases run
+    until MIN_SAMPLE_TIME seconds are sampled. Like timeit, garbage left by earlier cases is collected first and the
+    collector is off while timing."""
+    func()
+    gc.collect()
+    samples = []
+    start = time.perf_counter()
+    gc.disable()
+    try:
+        while len(samples) < repeat or (sum(samples) < MIN_SAMPLE_TIME and len(samples) < MAX_RUNS):
+            t0 = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - t0)
+            if time.perf_counter() - start > budget:
+                break
+    finally:
+        gc.enable()
+    return {'min': min(samples), 'median': statistics.median(samples), 'runs': len(samples)}
+
+
+def run_cases(name_filter=None, repeat=5, budget=5.0, quick=False, keys=None):
+    results = {}
+    for name, sizes, setup in CASES:
+        if name_filter and name_filter not in name:
+            continue
+        for size in (sizes[:1] if quick else sizes):
+            key = f'{name}/{size}'
+            if keys is not None and key not in keys:
+                continue
+            # Quiet the provider/print chatter of the functions under test
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                results[key] = time_case(setup(size), repeat, budget)
+            print(f"{key:<55} min {results[key]['min'] * 1000:10.3f} ms   median {results[key]['median'] * 1000:10.3f} ms", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold, noise_floor=NOISE_FLOOR):
+    """Print current/baseline ratios of the min timings. Returns the keys slower than threshold and by more than
+    noise_floor seconds."""
+    regressions = []
+    print(f"\n{'case':<55} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for key, result in results.items():
+        base = baseline['results'].get(key)
+        if base is None:
+            print(f"{key:<55} {'-':>12} {result['min'] * 1000:10.3f}ms {'new':>8}")
+            continue
+        ratio = result['min'] / base['min'] if base['min'] else float('inf')
+        regressed = ratio > threshold and result['min'] - base['min'] > noise_floor
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{key:<55} {base['min'] * 1000:10.3f}ms {result['min'] * 1000:10.3f}ms {ratio:8.2f}{flag}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the options dashboard analytics hot paths")
+    parser.add_argument('--filter', help="Only run cases whose name contains this string")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case")
+    parser.add_argument('--budget', type=float, default=5.0, help="Max seconds spent timing one case")
+    parser.add_argument('--quick', action='store_true', help="Only run the smallest size of each case")
+    parser.add_argument('--save', help="Write results as a baseline JSON file")
+    parser.add_argument('--compare', help="Compare results with a baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=1.3, help="Slowdown ratio reported as a regression")
+    parser.add_argument('--noise-floor', type=float, default=NOISE_FLOOR * 1000,
+                        help="Slowdowns under this many milliseconds are never reported as regressions")
+    args = parser.parse_args(argv)
+
+    pin_allocator()
+    results = run_cases(args.filter, repeat=args.repeat, budget=args.budget, quick=args.quick)
+
+    if args.save:
+        baseline = {
+            'meta': {
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'machine': platform.platform(),
+                'processor': platform.processor() or platform.machine(),
+            },
+            'results': results,
+        }
+        with open(args.save, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.noise_floor / 1000)
+        for _ in range(RETIMES):
+            if not regressions:
+                break
+            # A slowdown that doesn't reproduce was another process (or VM) taking the CPU: time the flagged cases
+            # again and keep the faster run
+            print(f"\nRe-timing {len(regressions)} case(s) slower than {args.threshold}x baseline\n")
+            retimed = run_cases(repeat=args.repeat * 2, budget=args.budget, keys=set(regressions))
+            for key, result in retimed.items():
+                if result['min'] < results[key]['min']:
+                    results[key] = result
+            regressions = compare({key: results[key] for key in regressions}, baseline, args.threshold, args.noise_floor / 1000)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than {args.threshold}x baseline")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Cold-start check for the production app: time a fresh interpreter importing and building the Dash app.
+
+Usage (from the repository root):
+    python -m benchmarks.startup              # fails if the median cold start exceeds the target
+    python -m benchmarks.startup --target 1.0 --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Median seconds from interpreter start to a ready app object (imports + create_app), measured as one process
+STARTUP_TARGET_SECONDS = 1.5
+
+# Modules that must stay out of the startup path; they are imported lazily where they are used
+HEAVY_MODULES = ['matplotlib', 'scipy', 'scipy.stats']
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from dashboard import create_app
+app = create_app('startup-check')
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(runs):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _PROBE], cwd=root, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result['seconds'])
+        loaded.update(result['loaded'])
+    return samples, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure dashboard cold-start time")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument('--target', type=float, default=STARTUP_TARGET_SECONDS, help="Median startup target in seconds")
+    args = parser.parse_args(argv)
+
+    samples, loaded = measure(args.runs)
+    median = statistics.median(samples)
+    print(f"startup median {median:.3f}s  min {min(samples):.3f}s  max {max(samples):.3f}s  (target {args.target:.3f}s)")
+    if loaded:
+        print(f"heavy modules imported at startup: {', '.join(loaded)}")
+    return 0 if median <= args.target and not loaded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
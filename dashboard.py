@@ -2,23 +2,36 @@ import os
 import argparse
 from dash import Dash  # Updated import
 import dash_bootstrap_components as dbc
+from dashboard_app.api import register_api_routes
 from dashboard_app.layout import app_layout
 from dashboard_app.callbacks import register_callbacks
+from lib.export import register_export_routes
+from lib.metrics import register_metrics_route
 
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+def get_api_key():
+    API_KEY = os.environ.get('POLYGON_API_KEY')
+    if not API_KEY:
+        raise ValueError("POLYGON_API_KEY environment variable is not set. Please provide a valid Polygon API key.")
+    return API_KEY
 
-parser = argparse.ArgumentParser(description="TOS Options Dashboard with Polygon API")
-parser.add_argument("--docker", help="Change the default server host to 0.0.0.0 for Docker", action='store_true')
-args = parser.parse_args()
+def create_app(api_key):
+    app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    app.layout = app_layout
+    register_callbacks(app, api_key)
+    register_metrics_route(app.server)
+    register_export_routes(app.server, api_key)
+    register_api_routes(app.server, api_key)
+    return app
 
-API_KEY = os.environ.get('POLYGON_API_KEY')
-if not API_KEY:
-    raise ValueError("POLYGON_API_KEY environment variable is not set. Please provide a valid Polygon API key.")
+def main():
+    parser = argparse.ArgumentParser(description="TOS Options Dashboard with Polygon API")
+    parser.add_argument("--docker", help="Change the default server host to 0.0.0.0 for Docker", action='store_true')
+    parser.add_argument("--debug", help="Run the Dash development server with debug mode and hot reloading", action='store_true')
+    args = parser.parse_args()
 
-app.layout = app_layout
-register_callbacks(app, API_KEY)
+    app = create_app(get_api_key())
+    host = '0.0.0.0' if args.docker else '127.0.0.1'
+    app.run(host=host, debug=args.debug, port=8050)
 
 if __name__ == '__main__':
-    print(API_KEY)
-    host = '0.0.0.0' if args.docker else '127.0.0.1'
-    app.run_server(host=host, debug=True, port=8050)
+    main()
@@ -0,0 +1,197 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from lib.export import CONFIDENCE_LVL, EXPDAY_RANGE, VOL_ESTIMATOR, VOL_WINDOW, VOLATILITY_ESTIMATORS, submit_inputs, scored_chain_frame, volatility_frame
+from lib.gbm import MERTON_PARAMS, SIMULATORS, gbm_sim
+from lib.metrics import add_rows, instrument
+from lib.option_chain import flatten_option_chain, skew_term_structure
+from lib.stats import INTRADAY_ESTIMATORS, forecast_volatility, prob_cone
+from lib.tos_api_calls import tos_get_option_chain
+
+# Rows per page when the request doesn't ask for a page size, and the most a request may ask for
+API_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+
+# Defaults of the dashboard controls (as in lib.export); every endpoint accepts the same names as query parameters
+DEFAULTS = {'expdays': EXPDAY_RANGE, 'confidence': CONFIDENCE_LVL, 'window': VOL_WINDOW, 'estimator': VOL_ESTIMATOR, 'roi': 1.0, 'delta': 1.0}
+
+# Accepted ranges of the scoring inputs (inclusive; confidence is a probability strictly between 0 and 1)
+PARAM_RANGES = {'expdays': (1, 366), 'window': (2, 504), 'confidence': (0.0, 1.0)}
+
+# Estimators a Submit accepts (the estimator dropdown)
+SUBMIT_ESTIMATORS = VOLATILITY_ESTIMATORS + INTRADAY_ESTIMATORS
+
+# Query parameters that aren't column filters
+RESERVED_PARAMS = {'expdays', 'confidence', 'window', 'estimator', 'roi', 'delta', 'screen', 'moneyness', 'estimators', 'model',
+                   'sort', 'page', 'page_size', 'fields'}
+
+
+class ApiError(Exception):
+    """Bad request parameters; reported to the caller as HTTP 400 with the message."""
+
+
+def _param(args, name, cast):
+    try:
+        value = cast(args.get(name, DEFAULTS.get(name)))
+    except (TypeError, ValueError):
+        raise ApiError(f"Invalid value for '{name}': {args.get(name)!r}")
+    if name in PARAM_RANGES:
+        low, high = PARAM_RANGES[name]
+        if not low <= value <= high or (name == 'confidence' and value in (low, high)):
+            raise ApiError(f"'{name}' must be between {low} and {high}, got {value}")
+    return value
+
+def _estimator(args):
+    estimator = args.get('estimator', DEFAULTS['estimator'])
+    if estimator not in SUBMIT_ESTIMATORS:
+        raise ApiError(f"Unknown estimator '{estimator}', expected one of {SUBMIT_ESTIMATORS}")
+    return estimator
+
+def _select(df, args):
+    # Column filters, sorting, pagination and projection shared by every endpoint:
+    #   <col>=a,b      keep rows whose col is one of the values
+    #   min_<col>=x    keep rows with col >= x (max_<col> for <=)
+    #   sort=-a,b      sort by a descending, then b ascending
+    #   page, page_size, fields=a,b
+    mask = np.ones(len(df), dtype=bool)
+    for name, value in args.items():
+        if name in RESERVED_PARAMS:
+            continue
+        bound, column = (name[:3], name[4:]) if name[:4] in ('min_', 'max_') else (None, name)
+        if column not in df.columns:
+            raise ApiError(f"Unknown filter '{name}'")
+        values = df[column]
+        # Dates and numbers are compared as such; everything else as text
+        parse = pd.Timestamp if pd.api.types.is_datetime64_any_dtype(values) else float if pd.api.types.is_numeric_dtype(values) else str
+        try:
+            wanted = [parse(item) for item in value.split(',')]
+        except ValueError:
+            raise ApiError(f"Invalid value for '{name}': {value!r}")
+        if bound is None:
+            mask &= values.isin(wanted).to_numpy()
+        elif bound == 'min':
+            mask &= (values >= wanted[0]).to_numpy()
+        else:
+            mask &= (values <= wanted[0]).to_numpy()
+    df = df.loc[mask]
+
+    sort = [key for key in args.get('sort', '').split(',') if key]
+    if sort:
+        columns = [key.lstrip('-') for key in sort]
+        unknown = [column for column in columns if column not in df.columns]
+        if unknown:
+            raise ApiError(f"Unknown sort column(s) {unknown}")
+        df = df.sort_values(columns, ascending=[not key.startswith('-') for key in sort], kind='stable')
+
+    page = _param(args, 'page', int) if 'page' in args else 0
+    page_size = min(_param(args, 'page_size', int) if 'page_size' in args else API_PAGE_SIZE, MAX_PAGE_SIZE)
+    if page < 0 or page_size < 1:
+        raise ApiError("page must be >= 0 and page_size >= 1")
+    fields = [field for field in args.get('fields', '').split(',') if field]
+    unknown = [field for field in fields if field not in df.columns]
+    if unknown:
+        raise ApiError(f"Unknown field(s) {unknown}")
+    rows = df.iloc[page * page_size:(page + 1) * page_size]
+    return (rows[fields] if fields else rows), {'total': len(df), 'page': page, 'page_size': page_size}
+
+def _columnar(df, **meta):
+    # One JSON array per column, encoded by pandas' C JSON writer (NaN -> null, datetimes as ISO 8601)
+    columns = ','.join(f"{json.dumps(str(column))}:{df[column].to_json(orient='values', date_format='iso')}" for column in df.columns)
+    return '{%s,"columns":{%s}}' % (json.dumps(meta, default=float, separators=(',', ':'))[1:-1], columns)
+
+# Submit's inputs for the request's ticker and volatility parameters: daily candles, est_vol, vol_forecast and the price
+def _inputs(ticker, args, apiKey):
+    price_df, est_vol, forecast, stock_price = submit_inputs(ticker, apiKey, _param(args, 'window', int), _estimator(args))
+    if price_df.empty or stock_price is None:
+        raise LookupError(f"No price history or quote for {ticker}")
+    return price_df, est_vol, forecast, stock_price
+
+def chain_table(ticker, args, apiKey=None):
+    """Scored option chain (SCORED_CHAIN_COLUMNS). screen=1 applies the option chain table's rule: roi_val >= roi,
+    |delta| <= delta and the strike outside the probability cone."""
+    df = scored_chain_frame(ticker, apiKey=apiKey, expday_range=_param(args, 'expdays', int), confidence_lvl=_param(args, 'confidence', float),
+                            window=_param(args, 'window', int), estimator=_estimator(args))
+    if args.get('screen') in ('1', 'true'):
+        df = df.loc[(df['roi_val'] >= _param(args, 'roi', float)) & (df['delta'].abs() <= _param(args, 'delta', float))]
+        df = df.loc[((df['option_type'] == 'CALL') & (df['strike_price'] >= df['upper_bound'])) | ((df['option_type'] == 'PUT') & (df['strike_price'] <= df['lower_bound']))]
+    return df, {}
+
+def skew_table(ticker, args, apiKey=None):
+    """Call/put skew and liquidity per expiry (the ticker table)."""
+    option_chain = tos_get_option_chain(ticker, contractType='ALL', rangeType='ALL', apiKey=apiKey)
+    df = skew_term_structure(flatten_option_chain(option_chain), option_chain.get('underlyingPrice'), moneyness=_param(args, 'moneyness', float) if 'moneyness' in args else 0.1)
+    return df, {'stock_price': option_chain.get('underlyingPrice')}
+
+def vol_table(ticker, args, apiKey=None):
+    """Daily close and rolling volatility per estimator (estimators=a,b to pick; default all daily estimators)."""
+    estimators = [name for name in args.get('estimators', '').split(',') if name] or VOLATILITY_ESTIMATORS
+    unknown = [name for name in estimators if name not in VOLATILITY_ESTIMATORS]
+    if unknown:
+        raise ApiError(f"Unknown estimator(s) {unknown}, expected some of {VOLATILITY_ESTIMATORS}")
+    df = volatility_frame(ticker, apiKey=apiKey, window=_param(args, 'window', int), estimators=estimators)
+    return df.drop(columns='ticker'), {}
+
+def cone_table(ticker, args, apiKey=None):
+    """Probability cone bounds for every day up to expdays at the confidence level (the probability cone chart)."""
+    days = np.arange(_param(args, 'expdays', int) + 1)
+    confidence_lvl = _param(args, 'confidence', float)
+    _, est_vol, forecast, stock_price = _inputs(ticker, args, apiKey)
+    volatility = forecast_volatility(forecast, days) if forecast else np.full(len(days), est_vol)
+    bounds = np.array([prob_cone(stock_price, vol, int(day), confidence_lvl) for day, vol in zip(days, volatility)], dtype=np.float64).reshape(-1, 2)
+    return pd.DataFrame({'exp_days': days, 'volatility': volatility, 'lower_bound': bounds[:, 0], 'upper_bound': bounds[:, 1]}), {'stock_price': stock_price, 'est_vol': est_vol}
+
+def gbm_table(ticker, args, apiKey=None):
+    """Simulated price distribution at expdays (model=gbm|merton|heston, as in the probability chart tabs)."""
+    model = args.get('model', 'gbm')
+    if model not in SIMULATORS:
+        raise ApiError(f"Unknown model '{model}', expected one of {list(SIMULATORS)}")
+    expday_range = _param(args, 'expdays', int)
+    price_df, est_vol, _, stock_price = _inputs(ticker, args, apiKey)
+    # Same settings and seed as the dashboard tabs, so the API and the chart draw the same curve
+    sigma, steps, paths = est_vol, 1, 1000000
+    if model == 'merton':
+        jump_var = MERTON_PARAMS['jump_intensity'] * (MERTON_PARAMS['jump_mean']**2 + MERTON_PARAMS['jump_std']**2)
+        sigma = math.sqrt(max(est_vol**2 - jump_var, 0.25 * est_vol**2))
+    elif model == 'heston':
+        steps, paths = max(expday_range, 1), 200000
+    price, probability = gbm_sim(price_df, stock_price, expday_range / 252, 0.01, 0.007, sigma, steps, paths, bin_size=10, model=model, seed=0)
+    return pd.DataFrame({'price': price, 'probability': probability}), {'stock_price': stock_price, 'est_vol': est_vol, 'model': model}
+
+API_TABLES = {
+    'chain': chain_table,
+    'skew': skew_table,
+    'vol': vol_table,
+    'cone': cone_table,
+    'gbm': gbm_table,
+}
+
+def register_api_routes(server, apiKey=None):
+    """Serve the dashboard's analytics as columnar JSON at /api/<chain|skew|vol|cone|gbm>/<ticker>.
+
+    Responses look like {"ticker", "total", "page", "page_size", ...inputs, "columns": {name: [values]}}. Query
+    parameters set the scoring inputs (expdays, confidence, window, estimator) and filter, sort and page the rows
+    (see _select). Provider calls and the scored chain go through the same shared cache as the dashboard.
+    """
+    from flask import Response, request
+
+    def make_handler(name, table):
+        @instrument('api', name=name)
+        def handler(ticker):
+            ticker = ticker.upper()
+            try:
+                df, meta = table(ticker, request.args, apiKey=apiKey)
+                rows, page = _select(df, request.args)
+            except ApiError as e:
+                return Response(json.dumps({'error': str(e)}), status=400, mimetype='application/json')
+            except LookupError as e:
+                return Response(json.dumps({'error': str(e)}), status=404, mimetype='application/json')
+            add_rows(len(df))
+            return Response(_columnar(rows, ticker=ticker, **page, **meta), mimetype='application/json')
+        handler.__name__ = f'api_{name}'
+        return handler
+
+    for name, table in API_TABLES.items():
+        server.add_url_rule(f'/api/{name}/<ticker>', view_func=make_handler(name, table))
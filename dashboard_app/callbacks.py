@@ -1,23 +1,133 @@
-import collections
+import functools
+import hashlib
+import json
+import math
+import pickle
+import numpy as np
 import pandas as pd
 import statistics as stat
 from datetime import datetime, timedelta, date
 
-import plotly.graph_objects as go
-
+from dash import Patch, ctx, no_update
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
-from dashboard_app.layout import base_df_columns, ticker_df_columns, option_chain_df_columns
+from dashboard_app.layout import base_df_columns, ticker_df_columns, option_chain_df_columns, strategy_df_columns
 from lib.tos_api_calls import tos_search, tos_get_quotes, tos_get_option_chain, tos_get_price_hist
-from lib.gbm import gbm_sim
-from lib.stats import get_hist_volatility, prob_cone, get_prob
+from lib.tos_helper import estimate_volatility, scored_option_chain
+from lib.candles import Candles
+from lib.gamma_exposure import gamma_exposure
+from lib.gbm import MERTON_PARAMS, gbm_sim
+from lib.stats import forecast_volatility, get_hist_volatility, prob_cone, get_prob, prob_surface
+from lib.option_chain import CONTRACT_KEY, diff_option_chain, flatten_option_chain, oi_profile, oi_summary, otm_vol_grid, score_option_chain, select_contracts, skew_term_structure
+from lib.prefetch import default_prefetcher
+from lib.scheduler import BACKGROUND, provider_priority
+from lib.shared_cache import default_cache
+from lib.write_behind import queue_from_env
+from lib.strategies import format_legs, search_strategies
+from lib.metrics import add_rows, instrument
+# plotly.graph_objects is imported inside the figure callbacks rather than here, so app startup and worker boot don't pay for it
+
+# Price chart tabs fetched on demand (1 Year reuses storage-historical), prefetched when a ticker is submitted
+PREFETCH_PRICE_TABS = ('price_tab_1', 'price_tab_2', 'price_tab_3', 'price_tab_5')
+
+# tos_get_price_hist arguments of a price chart tab
+def price_tab_request(tab):
+    if tab == 'price_tab_1':  # 1 Day
+        return dict(periodType='day', period=1, frequencyType='minute', frequency=1)
+    if tab == 'price_tab_2':  # 5 Days
+        return dict(periodType='day', period=5, frequencyType='minute', frequency=5)
+    if tab == 'price_tab_3':  # 1 Month
+        return dict(periodType='month', period=1, frequencyType='daily', frequency=1)
+    if tab == 'price_tab_5':  # 5 Years
+        return dict(periodType='year', period=5, frequencyType='daily', frequency=1, startDate=(date.today() - timedelta(days=5*365)).strftime('%Y-%m-%d'))
+    raise ValueError(f"No price request for tab {tab}")
+
+# The scored chain store holds the base table as split rows (dates as epoch ms) plus the scoring inputs, so an
+# auto-refresh can rescore single contracts and patch their rows
+def scored_chain_store(df, **params):
+    store = json.loads(df.to_json(orient='split', index=False))
+    store.update(params)
+    return store
+
+def read_scored_chain(store):
+    df = pd.DataFrame(store['data'], columns=store['columns'])
+    df['Exp. Date (Local)'] = pd.to_datetime(df['Exp. Date (Local)'], unit='ms')
+    # Contracts without a delta carry the provider's 'NaN' string
+    df['Delta'] = pd.to_numeric(df['Delta'], errors='coerce')
+    return df
+
+# Seconds a raw chain snapshot stays on the server for the sessions showing it, and how many snapshots a process keeps
+# when the shared cache is disabled
+RAW_CHAIN_TTL = 4 * 3600
+LOCAL_RAW_CHAINS = 32
+_local_raw_chains = {}
+
+# The flattened chain behind the OI, GEX, surface, skew and strategy views stays on the server (the shared cache, or
+# this process with DASHBOARD_CACHE=0): the browser store only holds its key, so the thousands of contracts aren't
+# shipped to the client and posted back by every callback that reads them. Keys are the ticker and a digest of the
+# snapshot, so sessions showing the same chain share one entry and an auto-refresh never overwrites another
+# session's snapshot
+def raw_chain_store(ticker, chain_df, underlying_price, **params):
+    digest = hashlib.blake2b(pd.util.hash_pandas_object(chain_df, index=False).to_numpy().tobytes() + repr(underlying_price).encode(), digest_size=12).hexdigest()
+    key = f'raw_chain:{ticker}:{digest}'
+    entry = {'options': chain_df, 'underlyingPrice': underlying_price}
+    cache = default_cache()
+    if cache is not None:
+        cache.set(key, entry, RAW_CHAIN_TTL)
+    else:
+        _local_raw_chains.pop(key, None)
+        _local_raw_chains[key] = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        while len(_local_raw_chains) > LOCAL_RAW_CHAINS:
+            del _local_raw_chains[next(iter(_local_raw_chains))]
+    return {'ticker': ticker, 'key': key, **params}
+
+# {'options': chain_df, 'underlyingPrice'} of a raw chain store, or None once it expired (or, without the shared
+# cache, when another worker stored it)
+def cached_raw_chain(store):
+    cache = default_cache()
+    if cache is not None:
+        return cache.get(store['key'])
+    entry = _local_raw_chains.get(store['key'])
+    return None if entry is None else pickle.loads(entry)
+
+# cached_raw_chain for the chart and table callbacks, refetching the ticker's chain when the snapshot is gone
+def read_raw_chain(store, apiKey=None):
+    entry = cached_raw_chain(store)
+    if entry is None:
+        json_data = tos_get_option_chain(store['ticker'], contractType='ALL', rangeType='ALL', apiKey=apiKey)
+        entry = {'options': flatten_option_chain(json_data), 'underlyingPrice': json_data['underlyingPrice']}
+    return entry['options'], entry['underlyingPrice']
+
+# Columns identifying a scored contract, matching lib.option_chain.CONTRACT_KEY
+SCORED_KEY = ['Type', 'Exp. Date (Local)', 'Strike']
+
+# True when the callback was fired by an auto-refresh patch of store_id rather than by a Submit
+def refreshed_by(store_id, data):
+    return ctx.triggered_id == store_id and bool(data.get('refreshed'))
+
+# Data-only update of a figure rebuilt after an auto-refresh: the client keeps its layout and trace styling
+def trace_data_patch(fig):
+    patched_fig = Patch()
+    for i, trace in enumerate(fig.data):
+        for field in ('x', 'y', 'z'):
+            if field in trace and trace[field] is not None:
+                patched_fig['data'][i][field] = trace[field]
+    patched_fig['layout']['title']['text'] = fig.layout.title.text
+    return patched_fig
 
 def register_callbacks(app, API_KEY):
+    # Optional write-behind persistence of everything fetched (enabled by OPTIONS_WAREHOUSE_PATH)
+    write_queue = queue_from_env()
+    # Speculative fetches of the price chart timeframes. One scope per browser session: a newly submitted ticker
+    # cancels the prefetches still queued for that session's previous one
+    prefetcher = default_prefetcher()
+
     @app.callback(
         Output("ticker_table_collapse_content", "is_open"),
         [Input("ticker_data", "n_clicks")],
         [State("ticker_table_collapse_content", "is_open")],
     )
+    @instrument('callback')
     def toggle_collapse(n, is_open):
         return not is_open if n else is_open
 
@@ -26,6 +136,7 @@ def register_callbacks(app, API_KEY):
         [Input('memory-ticker', 'search_value'), Input('ticker_switch__input', 'value')],
         [State('memory-ticker', 'value')]
     )
+    @instrument('callback')
     def update_search(search_value, ticker_switch, value):
         if not search_value:
             raise PreventUpdate
@@ -41,23 +152,33 @@ def register_callbacks(app, API_KEY):
     @app.callback(
         Output('storage-historical', 'data'),
         [Input('submit-button-state', 'n_clicks')],
-        [State('memory-ticker', 'value'), State('memory-vol-period', 'value'), State('memory-volest-type', 'value')]
+        [State('memory-ticker', 'value'), State('memory-vol-period', 'value'), State('memory-volest-type', 'value'), State('session-id', 'data')]
     )
-    def get_historical_prices(n_clicks, ticker, volatility_period, vol_est_type):
+    @instrument('callback')
+    def get_historical_prices(n_clicks, ticker, volatility_period, vol_est_type, session_id):
         if not ticker or not isinstance(ticker, str):
             print(f"Invalid ticker: {ticker}")
             raise PreventUpdate
         print(f"Fetching history for ticker: {ticker}, period: {volatility_period}, estimator: {vol_est_type}")
-        hist_data = tos_get_price_hist(ticker, apiKey=API_KEY)
-        json_data = {ticker: hist_data}
-        price_df = pd.DataFrame(hist_data['candles'])
-        if price_df.empty or 'close' not in price_df.columns:
+        # Fetch the other price chart timeframes in the background so tab clicks are served locally
+        prefetcher.prefetch(('price_tabs', session_id), ticker, {
+            (ticker, tab): functools.partial(tos_get_price_hist, ticker, apiKey=API_KEY, **price_tab_request(tab)) for tab in PREFETCH_PRICE_TABS
+        })
+        candles = tos_get_price_hist(ticker, apiKey=API_KEY)['candles']
+        # The store keeps the candles as base64 of their binary form, far smaller than a list of JSON candle dicts
+        json_data = {ticker: {'candles': candles.to_store()}}
+        price_df = candles.to_frame()
+        if price_df.empty:
             print(f"No valid historical data for {ticker}")
             json_data['est_vol'] = 0
         else:
-            vol_series = get_hist_volatility(price_df, volatility_period, estimator=vol_est_type)
-            json_data['est_vol'] = vol_series.iloc[-1] if not vol_series.empty else 0
-        print(f"Returning hist_data with {len(hist_data['candles'])} candles, est_vol: {json_data.get('est_vol')}")
+            json_data['est_vol'], forecast = estimate_volatility(ticker, price_df, volatility_period, vol_est_type, apiKey=API_KEY)
+            if forecast is not None:
+                json_data['vol_forecast'] = forecast
+            if write_queue:
+                write_queue.submit('candles', (ticker, 'day', candles), rows=len(candles))
+                write_queue.submit('metrics', (ticker, f'est_vol_{vol_est_type}_{volatility_period}', datetime.now().timestamp() * 1000, json_data['est_vol']))
+        print(f"Returning hist_data with {len(candles)} candles, est_vol: {json_data.get('est_vol')}")
         return json_data
 
     @app.callback(
@@ -65,144 +186,214 @@ def register_callbacks(app, API_KEY):
         [Input('submit-button-state', 'n_clicks')],
         [State('memory-ticker', 'value')]
     )
+    @instrument('callback')
     def get_price_quotes(n_clicks, ticker):
         if ticker is None:
             raise PreventUpdate
         return tos_get_quotes(ticker, apiKey=API_KEY)
 
     @app.callback(
-        Output('storage-option-chain-all', 'data'),
+        [Output('storage-option-chain-all', 'data'), Output('storage-option-chain-raw', 'data'), Output('refresh-anchor', 'children')],
         [Input('submit-button-state', 'n_clicks'), Input('storage-historical', 'data'), Input('storage-quotes', 'data')],
         [State('memory-ticker', 'value'), State('memory-expdays', 'value'), State('memory-confidence', 'value')]
     )
+    @instrument('callback')
     def get_option_chain_all(n_clicks, hist_data, quotes_data, ticker, expday_range, confidence_lvl):
         if not ticker or not hist_data or not hist_data.get(ticker):
-            print(f"Skipping get_option_chain_all: ticker={ticker}, hist_data={hist_data}")
+            print(f"Skipping get_option_chain_all: ticker={ticker}")
             raise PreventUpdate
         print(f"Fetching options chain for {ticker}, expday_range={expday_range}")
         json_data = tos_get_option_chain(ticker, contractType='ALL', rangeType='ALL', apiKey=API_KEY)
-        print(f"Options chain data: {json_data}")
         
-        insert = []
         current_date = datetime.now()
-        price_df = pd.DataFrame(hist_data[ticker]['candles'])
         hist_volatility = hist_data.get('est_vol', 0)
+        forecast = hist_data.get('vol_forecast')
         stock_price = quotes_data[ticker]['lastPrice']
-
-        for option_chain_type in ['call', 'put']:
-            exp_map = json_data[f'{option_chain_type}ExpDateMap']
-            for exp_date, strikes in exp_map.items():
-                for strike in strikes.values():
-                    strike_data = strike[0]
-                    expiry_date = datetime.fromtimestamp(strike_data["expirationDate"] / 1000.0)
-                    day_diff = (expiry_date - current_date).days
-                    if day_diff < 0:
-                        continue
-                    if day_diff > expday_range:
-                        break
-
-                    option_type = strike_data['putCall']
-                    strike_price = strike_data['strikePrice']
-                    bid_size = strike_data.get('bidSize', 0)
-                    ask_size = strike_data.get('askSize', 0)
-                    delta_val = strike_data['delta']
-                    total_volume = strike_data['volume']
-                    open_interest = strike_data['openInterest']
-                    option_premium = round(strike_data['bid'] * strike_data['multiplier'], 2)
-                    roi_val = round(option_premium / (strike_price * 100) * 100, 2)
-
-                    # Handle 'NaN' or None delta_val
-                    if delta_val == 'NaN' or delta_val is None:
-                        option_leverage = 0.0
-                    else:
-                        option_leverage = 0.0 if option_premium == 0 else round((abs(float(delta_val)) * stock_price) / option_premium, 3)
-                    
-                    prob_val = get_prob(stock_price, strike_price, hist_volatility, day_diff) if day_diff > 0 else 0.0
-                    lower_bound, upper_bound = prob_cone(stock_price, hist_volatility, day_diff, confidence_lvl)
-
-                    insert.append([ticker, expiry_date, option_type, strike_price, day_diff, delta_val, prob_val, open_interest, total_volume, option_premium, option_leverage, bid_size, ask_size, roi_val, lower_bound, upper_bound])
+        insert, chain_df = scored_option_chain(json_data, ticker, stock_price, hist_volatility, expday_range, confidence_lvl, vol_forecast=forecast)
+        add_rows(len(insert))
 
         df = pd.DataFrame(insert, columns=[col['name'] for col in base_df_columns])
-        return df.to_json(orient='split')
+        if write_queue:
+            write_queue.submit('chain', (ticker, chain_df, current_date.timestamp() * 1000), rows=len(chain_df))
+        # Auto-refresh rescores changed contracts with these inputs, so its rows line up with the rest of the table
+        scoring = dict(expday_range=expday_range, confidence_lvl=confidence_lvl, stock_price=stock_price, scored_at=current_date.timestamp() * 1000)
+        anchor = f"Scored at {ticker} ${stock_price:,.2f} as of {current_date:%H:%M:%S}. Auto refresh updates quotes at this price; Submit to re-anchor."
+        return scored_chain_store(df, **scoring), raw_chain_store(ticker, chain_df, json_data['underlyingPrice']), anchor
+
+    @app.callback(
+        [Output('auto-refresh-interval', 'disabled'), Output('auto-refresh-interval', 'interval')],
+        [Input('memory-refresh-interval', 'value')]
+    )
+    @instrument('callback')
+    def set_refresh_interval(seconds):
+        return not seconds, (seconds or 60) * 1000
+
+    @app.callback(
+        [Output('storage-option-chain-all', 'data', allow_duplicate=True), Output('storage-option-chain-raw', 'data', allow_duplicate=True)],
+        [Input('auto-refresh-interval', 'n_intervals')],
+        [State('storage-option-chain-all', 'data'), State('storage-option-chain-raw', 'data'), State('storage-historical', 'data')],
+        prevent_initial_call=True
+    )
+    @instrument('callback')
+    def refresh_option_chain(n_intervals, optionchain_data, raw_chain, hist_data):
+        if not optionchain_data or not raw_chain or not hist_data:
+            raise PreventUpdate
+        # Refresh the submitted ticker with the scoring inputs of that Submit (stock price and date included, as shown
+        # under Auto Refresh); only the chain's quotes move
+        ticker = raw_chain['ticker']
+        scoring = {name: optionchain_data[name] for name in ('expday_range', 'confidence_lvl', 'stock_price', 'scored_at')}
+        expday_range, confidence_lvl, stock_price = scoring['expday_range'], scoring['confidence_lvl'], scoring['stock_price']
+        current_date = datetime.fromtimestamp(scoring['scored_at'] / 1000)
+        hist_volatility = hist_data.get('est_vol', 0)
+        forecast = hist_data.get('vol_forecast')
+        # Timer-driven, so its provider requests queue behind the ones users are waiting on
+        with provider_priority(BACKGROUND):
+            json_data = tos_get_option_chain(ticker, contractType='ALL', rangeType='ALL', apiKey=API_KEY)
+        chain_df = flatten_option_chain(json_data)
+        # An expired snapshot can't be diffed: the whole chain is rescored below
+        previous = cached_raw_chain(raw_chain)
+        if previous is not None:
+            previous_df = previous['options']
+            position, changed = diff_option_chain(previous_df, chain_df)
+            add_rows(int(changed.sum()))
+            if not changed.any() and json_data['underlyingPrice'] == previous['underlyingPrice']:
+                raise PreventUpdate
+
+        columns = [col['name'] for col in base_df_columns]
+        if write_queue:
+            write_queue.submit('chain', (ticker, chain_df, datetime.now().timestamp() * 1000), rows=len(chain_df))
+        if previous is not None and len(chain_df) == len(previous_df) and (position >= 0).all():
+            # Same contracts as the stores: rescore the changed ones and patch their rows in place
+            contracts = chain_df.loc[changed, CONTRACT_KEY].itertuples(index=False, name=None)
+            insert = score_option_chain(select_contracts(json_data, contracts), ticker, stock_price, hist_volatility, expday_range, confidence_lvl, current_date=current_date, vol_forecast=forecast)
+            previous_scored = pd.DataFrame(optionchain_data['data'], columns=columns)
+            # Same column types as the full table, so a patched row reads back exactly like a Submit's
+            float_columns = {column: np.float64 for column in columns if previous_scored[column].dtype == np.float64}
+            rescored = pd.DataFrame(insert, columns=columns).astype(float_columns)
+            rows = scored_chain_store(rescored)['data']
+            scored_index = pd.MultiIndex.from_frame(previous_scored[SCORED_KEY])
+            scored_position = scored_index.get_indexer(pd.MultiIndex.from_frame(pd.DataFrame(rows, columns=columns)[SCORED_KEY]))
+            if (scored_position >= 0).all():
+                patched_scored = Patch()
+                for i, row in zip(scored_position.tolist(), rows):
+                    patched_scored['data'][i] = row
+                patched_scored['refreshed'] = n_intervals
+                print(f"Refreshed {ticker}: {int(changed.sum())} of {len(chain_df)} contracts changed, {len(rows)} rows rescored")
+                return patched_scored, raw_chain_store(ticker, chain_df, json_data['underlyingPrice'], refreshed=n_intervals)
+
+        # Contracts were listed or delisted: rescore the whole chain and replace both stores
+        print(f"Refreshed {ticker}: contract set changed, rescoring {len(chain_df)} contracts")
+        insert = score_option_chain(json_data, ticker, stock_price, hist_volatility, expday_range, confidence_lvl, current_date=current_date, vol_forecast=forecast)
+        return scored_chain_store(pd.DataFrame(insert, columns=columns), **scoring), raw_chain_store(ticker, chain_df, json_data['underlyingPrice'])
 
     @app.callback(
         Output('price_chart', 'figure'),
         [Input('storage-historical', 'data'), Input('tabs_price_chart', 'value')],
         [State('memory-ticker', 'value')]
     )
+    @instrument('callback')
     def on_data_set_price_history(hist_data, tab, ticker):
-        aggregation = collections.defaultdict(lambda: collections.defaultdict(list))
+        import plotly.graph_objects as go
         if ticker is None:
             raise PreventUpdate
 
-        if tab == 'price_tab_1':  # 1 Day
-            hist_price = tos_get_price_hist(ticker, periodType='day', period=1, frequencyType='minute', frequency=1, apiKey=API_KEY)
-        elif tab == 'price_tab_2':  # 5 Days
-            hist_price = tos_get_price_hist(ticker, periodType='day', period=5, frequencyType='minute', frequency=5, apiKey=API_KEY)
-        elif tab == 'price_tab_3':  # 1 Month
-            hist_price = tos_get_price_hist(ticker, periodType='month', period=1, frequencyType='daily', frequency=1, apiKey=API_KEY)
-        elif tab == 'price_tab_4':  # 1 Year
-            hist_price = hist_data[ticker]
+        if tab == 'price_tab_4':  # 1 Year
+            hist_price = hist_data.get(ticker) if hist_data else None
             if hist_price is None:
                 raise PreventUpdate
-        elif tab == 'price_tab_5':  # 5 Years
-            hist_price = tos_get_price_hist(ticker, periodType='year', period=5, frequencyType='daily', frequency=1, startDate=datetime.now() - timedelta(days=5*365), apiKey=API_KEY)
-
-        for candle in hist_price['candles']:
-            a = aggregation[ticker]
-            a['name'] = ticker
-            a['mode'] = 'lines'
-            a['y'].append(candle['close'])
-            a['x'].append(datetime.fromtimestamp(candle['datetime'] / 1000.0))
-
-        return {'layout': {'title': {'text': 'Price History'}}, 'data': [x for x in aggregation.values()]}
+            hist_price = {'candles': Candles.from_store(hist_price['candles'])}
+        else:
+            # Usually prefetched when the ticker was submitted
+            hist_price = prefetcher.get((ticker, tab), lambda: tos_get_price_hist(ticker, apiKey=API_KEY, **price_tab_request(tab)), cacheable=lambda data: data['candles'])
+
+        candles = hist_price['candles']
+        add_rows(len(candles))
+        x = candles.times()
+        y = candles.close
+
+        # The figure already holds the price trace once history is loaded, so a tab switch only swaps its data
+        if ctx.triggered_id == 'tabs_price_chart' and hist_data:
+            patched_fig = Patch()
+            patched_fig['data'][0]['x'] = x
+            patched_fig['data'][0]['y'] = y
+            patched_fig['data'][0]['name'] = ticker
+            return patched_fig
+
+        fig = go.Figure(go.Scattergl(x=x, y=y, mode='lines', name=ticker))
+        fig.update_layout(title={'text': 'Price History'})
+        return fig
 
     @app.callback(
         Output('prob_cone_chart', 'figure'),
         [Input('storage-option-chain-all', 'data'), Input('storage-historical', 'data'), Input('storage-quotes', 'data'), Input('tabs_prob_chart', 'value')],
         [State('memory-ticker', 'value'), State('memory-expdays', 'value'), State('memory-confidence', 'value')]
     )
+    @instrument('callback')
     def on_data_set_prob_cone(optionchain_data, hist_data, quotes_data, tab, ticker, expday_range, confidence_lvl):
+        import plotly.graph_objects as go
         if not optionchain_data or not hist_data or not quotes_data:
-            print(f"Skipping on_data_set_prob_cone: optionchain_data={optionchain_data}, hist_data={hist_data}, quotes_data={quotes_data}")
+            print(f"Skipping on_data_set_prob_cone: missing option chain, history or quotes for {ticker}")
+            raise PreventUpdate
+
+        # The simulated distributions don't depend on the chain's quotes
+        refresh = refreshed_by('storage-option-chain-all', optionchain_data)
+        if refresh and tab != 'prob_cone_tab':
             raise PreventUpdate
 
         insert = []
         data = []
-        optionchain_df = pd.read_json(StringIO(optionchain_data), orient='split')  # Fix FutureWarning
+        optionchain_df = read_scored_chain(optionchain_data)
+        add_rows(len(optionchain_df))
         mkt_pressure_df = optionchain_df.filter(['Ticker', 'Exp. Date (Local)', 'Option Type', 'Exp. Days', 'Strike', 'Open Int.', 'Total Vol.'])
         mkt_pressure_df['Day'] = mkt_pressure_df['Exp. Days'].apply(lambda x: date.today() + timedelta(days=x))
         mkt_pressure_df['StrikeOpenInterest'] = mkt_pressure_df['Strike'] * mkt_pressure_df['Open Int.']
         mkt_pressure_df['StrikeTotalVolume'] = mkt_pressure_df['Strike'] * mkt_pressure_df['Total Vol.']
 
-        price_df = pd.DataFrame(hist_data[ticker]['candles'])
+        price_df = Candles.from_store(hist_data[ticker]['candles']).to_frame()
         hist_volatility = hist_data.get('est_vol', 0)
         stock_price = quotes_data[ticker]['lastPrice']
 
         if tab == 'prob_cone_tab':
             for i_day in range(expday_range + 1):
-                lower_bound, upper_bound = prob_cone(stock_price, hist_volatility, i_day, probability=confidence_lvl)
+                volatility = forecast_volatility(hist_data['vol_forecast'], i_day) if hist_data.get('vol_forecast') else hist_volatility
+                lower_bound, upper_bound = prob_cone(stock_price, volatility, i_day, probability=confidence_lvl)
                 insert.append([ticker, date.today() + timedelta(days=i_day), stock_price, lower_bound, upper_bound, i_day])
 
-            agg_mkt_pressure_df = mkt_pressure_df.groupby('Day').sum().reset_index()
+            agg_mkt_pressure_df = mkt_pressure_df.groupby('Day')[['StrikeOpenInterest', 'Open Int.', 'StrikeTotalVolume', 'Total Vol.']].sum().reset_index()
             agg_mkt_pressure_df['MktPressOpenInterest'] = agg_mkt_pressure_df['StrikeOpenInterest'] / agg_mkt_pressure_df['Open Int.']
             agg_mkt_pressure_df['MktPressTotalVolume'] = agg_mkt_pressure_df['StrikeTotalVolume'] / agg_mkt_pressure_df['Total Vol.']
 
-        elif tab == 'gbm_sim_tab':
+        elif tab in ('gbm_sim_tab', 'merton_sim_tab', 'heston_sim_tab'):
             T = expday_range / 252
             r, q, sigma, steps, N = 0.01, 0.007, hist_volatility, 1, 1000000
-            x_ls, y_ls = gbm_sim(price_df, stock_price, T, r, q, sigma, steps, N, bin_size=10)
-            data.append(go.Scatter(x=x_ls, y=y_ls, name='Price Probability', mode='lines+markers', line_shape='spline'))
+            # Fixed seed so re-rendering the same inputs draws the same curve
+            x_ls, y_ls = gbm_sim(price_df, stock_price, T, r, q, sigma, steps, N, bin_size=10, seed=0)
+            data.append(go.Scatter(x=x_ls, y=y_ls, name='Price Probability (GBM)', mode='lines+markers', line_shape='spline'))
+            if tab == 'merton_sim_tab':
+                # Take the jump variance out of the diffusion so the total variance still matches the estimate
+                jump_var = MERTON_PARAMS['jump_intensity'] * (MERTON_PARAMS['jump_mean']**2 + MERTON_PARAMS['jump_std']**2)
+                diffusion = math.sqrt(max(sigma**2 - jump_var, 0.25 * sigma**2))
+                x_ls, y_ls = gbm_sim(price_df, stock_price, T, r, q, diffusion, steps, N, bin_size=10, model='merton', seed=0)
+                data.append(go.Scatter(x=x_ls, y=y_ls, name='Price Probability (Merton)', mode='lines+markers', line_shape='spline'))
+            elif tab == 'heston_sim_tab':
+                # Full-truncation Euler needs roughly a step per trading day
+                x_ls, y_ls = gbm_sim(price_df, stock_price, T, r, q, sigma, max(expday_range, 1), 200000, bin_size=10, model='heston', seed=0)
+                data.append(go.Scatter(x=x_ls, y=y_ls, name='Price Probability (Heston)', mode='lines+markers', line_shape='spline'))
 
         if tab == 'prob_cone_tab':
-            df = pd.DataFrame(insert, columns=['Ticker Symbol', 'Day', 'Stock Price', 'Lower Bound', 'Upper Bound', 'Days to Expiry'])
+            days = np.array([row[1] for row in insert], dtype='datetime64[D]')
+            lower = np.array([row[3] for row in insert], dtype=np.float64)
+            upper = np.array([row[4] for row in insert], dtype=np.float64)
+            pressure_days = agg_mkt_pressure_df['Day'].to_numpy(dtype='datetime64[D]')
             fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df.loc[df['Ticker Symbol'] == ticker, 'Day'].squeeze(), y=df.loc[df['Ticker Symbol'] == ticker, 'Upper Bound'].squeeze(), mode='lines+markers', name=f'{ticker}: Upper Bound', line_shape='spline'))
-            fig.add_trace(go.Scatter(x=df.loc[df['Ticker Symbol'] == ticker, 'Day'].squeeze(), y=df.loc[df['Ticker Symbol'] == ticker, 'Lower Bound'].squeeze(), mode='lines+markers', name=f'{ticker}: Lower Bound', line_shape='spline'))
-            fig.add_trace(go.Scatter(x=agg_mkt_pressure_df['Day'].squeeze(), y=agg_mkt_pressure_df['MktPressOpenInterest'].squeeze(), mode='lines+markers', name=f'{ticker}: Open Interest Pressure', line_shape='spline'))
-            fig.add_trace(go.Scatter(x=agg_mkt_pressure_df['Day'].squeeze(), y=agg_mkt_pressure_df['MktPressTotalVolume'].squeeze(), mode='lines+markers', name=f'{ticker}: Total Volume Pressure', line_shape='spline'))
+            fig.add_trace(go.Scatter(x=days, y=upper, mode='lines+markers', name=f'{ticker}: Upper Bound', line_shape='spline'))
+            fig.add_trace(go.Scatter(x=days, y=lower, mode='lines+markers', name=f'{ticker}: Lower Bound', line_shape='spline'))
+            fig.add_trace(go.Scatter(x=pressure_days, y=agg_mkt_pressure_df['MktPressOpenInterest'].to_numpy(dtype=np.float64), mode='lines+markers', name=f'{ticker}: Open Interest Pressure', line_shape='spline'))
+            fig.add_trace(go.Scatter(x=pressure_days, y=agg_mkt_pressure_df['MktPressTotalVolume'].to_numpy(dtype=np.float64), mode='lines+markers', name=f'{ticker}: Total Volume Pressure', line_shape='spline'))
             fig.update_layout(title=f'Probability Cone ({confidence_lvl*100}% Confidence)', title_x=0.5, yaxis_title='Stock Price', plot_bgcolor='rgb(256,256,256)')
             fig.update_layout(legend=dict(yanchor="top", y=1, xanchor="left", x=0))
+            if refresh:
+                return trace_data_patch(fig)
         else:
             fig = go.Figure(data=data)
             fig.update_layout(title='Probability Distribution', title_x=0.5, yaxis_title='Probability (%)', plot_bgcolor='rgb(256,256,256)')
@@ -216,113 +407,247 @@ def register_callbacks(app, API_KEY):
         [Input('storage-historical', 'data'), Input('tabs_vol_chart', 'value')],
         [State('memory-ticker', 'value')]
     )
+    @instrument('callback')
     def on_data_set_vol_history(hist_data, tab, ticker):
+        import plotly.graph_objects as go
         if hist_data is None:
             raise PreventUpdate
-        price_df = pd.DataFrame(hist_data[ticker]['candles'])
+        price_df = Candles.from_store(hist_data[ticker]['candles']).to_frame()
+        add_rows(len(price_df))
         vol_tab_dict = {'vol_tab_2w': 14, 'vol_tab_1M': 30, 'vol_tab_3M': 90, 'vol_tab_1Y': 252}
         volatility_period = vol_tab_dict[tab]
-        vol_est_ls = ['log_returns', 'garman_klass', 'hodges_tompkins', 'parkinson', 'rogers_satchell', 'yang_zhang']
+        vol_est_ls = ['log_returns', 'garman_klass', 'hodges_tompkins', 'parkinson', 'rogers_satchell', 'yang_zhang', 'ewma', 'garch']
         hist_volatility_dict = {}
 
         for vol_est in vol_est_ls:
-            hist_volatility = get_hist_volatility(price_df, volatility_period, estimator=vol_est)
-            hist_volatility_dict[vol_est] = hist_volatility.iloc[1:] if vol_est in ('garman_klass', 'parkinson', 'rogers_satchell') else hist_volatility
+            hist_volatility = get_hist_volatility(price_df, volatility_period, estimator=vol_est).to_numpy(dtype=np.float64)
+            hist_volatility_dict[vol_est] = hist_volatility[1:] if vol_est in ('garman_klass', 'parkinson', 'rogers_satchell') else hist_volatility
+
+        n_days = min(len(values) for values in hist_volatility_dict.values())
+        days = np.arange(1, n_days + 1)
+        title = f'Historical Volatility (Window: {volatility_period} days)'
+
+        # Switching the window keeps the len(vol_est_ls) estimator traces in the same order, so only their data and the title are replaced
+        if ctx.triggered_id == 'tabs_vol_chart':
+            patched_fig = Patch()
+            for i, vol_est in enumerate(vol_est_ls):
+                patched_fig['data'][i]['x'] = days
+                patched_fig['data'][i]['y'] = hist_volatility_dict[vol_est][:n_days]
+            patched_fig['layout']['title']['text'] = title
+            return patched_fig
 
-        hist_volatility_dict['Day'] = range(1, len(hist_volatility_dict['log_returns']) + 1)
-        hist_volatility_df = pd.DataFrame(hist_volatility_dict)
         fig = go.Figure()
         for vol_est in vol_est_ls:
-            fig.add_trace(go.Scatter(x=hist_volatility_df['Day'].squeeze(), y=hist_volatility_df[vol_est].squeeze(), mode='lines+markers', name=f'{ticker}: {vol_est}', line_shape='spline'))
-        fig.update_layout(title=f'Historical Volatility (Window: {volatility_period} days)', title_x=0.5, xaxis_title='Days', yaxis_title='Estimated Volatility', plot_bgcolor='rgb(256,256,256)')
+            fig.add_trace(go.Scattergl(x=days, y=hist_volatility_dict[vol_est][:n_days], mode='lines+markers', name=f'{ticker}: {vol_est}'))
+        fig.update_layout(title=title, title_x=0.5, xaxis_title='Days', yaxis_title='Estimated Volatility', plot_bgcolor='rgb(256,256,256)')
         fig.update_xaxes(showgrid=True, gridcolor='LightGrey')
         fig.update_yaxes(showgrid=True, gridcolor='LightGrey')
         return fig
 
     @app.callback(
         [Output('open_ir_vol', 'figure'), Output('memory_exp_day_graph', 'options')],
-        [Input('storage-option-chain-all', 'data')],
-        [State('memory-ticker', 'value'), State('memory-expdays', 'value'), State('memory_exp_day_graph', 'value')]
+        [Input('storage-option-chain-all', 'data'), Input('memory_exp_day_graph', 'value')],
+        [State('memory-ticker', 'value'), State('memory-expdays', 'value')]
     )
-    def on_data_init_open_interest_vol(optionchain_data, ticker, expday_range, expday_graph_selection):
+    @instrument('callback')
+    def on_data_init_open_interest_vol(optionchain_data, expday_graph_selection, ticker, expday_range):
+        import plotly.graph_objects as go
         if optionchain_data is None:
             raise PreventUpdate
-        optionchain_df = pd.read_json(optionchain_data, orient='split')
-        df = optionchain_df.filter(['Ticker', 'Exp. Date (Local)', 'Type', 'Exp. Days', 'Strike', 'Open Int.', 'Total Vol.'])
-        expday_options = [{"label": f"Strike Date: {(datetime.now() + timedelta(days=int(days_to_exp))).date()} (Days to Expiry: {days_to_exp})", "value": days_to_exp} for days_to_exp in df['Exp. Days'].unique()]
-        fig = go.Figure()
-        expday_select = expday_graph_selection if expday_graph_selection else df['Exp. Days'].max()
-
+        optionchain_df = read_scored_chain(optionchain_data)
+        add_rows(len(optionchain_df))
+        option_types = optionchain_df['Type'].to_numpy()
+        exp_days = optionchain_df['Exp. Days'].to_numpy()
+        strikes = optionchain_df['Strike'].to_numpy(dtype=np.float64)
+        open_interest = optionchain_df['Open Int.'].to_numpy(dtype=np.float64)
+        total_volume = optionchain_df['Total Vol.'].to_numpy(dtype=np.float64)
+        expday_select = expday_graph_selection if expday_graph_selection else exp_days.max()
+        title = f'Open Interest/Volume - {expday_select} days'
+
+        traces = []
         for option_type, bar_color in [('PUT', 'indianred'), ('CALL', 'lightseagreen')]:
-            fig.add_trace(go.Scatter(x=df.loc[(df['Type'] == option_type) & (df['Exp. Days'] == expday_select), 'Strike'].squeeze(), y=df.loc[(df['Type'] == option_type) & (df['Exp. Days'] == expday_select), 'Total Vol.'].squeeze(), mode='lines+markers', name=f'{ticker}: Total {option_type} Volume', line_shape='spline', marker_color=bar_color))
-            fig.add_trace(go.Bar(x=df.loc[(df['Type'] == option_type) & (df['Exp. Days'] == expday_select), 'Strike'].squeeze(), y=df.loc[(df['Type'] == option_type) & (df['Exp. Days'] == expday_select), 'Open Int.'].squeeze(), name=f'{ticker}: Open {option_type} Interest', marker_color=bar_color, opacity=0.5))
+            mask = (option_types == option_type) & (exp_days == expday_select)
+            traces.append((option_type, bar_color, strikes[mask], total_volume[mask], open_interest[mask]))
+
+        # Picking another expiry keeps the volume/open interest traces, so only their data and the title are replaced
+        if ctx.triggered_id == 'memory_exp_day_graph':
+            patched_fig = Patch()
+            for i, (_, _, strike_x, volume_y, open_interest_y) in enumerate(traces):
+                patched_fig['data'][2 * i]['x'] = strike_x
+                patched_fig['data'][2 * i]['y'] = volume_y
+                patched_fig['data'][2 * i + 1]['x'] = strike_x
+                patched_fig['data'][2 * i + 1]['y'] = open_interest_y
+            patched_fig['layout']['title']['text'] = title
+            return patched_fig, no_update
+
+        expday_options = [{"label": f"Strike Date: {(datetime.now() + timedelta(days=int(days_to_exp))).date()} (Days to Expiry: {days_to_exp})", "value": days_to_exp} for days_to_exp in np.unique(exp_days).tolist()]
+        fig = go.Figure()
+        for option_type, bar_color, strike_x, volume_y, open_interest_y in traces:
+            fig.add_trace(go.Scattergl(x=strike_x, y=volume_y, mode='lines+markers', name=f'{ticker}: Total {option_type} Volume', marker_color=bar_color))
+            fig.add_trace(go.Bar(x=strike_x, y=open_interest_y, name=f'{ticker}: Open {option_type} Interest', marker_color=bar_color, opacity=0.5))
 
-        fig.update_layout(title=f'Open Interest/Volume - {expday_select} days', title_x=0.5, xaxis_title='Strike Price', yaxis_title='No. of Contracts', plot_bgcolor='rgb(256,256,256)', legend=dict(yanchor="top", y=1, xanchor="right", x=1))
+        fig.update_layout(title=title, title_x=0.5, xaxis_title='Strike Price', yaxis_title='No. of Contracts', plot_bgcolor='rgb(256,256,256)', legend=dict(yanchor="top", y=1, xanchor="right", x=1))
+        if refreshed_by('storage-option-chain-all', optionchain_data):
+            return trace_data_patch(fig), no_update
         return fig, expday_options
 
     @app.callback(
-        Output('ticker-data-table', 'data'),
-        [Input('submit-button-state', 'n_clicks'), Input('storage-historical', 'data'), Input('storage-option-chain-all', 'data'), Input('ticker-data-table', "page_current"), Input('ticker-data-table', "page_size"), Input('ticker-data-table', "sort_by")],
+        [Output('oi_profile_chart', 'figure'), Output('oi-summary-table', 'data')],
+        [Input('storage-option-chain-raw', 'data'), Input('memory_exp_day_graph', 'value')],
         [State('memory-ticker', 'value')]
     )
-    def on_data_set_ticker_table(n_clicks, hist_data, optionchain_data, page_current, page_size, sort_by, ticker):
-        if ticker is None or optionchain_data is None:
+    @instrument('callback')
+    def on_data_set_oi_profile(raw_chain, expday_graph_selection, ticker):
+        import plotly.graph_objects as go
+        if not raw_chain:
             raise PreventUpdate
-        option_chain_response = tos_get_option_chain(ticker, contractType='ALL', rangeType='ALL', apiKey=API_KEY)
-        if not option_chain_response or 'error' in option_chain_response:
+        chain_df, _ = read_raw_chain(raw_chain, apiKey=API_KEY)
+        profile = oi_profile(chain_df)
+        if profile.empty:
             raise PreventUpdate
+        add_rows(len(profile))
+        summary = oi_summary(profile)
+
+        # Follow the expiry picked for the open interest/volume chart (nearest listed expiry), else the front month
+        expiries = summary['exp_days'].to_numpy()
+        row = int(np.abs(expiries - expday_graph_selection).argmin()) if expday_graph_selection is not None else 0
+        levels = summary.iloc[row]
+        expiry = profile.loc[profile['exp_days'] == levels['exp_days']]
+        strikes = expiry['strike'].to_numpy()
+        top = max(expiry['cum_call_oi'].max(), expiry['cum_put_oi'].max(), 1.0)
+        title = f"Max Pain {levels['max_pain']:g} / Call Wall {levels['call_wall']:g} / Put Wall {levels['put_wall']:g} - {levels['exp_date']} ({levels['exp_days']} days)"
+        # Cumulative OI and the payout curve, then the three key strikes as vertical lines
+        traces = [
+            (strikes, expiry['cum_call_oi'].to_numpy()),
+            (strikes, expiry['cum_put_oi'].to_numpy()),
+            (strikes, expiry['pain'].to_numpy()),
+            ([levels['max_pain']] * 2, [0, top]),
+            ([levels['call_wall']] * 2, [0, top]),
+            ([levels['put_wall']] * 2, [0, top]),
+        ]
+
+        # Picking another expiry keeps the same six traces, so only their data and the title are replaced
+        if ctx.triggered_id == 'memory_exp_day_graph':
+            patched_fig = Patch()
+            for i, (x, y) in enumerate(traces):
+                patched_fig['data'][i]['x'] = x
+                patched_fig['data'][i]['y'] = y
+            patched_fig['layout']['title']['text'] = title
+            return patched_fig, no_update
+
+        names = [f'{ticker}: Cumulative Call OI', f'{ticker}: Cumulative Put OI', f'{ticker}: Holder Payout at Expiry', 'Max Pain', 'Call Wall', 'Put Wall']
+        styles = [dict(color='lightseagreen'), dict(color='indianred'), dict(color='grey'), dict(color='black', dash='dash'), dict(color='lightseagreen', dash='dot'), dict(color='indianred', dash='dot')]
+        fig = go.Figure()
+        for i, ((x, y), name, line) in enumerate(zip(traces, names, styles)):
+            fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name=name, line=line, yaxis='y2' if i == 2 else 'y'))
+        fig.update_layout(title=title, title_x=0.5, xaxis_title='Strike Price', yaxis_title='Cumulative Open Interest', plot_bgcolor='rgb(256,256,256)',
+                          yaxis2=dict(title='Payout ($)', overlaying='y', side='right', showgrid=False), legend=dict(yanchor="top", y=1, xanchor="left", x=0))
+        fig.update_xaxes(showgrid=True, gridcolor='LightGrey')
+        fig.update_yaxes(showgrid=True, gridcolor='LightGrey')
+        if refreshed_by('storage-option-chain-raw', raw_chain):
+            return trace_data_patch(fig), summary.to_dict('records')
+        return fig, summary.to_dict('records')
 
-        stock_price = option_chain_response['underlyingPrice']
-        stock_price_110percent = stock_price * 1.1
-        stock_price_90percent = stock_price * 0.9
-        insert = []
+    @app.callback(
+        Output('gex_chart', 'figure'),
+        [Input('storage-option-chain-raw', 'data')],
+        [State('memory-ticker', 'value')]
+    )
+    @instrument('callback')
+    def on_data_set_gex(raw_chain, ticker):
+        import plotly.graph_objects as go
+        if not raw_chain:
+            raise PreventUpdate
+        chain_df, stock_price = read_raw_chain(raw_chain, apiKey=API_KEY)
+        add_rows(len(chain_df))
+        gex = gamma_exposure(chain_df, stock_price)
+        # Strike bars only within the grid, where the profile is drawn
+        in_grid = (gex['strikes'] >= gex['prices'][0]) & (gex['strikes'] <= gex['prices'][-1])
+        top = max(np.abs(gex['gex']).max(), 1.0)
+
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=gex['strikes'][in_grid], y=gex['call_gex'][in_grid], name=f'{ticker}: Call GEX by Strike', marker_color='lightseagreen', opacity=0.6))
+        fig.add_trace(go.Bar(x=gex['strikes'][in_grid], y=gex['put_gex'][in_grid], name=f'{ticker}: Put GEX by Strike', marker_color='indianred', opacity=0.6))
+        fig.add_trace(go.Scatter(x=gex['prices'], y=gex['gex'], mode='lines', name=f'{ticker}: Net GEX vs. Price', line=dict(color='black'), yaxis='y2'))
+        fig.add_trace(go.Scatter(x=[stock_price] * 2, y=[-top, top], mode='lines', name='Spot', line=dict(color='grey', dash='dot'), yaxis='y2'))
+        # Kept (empty) without a flip in range, so every refresh has the same traces to patch
+        zero_gamma = [] if np.isnan(gex['zero_gamma']) else [gex['zero_gamma']] * 2
+        fig.add_trace(go.Scatter(x=zero_gamma, y=[-top, top] if zero_gamma else [], mode='lines', name='Zero Gamma', line=dict(color='black', dash='dash'), yaxis='y2'))
+        flip = 'none in range' if np.isnan(gex['zero_gamma']) else f"{gex['zero_gamma']:.2f}"
+        fig.update_layout(title=f"Dealer Gamma Exposure (at spot: ${gex['gex_at_spot'] / 1e6:,.1f}M per 1%, zero gamma: {flip})", title_x=0.5,
+                          xaxis_title='Strike / Underlying Price', yaxis_title='GEX by Strike ($ per 1% move)', barmode='relative', plot_bgcolor='rgb(256,256,256)',
+                          yaxis2=dict(title='Net GEX ($ per 1% move)', overlaying='y', side='right', showgrid=False), legend=dict(yanchor="top", y=1, xanchor="left", x=0))
+        fig.update_xaxes(showgrid=True, gridcolor='LightGrey')
+        fig.update_yaxes(showgrid=True, gridcolor='LightGrey')
+        if refreshed_by('storage-option-chain-raw', raw_chain):
+            return trace_data_patch(fig)
+        return fig
+
+    @app.callback(
+        Output('prob_surface_chart', 'figure'),
+        [Input('storage-option-chain-raw', 'data'), Input('storage-historical', 'data'), Input('tabs_prob_surface', 'value'), Input('memory-surface-vol', 'value'), Input('memory-confidence', 'value')],
+        [State('memory-ticker', 'value')]
+    )
+    @instrument('callback')
+    def on_data_set_prob_surface(raw_chain, hist_data, tab, vol_source, confidence_lvl, ticker):
+        import plotly.graph_objects as go
+        if not raw_chain or not hist_data:
+            raise PreventUpdate
+        chain_df, stock_price = read_raw_chain(raw_chain, apiKey=API_KEY)
+        hist_volatility = hist_data.get('est_vol', 0)
+        exp_dates, exp_days, strikes, iv_grid = otm_vol_grid(chain_df, stock_price)
+        if not len(strikes) or not len(exp_days):
+            raise PreventUpdate
+        add_rows(iv_grid.size)
 
-        low_call_strike, high_call_strike, low_put_strike, high_put_strike = None, None, None, None
-        for option_chain_type in ['call', 'put']:
-            for exp_date, strikes in option_chain_response[f'{option_chain_type}ExpDateMap'].items():
-                day_diff = int(exp_date.split(':')[1])
-                if not (28 <= day_diff < 35):
-                    continue
-                high_strike_found = False
-                for strike in strikes.values():
-                    strike_price = strike[0]['strikePrice']
-                    if option_chain_type == 'call':
-                        if strike_price < stock_price_90percent:
-                            low_call_strike, low_call_strike_bid, low_call_strike_ask = strike_price, strike[0]['bid'], strike[0]['ask']
-                        elif strike_price > stock_price_110percent and not high_strike_found:
-                            high_call_strike, high_call_strike_bid, high_call_strike_ask = strike_price, strike[0]['bid'], strike[0]['ask']
-                            high_strike_found = True
-                    elif option_chain_type == 'put':
-                        if strike_price < stock_price_90percent:
-                            low_put_strike, low_put_strike_bid, low_put_strike_ask = strike_price, strike[0]['bid'], strike[0]['ask']
-                        elif strike_price > stock_price_110percent and not high_strike_found:
-                            high_put_strike, high_put_strike_bid, high_put_strike_ask = strike_price, strike[0]['bid'], strike[0]['ask']
-                            high_strike_found = True
-
-        strike_checklist = [low_call_strike, high_call_strike, low_put_strike, high_put_strike]
-        if all(item is None for item in strike_checklist):
+        if vol_source == 'implied':
+            # Fill strikes without a quote from their neighbours in the same expiry, then from the historical estimate
+            volatility = pd.DataFrame(iv_grid).interpolate(axis=1, limit_area='inside').fillna(hist_volatility).to_numpy()
+        elif hist_data.get('vol_forecast'):
+            volatility = forecast_volatility(hist_data['vol_forecast'], np.maximum(exp_days, 1))[:, None]
+        else:
+            volatility = hist_volatility
+        if not np.any(volatility):
+            raise PreventUpdate
+        surface = prob_surface(stock_price, strikes, np.maximum(exp_days, 1), volatility, confidence_lvl)
+        z = surface['prob_touch' if tab == 'prob_touch_tab' else 'prob_itm'] * 100
+        y = [f"{exp_date} ({days}d)" for exp_date, days in zip(exp_dates, exp_days)]
+        z_title = 'P(Touch) %' if tab == 'prob_touch_tab' else 'P(ITM) %'
+
+        # Tab and confidence changes keep the heatmap and bound traces, so only their data is replaced
+        if ctx.triggered_id in ('tabs_prob_surface', 'memory-confidence'):
+            patched_fig = Patch()
+            patched_fig['data'][0]['z'] = z
+            patched_fig['data'][0]['colorbar']['title']['text'] = z_title
+            patched_fig['data'][1]['x'] = surface['lower_bound']
+            patched_fig['data'][2]['x'] = surface['upper_bound']
+            return patched_fig
+
+        fig = go.Figure(go.Heatmap(x=strikes, y=y, z=z, zmin=0, zmax=100, colorscale='Viridis', colorbar={'title': {'text': z_title}}, hovertemplate='Strike %{x}<br>%{y}<br>%{z:.1f}%<extra></extra>'))
+        fig.add_trace(go.Scatter(x=surface['lower_bound'], y=y, mode='lines', name='Lower Bound', line=dict(color='white', dash='dash')))
+        fig.add_trace(go.Scatter(x=surface['upper_bound'], y=y, mode='lines', name='Upper Bound', line=dict(color='white', dash='dash')))
+        fig.update_layout(title=f'Probability Surface - {ticker}', title_x=0.5, xaxis_title='Strike Price', yaxis_title='Expiry', showlegend=False)
+        if refreshed_by('storage-option-chain-raw', raw_chain):
+            return trace_data_patch(fig)
+        return fig
+
+    @app.callback(
+        Output('ticker-data-table', 'data'),
+        [Input('storage-option-chain-raw', 'data'), Input('ticker-data-table', "page_current"), Input('ticker-data-table', "page_size"), Input('ticker-data-table', "sort_by")],
+        [State('memory-ticker', 'value')]
+    )
+    @instrument('callback')
+    def on_data_set_ticker_table(raw_chain, page_current, page_size, sort_by, ticker):
+        if ticker is None or not raw_chain:
+            raise PreventUpdate
+        chain_df, stock_price = read_raw_chain(raw_chain, apiKey=API_KEY)
+        add_rows(len(chain_df))
+        skew_df = skew_term_structure(chain_df, stock_price)
+        if skew_df.empty:
             raise PreventUpdate
 
-        prevent_zero_div = lambda x, y: 0 if (y == 0 or y is None) else x / y
-        high_call_strike_askbid = prevent_zero_div(high_call_strike_ask, high_call_strike_bid)
-        high_put_strike_askbid = prevent_zero_div(high_put_strike_ask, high_put_strike_bid)
-        low_call_strike_askbid = prevent_zero_div(low_call_strike_ask, low_call_strike_bid)
-        low_put_strike_askbid = prevent_zero_div(low_put_strike_ask, low_put_strike_bid)
-        askbid_checklist = [high_call_strike_askbid, high_put_strike_askbid, low_call_strike_askbid, low_put_strike_askbid]
-        liquidity = 'FAILED' if all(askbid > 1.25 for askbid in askbid_checklist) else 'PASSED'
-
-        high_call_strike_midpoint = (high_call_strike_bid + high_call_strike_ask) / 2
-        high_put_strike_midpoint = (high_put_strike_bid + high_put_strike_ask) / 2
-        low_call_strike_midpoint = (low_call_strike_bid + low_call_strike_ask) / 2
-        low_put_strike_midpoint = (low_put_strike_bid + low_put_strike_ask) / 2
-        call_110percent_price = low_call_strike_midpoint - (low_call_strike_midpoint - high_call_strike_midpoint) / (high_call_strike - low_call_strike) * (stock_price_110percent - low_call_strike)
-        put_90percent_price = low_put_strike_midpoint + (high_put_strike_midpoint - low_put_strike_midpoint) / (high_put_strike - low_put_strike) * (stock_price_90percent - low_put_strike)
-
-        skew_category = 'Put Skew' if put_90percent_price > call_110percent_price else 'Call Skew'
-        skew = round(put_90percent_price / call_110percent_price, 3) if put_90percent_price > call_110percent_price else round(call_110percent_price / put_90percent_price, 3)
-        insert.append([ticker, skew_category, skew, liquidity])
-
-        df = pd.DataFrame(insert, columns=[col['id'] for col in ticker_df_columns])
+        skew_df.insert(0, 'ticker', raw_chain['ticker'])
+        df = skew_df[[col['id'] for col in ticker_df_columns]]
         dff = df.sort_values([col['column_id'] for col in sort_by], ascending=[col['direction'] == 'asc' for col in sort_by], inplace=False) if sort_by else df
         return dff.iloc[page_current * page_size:(page_current + 1) * page_size].to_dict('records')
 
@@ -331,10 +656,12 @@ def register_callbacks(app, API_KEY):
         [Input('submit-button-state', 'n_clicks'), Input('storage-option-chain-all', 'data'), Input('storage-historical', 'data'), Input('option-chain-table', "page_current"), Input('option-chain-table', "page_size"), Input('option-chain-table', "sort_by")],
         [State('memory-roi', 'value'), State('memory-delta', 'value')]
     )
+    @instrument('callback')
     def on_data_set_table(n_clicks, optionchain_data, hist_data, page_current, page_size, sort_by, roi_selection, delta_range):
         if hist_data is None or optionchain_data is None:
             raise PreventUpdate
-        base_df = pd.read_json(optionchain_data, convert_dates=['Exp. Date (Local)'], orient='split')
+        base_df = read_scored_chain(optionchain_data)
+        add_rows(len(base_df))
         df = base_df.loc[(base_df['ROI'] >= roi_selection) & (base_df['Delta'].abs() <= delta_range)]
         df = df.loc[((df['Type'] == 'CALL') & (df['Strike'] >= df['Upper CI'])) | ((df['Type'] == 'PUT') & (df['Strike'] <= df['Lower CI']))]
         df = df.drop(columns=['Upper CI', 'Lower CI'])
@@ -344,3 +671,29 @@ def register_callbacks(app, API_KEY):
         df.columns = [col['id'] for col in option_chain_df_columns]
         dff = df.sort_values([col['column_id'] for col in sort_by], ascending=[col['direction'] == 'asc' for col in sort_by], inplace=False) if sort_by else df
         return dff.iloc[page_current * page_size:(page_current + 1) * page_size].to_dict('records')
+
+    @app.callback(
+        Output('strategy-table', 'data'),
+        [Input('storage-option-chain-raw', 'data'), Input('storage-historical', 'data'), Input('memory-strategy-type', 'value'), Input('strategy-table', "page_current"), Input('strategy-table', "page_size"), Input('strategy-table', "sort_by")],
+        [State('memory-delta', 'value'), State('memory-expdays', 'value'), State('memory-confidence', 'value')]
+    )
+    @instrument('callback')
+    def on_data_set_strategy_table(raw_chain, hist_data, strategies, page_current, page_size, sort_by, delta_range, expday_range, confidence_lvl):
+        if not raw_chain or not hist_data or not strategies:
+            raise PreventUpdate
+        chain_df, stock_price = read_raw_chain(raw_chain, apiKey=API_KEY)
+        # Structures must clear the selected confidence level as probability of profit
+        strategy_df = search_strategies(chain_df, stock_price, hist_data.get('est_vol', 0), expday_range, strategies=strategies, max_delta=delta_range, min_pop=confidence_lvl)
+        add_rows(len(strategy_df))
+
+        # Legs are only formatted for the visible page, so sorting on them sorts by the short strikes
+        sort_cols, ascending = [], []
+        for col in sort_by or []:
+            for column in (['short_put', 'short_call'] if col['column_id'] == 'legs' else [col['column_id']]):
+                sort_cols.append(column)
+                ascending.append(col['direction'] == 'asc')
+        dff = strategy_df.sort_values(sort_cols, ascending=ascending) if sort_cols else strategy_df
+        page = dff.iloc[page_current * page_size:(page_current + 1) * page_size].copy()
+        page['legs'] = format_legs(page) if not page.empty else []
+        page['credit'] = page['credit'].round(2)
+        return page[[col['id'] for col in strategy_df_columns]].to_dict('records')
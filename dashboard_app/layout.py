@@ -1,3 +1,5 @@
+import uuid
+
 from dash import dash_table
 from dash.dash_table.Format import Format, Scheme
 from dash.dash_table import FormatTemplate
@@ -5,6 +7,8 @@ from dash import dcc
 from dash import html
 import dash_bootstrap_components as dbc
 
+from lib.strategies import STRATEGIES
+
 # Data Table Properties
 PAGE_SIZE = 30
 
@@ -17,8 +21,13 @@ percentage = FormatTemplate.percentage(2)
 # Define column names in Ticker Pandas Dataframe
 ticker_df_columns=[
     dict(id='ticker', name='Ticker'),
+    dict(id='exp_date', name='Exp. Date'),
+    dict(id='exp_days', name='Exp. Days'),
     dict(id='skew_category', name='Skew Category'),
     dict(id='skew', name='Skew'),
+    dict(id='call_price', name='10% OTM Call', type='numeric', format=money_full),
+    dict(id='put_price', name='10% OTM Put', type='numeric', format=money_full),
+    dict(id='spread', name='Bid/Ask Spread', type='numeric', format=percentage),
     dict(id='liquidity', name='Liquidity'),
 ]
 
@@ -60,14 +69,45 @@ base_df_columns=[
     dict(id='upper_bound', name='Upper CI')
 ]
 
+# Define column names in Strategy Search Dataframe
+strategy_df_columns=[
+    dict(id='strategy', name='Strategy'),
+    dict(id='exp_date', name='Exp. Date'),
+    dict(id='exp_days', name='Exp. Days'),
+    dict(id='legs', name='Legs'),
+    dict(id='credit', name='Credit', type='numeric', format=money_full),
+    dict(id='max_profit', name='Max Profit', type='numeric', format=money),
+    dict(id='risk', name='Risk', type='numeric', format=money),
+    dict(id='breakeven_lo', name='Lower B/E', type='numeric', format=money_full),
+    dict(id='breakeven_hi', name='Upper B/E', type='numeric', format=money_full),
+    dict(id='pop', name='Prob. of Profit', type='numeric', format=percentage),
+    dict(id='return_on_risk', name='Return on Risk', type='numeric', format=percentage)
+]
+
+# Define column names in Open Interest Summary Dataframe
+oi_summary_df_columns=[
+    dict(id='exp_date', name='Exp. Date'),
+    dict(id='exp_days', name='Exp. Days'),
+    dict(id='max_pain', name='Max Pain', type='numeric', format=money_full),
+    dict(id='call_wall', name='Call Wall', type='numeric', format=money_full),
+    dict(id='call_wall_oi', name='Call Wall OI', type='numeric', format=Format().group(True)),
+    dict(id='put_wall', name='Put Wall', type='numeric', format=money_full),
+    dict(id='put_wall_oi', name='Put Wall OI', type='numeric', format=Format().group(True)),
+    dict(id='call_oi', name='Call OI', type='numeric', format=Format().group(True)),
+    dict(id='put_oi', name='Put OI', type='numeric', format=Format().group(True)),
+    dict(id='put_call_ratio', name='Put/Call OI', type='numeric', format=decimal2)
+]
+
 # ------------------------------------------------------------------------------
 # App layout
 
-app_layout = html.Div([
+page_layout = html.Div([
 
     dcc.Store(id='storage-historical'),
     dcc.Store(id='storage-quotes'),
     dcc.Store(id='storage-option-chain-all'),
+    dcc.Store(id='storage-option-chain-raw'),
+    dcc.Interval(id='auto-refresh-interval', interval=60000, disabled=True),
     dbc.Navbar(
         [
             html.A(
@@ -181,7 +221,12 @@ app_layout = html.Div([
                                             {"label": "Hodges Tompkins", "value": "hodges_tompkins"},
                                             {"label": "Parkinson", "value": "parkinson"},
                                             {"label": "Rogers Satchell", "value": "rogers_satchell"},
-                                            {"label": "Yang Zhang", "value": "yang_zhang"}],
+                                            {"label": "Yang Zhang", "value": "yang_zhang"},
+                                            {"label": "EWMA (forecast)", "value": "ewma"},
+                                            {"label": "GARCH(1,1) (forecast)", "value": "garch"},
+                                            {"label": "Realized Variance (intraday)", "value": "realized_variance"},
+                                            {"label": "Bipower Variation (intraday)", "value": "bipower"},
+                                            {"label": "Two-Scale RV (intraday)", "value": "two_scale"}],
                                         multi=False,
                                         value="log_returns"
                                     )
@@ -263,7 +308,25 @@ app_layout = html.Div([
                                 # style={'width': '30%', 'display': 'inline-block'}
                             )
                         ),
-                        dbc.Col()
+                        dbc.Col(
+                            html.Div([
+                                html.H5("Auto Refresh:"),
+                                dcc.Dropdown(
+                                        id="memory-refresh-interval",
+                                        options=[
+                                            {"label": "Off", "value": 0},
+                                            {"label": "Every 30 Seconds", "value": 30},
+                                            {"label": "Every Minute", "value": 60},
+                                            {"label": "Every 5 Minutes", "value": 300}
+                                        ],
+                                        multi=False,
+                                        value=0
+                                    ),
+                                # Stock price and time the option chain table is scored at (kept by auto refresh)
+                                html.Small(id="refresh-anchor", className="text-muted")
+                                ],
+                            )
+                        )
                     ]
                 ),          
         ],
@@ -319,6 +382,8 @@ app_layout = html.Div([
             dcc.Tabs(id='tabs_prob_chart', value='prob_cone_tab', children=[
                 dcc.Tab(label='Historical Volatility', value='prob_cone_tab', className='custom-tab'), 
                 dcc.Tab(label='GBM Simulation', value='gbm_sim_tab', className='custom-tab'),
+                dcc.Tab(label='Jump Diffusion', value='merton_sim_tab', className='custom-tab'),
+                dcc.Tab(label='Stochastic Vol.', value='heston_sim_tab', className='custom-tab'),
             ]),
             dcc.Loading(
                 id="loading_prob_cone",
@@ -392,12 +457,97 @@ app_layout = html.Div([
 
     
 
+    html.Div([
+        dcc.Loading(
+            id="loading_oi_profile",
+            type="default",
+            children=html.Div([
+                dcc.Graph(
+                    id='oi_profile_chart',
+                    figure={
+                        'layout':{'title': {'text':'Max Pain / Open Interest Walls'}}
+                    },
+                    config={"displayModeBar": False, "scrollZoom": True}
+                ),
+                dash_table.DataTable(
+                    id='oi-summary-table',
+                    columns=oi_summary_df_columns,
+                    page_size=PAGE_SIZE,
+                    sort_action='native',
+                    style_cell={'textAlign': 'left'},
+                    style_data_conditional=[
+                        {
+                            'if': {'row_index': 'odd'},
+                            'backgroundColor': 'rgb(248, 248, 248)'
+                        }
+                    ],
+                    style_header={
+                        'backgroundColor': 'rgb(230, 230, 230)',
+                        'fontWeight': 'bold'
+                    }
+                )
+            ])
+        )
+    ],
+    className="pretty_container"
+    ),
+
+    html.Div([
+        dcc.Loading(
+            id="loading_gex",
+            type="default",
+            children=html.Div([
+                dcc.Graph(
+                    id='gex_chart',
+                    figure={
+                        'layout':{'title': {'text':'Dealer Gamma Exposure'}}
+                    },
+                    config={"displayModeBar": False, "scrollZoom": True}
+                )
+            ])
+        )
+    ],
+    className="pretty_container"
+    ),
+
+    html.Div([
+        dcc.Tabs(id='tabs_prob_surface', value='prob_itm_tab', children=[
+            dcc.Tab(label='Probability ITM', value='prob_itm_tab', className='custom-tab'),
+            dcc.Tab(label='Probability of Touch', value='prob_touch_tab', className='custom-tab'),
+        ]),
+        dcc.RadioItems(
+            id='memory-surface-vol',
+            options=[
+                {'label': 'Historical Volatility', 'value': 'hist'},
+                {'label': 'Implied Volatility', 'value': 'implied'}
+            ],
+            value='hist',
+            labelStyle={'display': 'inline-block', 'padding-right': '20px'},
+            style={'padding-top': '10px'}
+        ),
+        dcc.Loading(
+            id="loading_prob_surface",
+            type="default",
+            children=html.Div([
+                dcc.Graph(
+                    id='prob_surface_chart',
+                    figure={
+                        'layout':{'title': {'text':'Probability Surface'}}
+                    },
+                    config={"displayModeBar": False, "scrollZoom": True}
+                )
+            ])
+        )
+    ],
+    className="pretty_container"
+    ),
+
     html.Div([
         html.H5("Ticker Data \u2754", id='ticker_data'), # Source: https://unicode.org/emoji/charts/full-emoji-list.html
         dbc.Collapse(
             
             dbc.Card(dbc.CardBody(dcc.Markdown('''
-            Call skew is defined as the price of 10% OTM calls/10% OTM puts for the next monthly option expiry.  \n
+            Call skew is defined as the price of 10% OTM calls/10% OTM puts, listed for every option expiry in the chain.  \n
             A call skew of 1.3 means the 10% OTM call is 1.3x the price of 10% OTM put.  \n
             Potential Causes of Call Skew: 
             * Unusual and extreme speculation of stocks. Eg: TSLA battery day
@@ -405,8 +555,9 @@ app_layout = html.Div([
             * High demand/Low supply for calls, driving up call prices. 
             * Low demand/High supply for puts, driving down put prices.
               \n
-            Put skew is defined as the price of 10% OTM puts/10% OTM calls for the next monthly option expiry.  \n
+            Put skew is defined as the price of 10% OTM puts/10% OTM calls, listed for every option expiry in the chain.  \n
             A put skew of 2.1 means the 10% OTM put is 2.1x the price of 10% OTM call.  \n
+            Prices are interpolated between the strikes bracketing 90%/110% of the stock price. Liquidity fails when the ask/bid ratio of all bracketing contracts exceeds 1.25.  \n
             Potential Causes of Put Skew:
             * Insitutions using the Collar strategy, buying puts and selling calls to limit downside at the cost of upside.
             * High demand/Low supply for puts, driving up put prices. Usual occurence during bear markets.
@@ -510,5 +661,53 @@ app_layout = html.Div([
             'padding': '10px 5px',
             'margin': 'auto'
             }
+    ),
+
+    html.Div([
+        html.H5("Strategy Search"),
+        dcc.Dropdown(
+            id="memory-strategy-type",
+            options=[{"label": strategy, "value": strategy} for strategy in STRATEGIES],
+            multi=True,
+            value=STRATEGIES,
+            style={'padding-bottom': '10px'}
+        ),
+        dcc.Loading(
+                id="loading_strategy-table",
+                type="default",
+                children=html.Div([
+                    dash_table.DataTable(
+                        id='strategy-table',
+                        columns=strategy_df_columns,
+                        page_current=0,
+                        page_size=PAGE_SIZE,
+                        page_action='custom',
+                        sort_action='custom',
+                        sort_mode='multi',
+                        sort_by=[],
+                        style_cell={'textAlign': 'left'},
+                        style_data_conditional=[
+                            {
+                                'if': {'row_index': 'odd'},
+                                'backgroundColor': 'rgb(248, 248, 248)'
+                            }
+                        ],
+                        style_header={
+                            'backgroundColor': 'rgb(230, 230, 230)',
+                            'fontWeight': 'bold'
+                        }
+                    )
+                ])
+            ),
+        ],
+        style={
+            'max-width': '1450px',
+            'padding': '10px 5px',
+            'margin': 'auto'
+            }
     )
-])
\ No newline at end of file
+])
+
+# Served per page load, so every browser tab gets its own session id (the scope of its price chart prefetches)
+def app_layout():
+    return html.Div([dcc.Store(id='session-id', data=uuid.uuid4().hex), page_layout])
@@ -0,0 +1,37 @@
+# Gunicorn settings for serving wsgi:server in production
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('DASHBOARD_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('DASHBOARD_THREADS', 4))
+
+# Import the app once in the master so workers fork with it already loaded (copy-on-write, no per-worker import cost)
+preload_app = True
+
+# Every worker publishes its metrics here, so /metrics reports the whole server whichever worker answers it
+os.environ.setdefault('DASHBOARD_METRICS_DIR', tempfile.mkdtemp(prefix='dashboard_metrics_'))
+
+
+def on_starting(server):
+    # Counts of a previous server run sharing the directory would be summed with this one's
+    for path in glob.glob(os.path.join(os.environ['DASHBOARD_METRICS_DIR'], 'metrics_*.json')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    # Threads started while preloading don't survive the fork; restart the sampling profiler in every worker
+    from lib.metrics import _profiler, start_metrics_publisher
+    if _profiler is not None:
+        _profiler.start()
+    start_metrics_publisher()
+
+# Option chain fetches for large tickers can take tens of seconds
+timeout = int(os.environ.get('DASHBOARD_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
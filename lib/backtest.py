@@ -0,0 +1,244 @@
+"""Vectorized backtest of the dashboard's premium-selling rule over historical option chains.
+
+The rule is the one applied by the option chain table: sell a contract when its ROI (bid / strike) clears a threshold,
+its |delta| is within a limit and its strike lies outside the prob_cone interval at a confidence level. Every
+(ROI, delta, confidence) combination of a parameter grid is evaluated at once over every entry date.
+
+Usage (from the repository root):
+    python -m lib.backtest AAPL --warehouse ~/.options_dashboard/chain_snapshots.db
+    python -m lib.backtest AAPL --synthetic --roi 0.5 1 2 --delta 0.2 0.3 --confidence 0.5 0.7 0.9
+"""
+import argparse
+import datetime
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from lib.stats import black_scholes, get_hist_volatility
+
+# One row per contract quoted at an entry date, with the market state the rule sees and the settlement it gets
+HISTORY_COLUMNS = ['entry_time', 'expiration', 'exp_days', 'put_call', 'strike_price', 'bid', 'delta', 'stock_price', 'volatility', 'settle_price']
+
+RESULT_COLUMNS = ['roi', 'delta', 'confidence', 'trades', 'assigned', 'win_rate', 'total_pnl', 'avg_return', 'max_drawdown']
+
+MS_PER_DAY = 86_400_000
+
+# Daily candles are stamped at the start of their session in exchange time (midnight America/New_York)
+MARKET_TZ = 'America/New_York'
+
+# Parameter combinations x contracts evaluated per chunk (bounds the size of the boolean rule matrices)
+CHUNK_CELLS = 4_000_000
+
+def attach_market(chain_df: pd.DataFrame, price_df: pd.DataFrame, window: int = 30, estimator: str = 'log_returns') -> pd.DataFrame:
+    """Add the stock price and historical volatility known at entry and the closing price at expiry to each row.
+
+    chain_df needs entry_time and expiration (epoch ms); price_df is daily candles as returned by tos_get_price_hist.
+    Rows entered before the volatility window fills or expiring after the last candle are dropped.
+    """
+    candle_time = price_df['datetime'].to_numpy(dtype=np.int64)
+    close = price_df['close'].to_numpy(dtype=np.float64)
+    volatility = get_hist_volatility(price_df, window, estimator=estimator, clean=False).to_numpy(dtype=np.float64)
+
+    # Latest candle at or before each entry / expiry time
+    entry_idx = np.searchsorted(candle_time, chain_df['entry_time'].to_numpy(dtype=np.int64), side='right') - 1
+    settle_idx = np.searchsorted(candle_time, chain_df['expiration'].to_numpy(dtype=np.int64), side='right') - 1
+    settled = chain_df['expiration'].to_numpy(dtype=np.int64) <= candle_time[-1]
+
+    history = chain_df.assign(
+        stock_price=close[np.maximum(entry_idx, 0)],
+        volatility=volatility[np.maximum(entry_idx, 0)],
+        settle_price=close[np.maximum(settle_idx, 0)],
+    )
+    keep = (entry_idx >= 0) & settled & np.isfinite(history['volatility'].to_numpy()) & (history['exp_days'].to_numpy() > 0)
+    return history.loc[keep, HISTORY_COLUMNS].reset_index(drop=True)
+
+def synthetic_chain_history(price_df: pd.DataFrame, exp_days=(7, 14, 28), entry_every: int = 5, n_strikes: int = 20, strike_step: float = 0.025,
+                            iv_premium: float = 1.1, spread: float = 0.05, window: int = 30, estimator: str = 'log_returns') -> pd.DataFrame:
+    """Build chains from daily candles: n_strikes strikes each side of spot, priced with Black-Scholes at iv_premium x historical vol.
+
+    A chain is listed every entry_every candles with expiries exp_days calendar days out; bids are the model price less
+    half of spread.
+    """
+    candle_time = price_df['datetime'].to_numpy(dtype=np.int64)
+    close = price_df['close'].to_numpy(dtype=np.float64)
+    volatility = get_hist_volatility(price_df, window, estimator=estimator, clean=False).to_numpy(dtype=np.float64)
+    entries = np.arange(window, len(close), entry_every)
+    entries = entries[np.isfinite(volatility[entries])]
+
+    # Grid axes: entry x expiry x strike offset x (call, put)
+    exp_days = np.asarray(exp_days, dtype=np.int64)
+    offsets = np.arange(-n_strikes, n_strikes + 1) * strike_step
+    is_call = np.array([True, False])
+    shape = (len(entries), len(exp_days), len(offsets), 2)
+    e, d, k, c = (np.broadcast_to(a, shape) for a in np.ix_(entries, exp_days, offsets, is_call))
+    spot = close[e]
+    strikes = np.round(spot * (1 + k), 2)
+    price, delta = black_scholes(spot, strikes, d, volatility[e] * iv_premium, c)
+
+    chain_df = pd.DataFrame({
+        'entry_time': candle_time[e].ravel(),
+        'expiration': (candle_time[e] + d * MS_PER_DAY).ravel(),
+        'exp_days': d.ravel(),
+        'put_call': np.where(c, 'CALL', 'PUT').ravel(),
+        'strike_price': strikes.ravel(),
+        'bid': np.round(price * (1 - spread / 2), 2).ravel(),
+        'delta': delta.ravel(),
+    })
+    return attach_market(chain_df, price_df, window=window, estimator=estimator)
+
+def warehouse_chain_history(warehouse, ticker: str, price_df: pd.DataFrame, start_time=0, end_time=None, window: int = 30, estimator: str = 'log_returns') -> pd.DataFrame:
+    """Chain history from the snapshots stored in an OptionChainWarehouse (every snapshot is a potential entry).
+
+    Contracts settle at the close of the candle of their expiration date's session (price_df as from tos_get_price_hist,
+    stamped at midnight exchange time).
+    """
+    end_time = end_time if end_time is not None else datetime.datetime.now().timestamp() * 1000
+    stored = warehouse.query_range(ticker, start_time, end_time)
+    if stored.empty:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    entry_time = stored['snapshot_time'].to_numpy(dtype=np.int64)
+    # The expiry date's session start in exchange time, i.e. the stamp of the candle whose close settles the contract
+    expiration = pd.DatetimeIndex(pd.to_datetime(stored['expiration_date'])).tz_localize(MARKET_TZ).as_unit('ms').asi8
+    chain_df = pd.DataFrame({
+        'entry_time': entry_time,
+        'expiration': expiration,
+        'exp_days': (expiration - entry_time) // MS_PER_DAY,
+        'put_call': stored['put_call'].to_numpy(),
+        'strike_price': stored['strike_price'].to_numpy(dtype=np.float64),
+        'bid': stored['bid'].to_numpy(dtype=np.float64),
+        'delta': stored['delta'].to_numpy(dtype=np.float64),
+    })
+    return attach_market(chain_df, price_df, window=window, estimator=estimator)
+
+def _trade_arrays(history: pd.DataFrame, multiplier: int = 100, trading_periods: int = 252) -> dict:
+    # Rule inputs and the outcome of selling each contract, computed once and shared by every parameter combination
+    strike = history['strike_price'].to_numpy(dtype=np.float64)
+    bid = history['bid'].to_numpy(dtype=np.float64)
+    spot = history['stock_price'].to_numpy(dtype=np.float64)
+    settle = history['settle_price'].to_numpy(dtype=np.float64)
+    is_call = history['put_call'].to_numpy() == 'CALL'
+    std_move = spot * history['volatility'].to_numpy(dtype=np.float64) * np.sqrt(history['exp_days'].to_numpy(dtype=np.float64) / trading_periods)
+    intrinsic = np.where(is_call, np.maximum(settle - strike, 0), np.maximum(strike - settle, 0))
+    pnl = (bid - intrinsic) * multiplier
+    return {
+        'roi': bid / strike * 100,
+        'abs_delta': np.abs(history['delta'].to_numpy(dtype=np.float64)),
+        # Distance of the strike beyond spot in standard moves; the strike is outside the prob_cone interval when >= z
+        'cone_z': np.where(is_call, strike - spot, spot - strike) / std_move,
+        'pnl': pnl,
+        'return': pnl / (strike * multiplier),
+        'assigned': intrinsic > 0,
+    }
+
+def _evaluate_chunk(arrays, roi, delta, z_score, segment_starts, order, settle_ends, selection):
+    n = len(arrays['pnl'])
+    mask = (arrays['roi'][None, :] >= roi[:, None]) & (arrays['abs_delta'][None, :] <= delta[:, None]) & (arrays['cone_z'][None, :] >= z_score[:, None])
+    if selection == 'best':
+        # Rows are sorted by (entry, type, ROI desc), so the first qualifying row of each segment is the best-ROI trade
+        candidate = np.where(mask, np.arange(n)[None, :], n)
+        first = np.minimum.reduceat(candidate, segment_starts, axis=1)
+        mask = np.zeros_like(mask)
+        rows, cols = np.nonzero(first < n)
+        mask[rows, first[rows, cols]] = True
+
+    pnl, returns = arrays['pnl'], arrays['return']
+    trades = mask.sum(axis=1)
+    total_pnl = mask @ pnl
+    # Equity curve in settlement order, starting from zero, sampled once per settlement time
+    equity = np.cumsum(mask[:, order] * pnl[order][None, :], axis=1)[:, settle_ends]
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'trades': trades,
+            'assigned': (mask & arrays['assigned'][None, :]).sum(axis=1),
+            'win_rate': (mask & (pnl > 0)[None, :]).sum(axis=1) / trades,
+            'total_pnl': total_pnl,
+            'avg_return': (mask @ returns) / trades,
+            'max_drawdown': (peak - equity).max(axis=1) if n else np.zeros(len(roi)),
+        }
+
+def backtest(history: pd.DataFrame, roi=(1.0,), delta=(1.0,), confidence=(0.3,), selection: str = 'best', multiplier: int = 100, workers: int = None) -> pd.DataFrame:
+    """Replay the ROI / delta / prob_cone rule over a chain history for every combination of the parameter grids.
+
+    Args:
+        history (DataFrame): HISTORY_COLUMNS rows, e.g. from synthetic_chain_history or warehouse_chain_history.
+        roi, delta, confidence: Grids of the minimum ROI (%), maximum |delta| and prob_cone confidence level.
+        selection (str): 'best' sells the highest-ROI qualifying call and put at each entry, 'all' every qualifying contract.
+        multiplier (int): Shares per contract.
+        workers (int): Threads evaluating parameter chunks (NumPy releases the GIL for the heavy array work).
+
+    Trades are held to expiry and settled at the closing price: an ITM short option is assigned and its intrinsic value
+    is charged against the premium. Returns RESULT_COLUMNS, one row per parameter combination.
+    """
+    from scipy.special import ndtri
+
+    if selection not in ('best', 'all'):
+        raise ValueError(f"Unknown selection: {selection}")
+    grid = np.array(np.meshgrid(roi, delta, confidence, indexing='ij'), dtype=np.float64).reshape(3, -1)
+    history = history.assign(_roi=history['bid'] / history['strike_price']).sort_values(['entry_time', 'put_call', '_roi'], ascending=[True, True, False], kind='stable')
+    arrays = _trade_arrays(history, multiplier=multiplier)
+
+    keys = history[['entry_time', 'put_call']]
+    segment_starts = np.flatnonzero((keys != keys.shift()).any(axis=1).to_numpy()) if len(history) else np.zeros(0, dtype=np.intp)
+    order = np.argsort(history['expiration'].to_numpy(), kind='stable')
+    settle_times = history['expiration'].to_numpy()[order]
+    settle_ends = np.flatnonzero(np.append(settle_times[1:] != settle_times[:-1], True)) if len(history) else np.zeros(0, dtype=np.intp)
+    z_score = ndtri(1 - ((1 - grid[2]) / 2))
+
+    chunk = max(1, CHUNK_CELLS // max(len(history), 1))
+    bounds = [(i, min(i + chunk, grid.shape[1])) for i in range(0, grid.shape[1], chunk)]
+    if not len(history):
+        parts = [{col: np.zeros(hi - lo) for col in RESULT_COLUMNS[3:]} for lo, hi in bounds]
+    else:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            parts = list(pool.map(lambda b: _evaluate_chunk(arrays, grid[0, b[0]:b[1]], grid[1, b[0]:b[1]], z_score[b[0]:b[1]], segment_starts, order, settle_ends, selection), bounds))
+
+    result = pd.DataFrame({'roi': grid[0], 'delta': grid[1], 'confidence': grid[2]})
+    for col in RESULT_COLUMNS[3:]:
+        result[col] = np.concatenate([part[col] for part in parts])
+    return result[RESULT_COLUMNS]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the dashboard's premium-selling rule")
+    parser.add_argument('ticker')
+    parser.add_argument('--warehouse', help="Replay chains stored in this SQLite warehouse (default: synthetic chains)")
+    parser.add_argument('--synthetic', action='store_true', help="Price synthetic chains from the candle history")
+    parser.add_argument('--years', type=int, default=5, help="Years of daily candles to fetch when none are stored")
+    parser.add_argument('--roi', type=float, nargs='+', default=[0.5, 1.0, 2.0, 3.0])
+    parser.add_argument('--delta', type=float, nargs='+', default=[0.2, 0.3, 0.4, 1.0])
+    parser.add_argument('--confidence', type=float, nargs='+', default=[0.3, 0.5, 0.7, 0.9])
+    parser.add_argument('--selection', choices=['best', 'all'], default='best')
+    parser.add_argument('--window', type=int, default=30, help="Historical volatility window")
+    parser.add_argument('--estimator', default='log_returns', help="Historical volatility estimator")
+    args = parser.parse_args(argv)
+
+    warehouse = None
+    price_df = pd.DataFrame()
+    if args.warehouse:
+        from lib.chain_warehouse import OptionChainWarehouse
+        warehouse = OptionChainWarehouse(path=os.path.expanduser(args.warehouse))
+        price_df = warehouse.query_candles(args.ticker)
+    if price_df.empty:
+        from lib.tos_api_calls import tos_get_price_hist
+        start = (datetime.date.today() - datetime.timedelta(days=365 * args.years)).strftime('%Y-%m-%d')
+        price_df = tos_get_price_hist(args.ticker, startDate=start, apiKey=os.environ.get('POLYGON_API_KEY'))['candles'].to_frame()
+    if price_df.empty:
+        print(f"No candles available for {args.ticker}")
+        return 1
+
+    if warehouse is not None and not args.synthetic:
+        history = warehouse_chain_history(warehouse, args.ticker, price_df, window=args.window, estimator=args.estimator)
+    else:
+        history = synthetic_chain_history(price_df, window=args.window, estimator=args.estimator)
+    print(f"{len(history)} contracts across {history['entry_time'].nunique()} entry dates")
+
+    result = backtest(history, roi=args.roi, delta=args.delta, confidence=args.confidence, selection=args.selection)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(result.sort_values('total_pnl', ascending=False).to_string(index=False, float_format='{:.3f}'.format))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
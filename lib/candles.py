@@ -0,0 +1,138 @@
+import base64
+import struct
+
+import numpy as np
+import pandas as pd
+
+# Price/volume fields, stored as the rows of one (5, n) float64 block so every field is a contiguous view
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+FIELDS = ('datetime',) + PRICE_FIELDS
+
+# Binary layout: magic, format version, 3 pad bytes, candle count, then int64 datetimes and the float64 block (little-endian)
+_HEADER = struct.Struct('<4sB3xQ')
+_MAGIC = b'CNDL'
+_VERSION = 1
+
+
+class Candles:
+    """Columnar OHLCV candles: int64 epoch-ms datetimes and a contiguous float64 block of open/high/low/close/volume.
+
+    Field access (candles['close'] or candles.close), positional slices, time slices (between) and to_frame() all
+    return views of the same memory; to_bytes()/from_bytes() round-trip through a compact binary format without
+    copying on load.
+    """
+
+    __slots__ = ('datetime', 'values')
+
+    def __init__(self, datetime, values):
+        self.datetime = np.asarray(datetime, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        # A positional slice of the block keeps contiguous rows; only copy when a row itself is strided
+        if values.ndim != 2 or values.strides[1] != values.itemsize:
+            values = np.ascontiguousarray(values).reshape(len(PRICE_FIELDS), -1)
+        self.values = values
+
+    @classmethod
+    def from_columns(cls, datetime, open, high, low, close, volume):
+        return cls(datetime, np.vstack([open, high, low, close, volume]))
+
+    @classmethod
+    def from_records(cls, candles):
+        """Build from the list of candle dicts returned by tos_get_price_hist (or a Candles, returned as is)."""
+        if isinstance(candles, Candles):
+            return candles
+        n = len(candles)
+        values = np.empty((len(PRICE_FIELDS), n), dtype=np.float64)
+        for i, field in enumerate(PRICE_FIELDS):
+            values[i] = np.fromiter((candle[field] for candle in candles), dtype=np.float64, count=n)
+        return cls(np.fromiter((candle['datetime'] for candle in candles), dtype=np.int64, count=n), values)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.int64), np.empty((len(PRICE_FIELDS), 0)))
+
+    @classmethod
+    def from_frame(cls, price_df):
+        return cls(price_df['datetime'].to_numpy(dtype=np.int64), price_df[list(PRICE_FIELDS)].to_numpy(dtype=np.float64).T)
+
+    def __len__(self):
+        return len(self.datetime)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key == 'datetime':
+                return self.datetime
+            if key not in PRICE_FIELDS:
+                raise KeyError(key)
+            return self.values[PRICE_FIELDS.index(key)]
+        if isinstance(key, slice):
+            return Candles(self.datetime[key], self.values[:, key])
+        raise TypeError(f"Candles indices must be field names or slices, not {type(key).__name__}")
+
+    def __getattr__(self, name):
+        if name in PRICE_FIELDS:
+            return self.values[PRICE_FIELDS.index(name)]
+        raise AttributeError(name)
+
+    def __getstate__(self):
+        return self.to_bytes()
+
+    def __setstate__(self, state):
+        loaded = Candles.from_bytes(state)
+        self.datetime, self.values = loaded.datetime, loaded.values
+
+    @property
+    def nbytes(self):
+        return self.datetime.nbytes + self.values.nbytes
+
+    def times(self):
+        """Datetimes as a datetime64[ms] view."""
+        return self.datetime.view('datetime64[ms]')
+
+    def between(self, start=None, end=None):
+        """View of the candles with start <= datetime <= end (epoch ms, datetime or Timestamp; None is open-ended)."""
+        lo = 0 if start is None else np.searchsorted(self.datetime, _epoch_ms(start), side='left')
+        hi = len(self) if end is None else np.searchsorted(self.datetime, _epoch_ms(end), side='right')
+        return self[lo:hi]
+
+    def to_frame(self):
+        """DataFrame with the tos_get_price_hist columns whose columns are views of these arrays."""
+        columns = {'datetime': self.datetime}
+        columns.update((field, self.values[i]) for i, field in enumerate(PRICE_FIELDS))
+        return pd.DataFrame(columns, copy=False)
+
+    def to_records(self):
+        """List of candle dicts in the tos_get_price_hist format."""
+        columns = [self.datetime.tolist()] + self.values.tolist()
+        return [dict(zip(FIELDS, row)) for row in zip(*columns)]
+
+    def to_bytes(self):
+        values = np.ascontiguousarray(self.values)
+        return _HEADER.pack(_MAGIC, _VERSION, len(self)) + self.datetime.astype('<i8', copy=False).tobytes() + values.astype('<f8', copy=False).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Load candles written by to_bytes; the arrays are read-only views of data."""
+        magic, version, n = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a serialized Candles buffer")
+        datetime = np.frombuffer(data, dtype='<i8', count=n, offset=_HEADER.size)
+        values = np.frombuffer(data, dtype='<f8', count=len(PRICE_FIELDS) * n, offset=_HEADER.size + 8 * n).reshape(len(PRICE_FIELDS), n)
+        return cls(datetime, values)
+
+    def to_store(self):
+        """Base64 text of to_bytes(), for JSON stores such as dcc.Store."""
+        return base64.b64encode(self.to_bytes()).decode('ascii')
+
+    @classmethod
+    def from_store(cls, text):
+        """Load candles from to_store() text (or a legacy list of candle dicts)."""
+        if isinstance(text, list):
+            return cls.from_records(text)
+        return cls.from_bytes(base64.b64decode(text))
+
+
+def _epoch_ms(value):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).timestamp() * 1000)
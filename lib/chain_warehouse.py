@@ -0,0 +1,291 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from lib.candles import Candles
+from lib.option_chain import flatten_option_chain
+from lib.sql_batches import BATCH_SIZE, CHUNK_SIZE, execute_batches, iter_query_chunks
+
+# Local SQLite warehouse used when no MySQL credentials are configured
+DEFAULT_SQLITE_PATH = os.path.join(os.path.expanduser('~'), '.options_dashboard', 'chain_snapshots.db')
+
+SNAPSHOT_TABLE = 'option_chain_snapshots'
+
+# How far before the latest snapshot an as-of query looks for a contract's last quote (one day, epoch ms). Snapshots
+# hold whole chains, so a contract missing from every snapshot of the last day has expired or been delisted
+AS_OF_LOOKBACK = 86_400_000
+
+# Column name in the warehouse -> column name in flatten_option_chain output
+SNAPSHOT_COLUMNS = {
+    'expiration_date': 'expDate',
+    'strike_price': 'strikePrice',
+    'put_call': 'putCall',
+    'bid': 'bid',
+    'ask': 'ask',
+    'last_price': 'lastPrice',
+    'open_interest': 'openInterest',
+    'volume': 'volume',
+    'delta': 'delta',
+    'gamma': 'gamma',
+    'theta': 'theta',
+    'vega': 'vega',
+    'implied_volatility': 'impliedVolatility',
+}
+
+# The primary key doubles as the (ticker, expiry, strike, snapshot time) index; the table is clustered on it
+# (WITHOUT ROWID in SQLite, InnoDB in MySQL) so per-contract history and as-of lookups are range scans
+SNAPSHOT_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+    ticker VARCHAR(16) NOT NULL,
+    snapshot_time BIGINT NOT NULL,
+    expiration_date CHAR(10) NOT NULL,
+    strike_price DOUBLE NOT NULL,
+    put_call CHAR(4) NOT NULL,
+    bid DOUBLE,
+    ask DOUBLE,
+    last_price DOUBLE,
+    open_interest BIGINT,
+    volume BIGINT,
+    delta DOUBLE,
+    gamma DOUBLE,
+    theta DOUBLE,
+    vega DOUBLE,
+    implied_volatility DOUBLE,
+    PRIMARY KEY (ticker, expiration_date, strike_price, snapshot_time, put_call)
+)"""
+
+# Whole-chain time-range scans (every contract of a ticker between two snapshot times)
+SNAPSHOT_TIME_INDEX = f"CREATE INDEX IF NOT EXISTS idx_{SNAPSHOT_TABLE}_time ON {SNAPSHOT_TABLE} (ticker, snapshot_time)"
+
+CANDLE_TABLE = 'price_candles'
+
+# OHLCV candles as returned by tos_get_price_hist, keyed by bar size so daily and minute bars can coexist
+CANDLE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {CANDLE_TABLE} (
+    ticker VARCHAR(16) NOT NULL,
+    timespan VARCHAR(16) NOT NULL,
+    datetime BIGINT NOT NULL,
+    open DOUBLE,
+    high DOUBLE,
+    low DOUBLE,
+    close DOUBLE,
+    volume DOUBLE,
+    PRIMARY KEY (ticker, timespan, datetime)
+)"""
+
+METRIC_TABLE = 'computed_metrics'
+
+# Scalar analytics computed by the dashboard (e.g. the estimated volatility used for a Submit)
+METRIC_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {METRIC_TABLE} (
+    ticker VARCHAR(16) NOT NULL,
+    metric VARCHAR(64) NOT NULL,
+    as_of BIGINT NOT NULL,
+    value DOUBLE,
+    PRIMARY KEY (ticker, metric, as_of)
+)"""
+
+
+# Column dtypes of the warehouse tables, so query chunks are typed the same on both backends (sqlite3 reports no
+# column types); nullable integer columns are float64 with NULL as NaN
+WAREHOUSE_DTYPES = {
+    'ticker': object, 'snapshot_time': np.int64, 'expiration_date': object, 'strike_price': np.float64, 'put_call': object,
+    'bid': np.float64, 'ask': np.float64, 'last_price': np.float64, 'open_interest': np.float64, 'volume': np.float64,
+    'delta': np.float64, 'gamma': np.float64, 'theta': np.float64, 'vega': np.float64, 'implied_volatility': np.float64,
+    'timespan': object, 'datetime': np.int64, 'open': np.float64, 'high': np.float64, 'low': np.float64, 'close': np.float64,
+}
+
+
+# (datetime, open, high, low, close, volume) tuples of a candle set, converted column-wise rather than per candle dict
+def _candle_rows(candles):
+    candles = Candles.from_records(candles)
+    return zip(candles.datetime.tolist(), *candles.values.tolist())
+
+
+class OptionChainWarehouse:
+    """Historical store of option chain snapshots (plus candles and computed metrics) with bulk ingestion and time-range/as-of queries.
+
+    Args:
+        backend (str): 'sqlite' for a local file or 'mysql' to go through the pooled lib.sql_connection layer.
+        path (str): SQLite database file (sqlite backend only).
+        user, passwd, db_name (str): MySQL credentials (mysql backend only).
+        batch_size (int): Rows per executemany round trip when ingesting.
+    """
+
+    def __init__(self, backend='sqlite', path=DEFAULT_SQLITE_PATH, user=None, passwd=None, db_name=None, batch_size=BATCH_SIZE):
+        if backend not in ('sqlite', 'mysql'):
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        self.path = path
+        self.user, self.passwd, self.db_name = user, passwd, db_name
+        self.batch_size = batch_size
+        self.placeholder = '?' if backend == 'sqlite' else '%s'
+        self.create_schema()
+
+    @contextmanager
+    def connect(self):
+        """Yield a DB-API connection for the configured backend."""
+        if self.backend == 'mysql':
+            # Imported here so the sqlite backend works without the MySQL driver installed
+            from lib.sql_connection import pooled_connection
+            with pooled_connection(self.user, self.passwd, self.db_name) as db_conn:
+                yield db_conn
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        db_conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            # WAL lets the dashboard read while a batch is being written
+            db_conn.execute('PRAGMA journal_mode=WAL')
+            db_conn.execute('PRAGMA synchronous=NORMAL')
+            yield db_conn
+        finally:
+            db_conn.close()
+
+    def create_schema(self):
+        table_suffix = ' WITHOUT ROWID' if self.backend == 'sqlite' else ' ENGINE=InnoDB'
+        with self.connect() as db_conn:
+            cursor = db_conn.cursor()
+            for schema in (SNAPSHOT_SCHEMA, CANDLE_SCHEMA, METRIC_SCHEMA):
+                cursor.execute(schema + table_suffix)
+            if self.backend == 'sqlite':
+                cursor.execute(SNAPSHOT_TIME_INDEX)
+            else:
+                cursor.execute(f"SHOW INDEX FROM {SNAPSHOT_TABLE} WHERE Key_name = 'idx_{SNAPSHOT_TABLE}_time'")
+                if not cursor.fetchall():
+                    cursor.execute(SNAPSHOT_TIME_INDEX.replace('IF NOT EXISTS ', ''))
+            db_conn.commit()
+            cursor.close()
+
+    def _insert_query(self, table=SNAPSHOT_TABLE, columns=None):
+        columns = columns or ['ticker', 'snapshot_time'] + list(SNAPSHOT_COLUMNS)
+        values = ', '.join([self.placeholder] * len(columns))
+        verb = 'INSERT OR IGNORE' if self.backend == 'sqlite' else 'INSERT IGNORE'
+        return f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+    @staticmethod
+    def snapshot_rows(ticker, option_chain, snapshot_time=None):
+        """Yield warehouse rows for one chain, given as a tos_get_option_chain dict or a flattened DataFrame."""
+        chain_df = option_chain if isinstance(option_chain, pd.DataFrame) else flatten_option_chain(option_chain)
+        snapshot_time = int(snapshot_time if snapshot_time is not None else time.time() * 1000)
+        frame = chain_df[list(SNAPSHOT_COLUMNS.values())].astype(object)
+        # SQL NULL rather than NaN for missing quotes/greeks
+        frame = frame.where(frame.notna(), None)
+        for row in frame.itertuples(index=False, name=None):
+            yield (ticker, snapshot_time) + row
+
+    def ingest(self, ticker, option_chain, snapshot_time=None):
+        """Store one chain snapshot. Re-ingesting the same snapshot is a no-op. Returns rows sent."""
+        return self.ingest_many([(ticker, option_chain, snapshot_time)])
+
+    def ingest_many(self, snapshots):
+        """Store many (ticker, option_chain, snapshot_time) snapshots in executemany batches. Returns rows sent."""
+        rows = (row for ticker, option_chain, snapshot_time in snapshots for row in self.snapshot_rows(ticker, option_chain, snapshot_time))
+        with self.connect() as db_conn:
+            return execute_batches(db_conn, self._insert_query(), rows, batch_size=self.batch_size)
+
+    def ingest_candles(self, candle_sets):
+        """Store many (ticker, timespan, candles) sets, where candles is Candles or a list of candle dicts. Returns rows sent."""
+        rows = (
+            (ticker, timespan) + row
+            for ticker, timespan, candles in candle_sets for row in _candle_rows(candles)
+        )
+        query = self._insert_query(CANDLE_TABLE, ['ticker', 'timespan', 'datetime', 'open', 'high', 'low', 'close', 'volume'])
+        with self.connect() as db_conn:
+            return execute_batches(db_conn, query, rows, batch_size=self.batch_size)
+
+    def ingest_metrics(self, metrics):
+        """Store many (ticker, metric, as_of, value) rows. Returns rows sent."""
+        query = self._insert_query(METRIC_TABLE, ['ticker', 'metric', 'as_of', 'value'])
+        with self.connect() as db_conn:
+            return execute_batches(db_conn, query, ((ticker, metric, int(as_of), float(value)) for ticker, metric, as_of, value in metrics), batch_size=self.batch_size)
+
+    def iter_range(self, ticker, start_time, end_time, expiration_date=None, strike_price=None, chunk_size=CHUNK_SIZE):
+        """Stream snapshots of ticker with start_time <= snapshot_time <= end_time (epoch ms) as DataFrame chunks."""
+        p = self.placeholder
+        query = f"SELECT * FROM {SNAPSHOT_TABLE} WHERE ticker = {p}"
+        params = [ticker]
+        if expiration_date is not None:
+            query += f" AND expiration_date = {p}"
+            params.append(expiration_date)
+        if strike_price is not None:
+            query += f" AND strike_price = {p}"
+            params.append(strike_price)
+        query += f" AND snapshot_time BETWEEN {p} AND {p} ORDER BY snapshot_time"
+        params += [int(start_time), int(end_time)]
+        yield from self._iter_query(query, params, chunk_size)
+
+    def query_range(self, ticker, start_time, end_time, expiration_date=None, strike_price=None):
+        """Load every snapshot row of ticker between two snapshot times (epoch ms) into one DataFrame."""
+        chunks = list(self.iter_range(ticker, start_time, end_time, expiration_date=expiration_date, strike_price=strike_price))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['ticker', 'snapshot_time'] + list(SNAPSHOT_COLUMNS))
+
+    def query_as_of(self, ticker, as_of, lookback=AS_OF_LOOKBACK):
+        """Reconstruct the chain of ticker as it was known at as_of (epoch ms): the latest row per contract.
+
+        Only snapshots within lookback ms of the latest snapshot at or before as_of are searched, so the cost depends on
+        the chain size and the snapshot rate rather than on the whole stored history. lookback=None searches it all.
+        """
+        p = self.placeholder
+        empty = pd.DataFrame(columns=['ticker', 'snapshot_time'] + list(SNAPSHOT_COLUMNS))
+        # One seek on the (ticker, snapshot_time) index
+        with self.connect() as db_conn:
+            cursor = db_conn.cursor()
+            cursor.execute(f"SELECT MAX(snapshot_time) FROM {SNAPSHOT_TABLE} WHERE ticker = {p} AND snapshot_time <= {p}", (ticker, int(as_of)))
+            # fetchall, so an unbuffered MySQL cursor has no unread result left when it is closed
+            latest = cursor.fetchall()[0][0]
+            cursor.close()
+        if latest is None:
+            return empty
+        start_time = latest - lookback if lookback is not None else 0
+        query = f"""
+            SELECT s.* FROM {SNAPSHOT_TABLE} s
+            JOIN (
+                SELECT expiration_date, strike_price, put_call, MAX(snapshot_time) AS snapshot_time
+                FROM {SNAPSHOT_TABLE}
+                WHERE ticker = {p} AND snapshot_time BETWEEN {p} AND {p}
+                GROUP BY expiration_date, strike_price, put_call
+            ) latest
+            ON s.expiration_date = latest.expiration_date AND s.strike_price = latest.strike_price
+            AND s.put_call = latest.put_call AND s.snapshot_time = latest.snapshot_time
+            WHERE s.ticker = {p}
+            ORDER BY s.expiration_date, s.put_call, s.strike_price"""
+        chunks = list(self._iter_query(query, [ticker, int(start_time), int(latest), ticker], CHUNK_SIZE))
+        return pd.concat(chunks, ignore_index=True) if chunks else empty
+
+    def query_candles(self, ticker, timespan='day', start_time=0, end_time=None):
+        """Load stored candles of ticker (in tos_get_price_hist columns) between two times (epoch ms), oldest first."""
+        p = self.placeholder
+        end_time = int(end_time if end_time is not None else time.time() * 1000)
+        query = f"""
+            SELECT datetime, open, high, low, close, volume FROM {CANDLE_TABLE}
+            WHERE ticker = {p} AND timespan = {p} AND datetime BETWEEN {p} AND {p} ORDER BY datetime"""
+        chunks = list(self._iter_query(query, [ticker, timespan, int(start_time), end_time], CHUNK_SIZE))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['datetime', 'open', 'high', 'low', 'close', 'volume'])
+
+    def snapshot_times(self, ticker, start_time=0, end_time=None):
+        """List the distinct snapshot times stored for ticker."""
+        p = self.placeholder
+        end_time = int(end_time if end_time is not None else time.time() * 1000)
+        query = f"SELECT DISTINCT snapshot_time FROM {SNAPSHOT_TABLE} WHERE ticker = {p} AND snapshot_time BETWEEN {p} AND {p} ORDER BY snapshot_time"
+        with self.connect() as db_conn:
+            cursor = db_conn.cursor()
+            cursor.execute(query, (ticker, int(start_time), end_time))
+            times = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+        return times
+
+    def _iter_query(self, query, params, chunk_size):
+        with self.connect() as db_conn:
+            cursor = db_conn.cursor(buffered=False) if self.backend == 'mysql' else db_conn.cursor()
+            try:
+                cursor.execute(query, params)
+                yield from iter_query_chunks(cursor, chunk_size=chunk_size, dtypes=WAREHOUSE_DTYPES)
+            finally:
+                if self.backend == 'mysql':
+                    db_conn.consume_results()
+                cursor.close()
@@ -0,0 +1,249 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from lib.option_chain import SCORED_CHAIN_COLUMNS, flatten_option_chain
+from lib.stats import get_hist_volatility
+from lib.strategies import STRATEGIES, search_strategies
+
+# Output formats, the file extensions that select them, their default compression and HTTP content types. Arrow IPC
+# files are written in the random-access file format so readers can memory-map them; uncompressed Arrow files are
+# read zero-copy, compressed ones are decompressed column by column on read
+EXPORT_FORMATS = {
+    'parquet': {'extensions': ('.parquet', '.pq'), 'compression': 'zstd', 'mimetype': 'application/vnd.apache.parquet'},
+    'arrow': {'extensions': ('.arrow', '.feather', '.ipc'), 'compression': 'lz4', 'mimetype': 'application/vnd.apache.arrow.file'},
+}
+
+# Daily estimators of the volatility export, in the order of the dashboard's volatility chart
+VOLATILITY_ESTIMATORS = ['log_returns', 'garman_klass', 'hodges_tompkins', 'parkinson', 'rogers_satchell', 'yang_zhang', 'ewma', 'garch']
+
+# Defaults of the dashboard controls the exports mirror
+EXPDAY_RANGE = 28
+CONFIDENCE_LVL = 0.3
+VOL_WINDOW = 14
+VOL_ESTIMATOR = 'log_returns'
+MAX_DELTA = 0.3
+
+# Submit's inputs for a ticker: daily candles, the estimated volatility (and forecast) and the stock price
+def submit_inputs(ticker, apiKey, window, estimator):
+    from lib.tos_api_calls import tos_get_price_hist, tos_get_quotes
+    from lib.tos_helper import estimate_volatility
+    price_df = tos_get_price_hist(ticker, apiKey=apiKey)['candles'].to_frame()
+    if price_df.empty:
+        return price_df, 0, None, None
+    est_vol, forecast = estimate_volatility(ticker, price_df, window, estimator, apiKey=apiKey)
+    quotes = tos_get_quotes(ticker, apiKey=apiKey)
+    stock_price = quotes[ticker]['lastPrice'] if quotes and ticker in quotes else None
+    return price_df, est_vol, forecast, stock_price
+
+def scored_chain_frame(ticker: str, apiKey=None, expday_range: int = EXPDAY_RANGE, confidence_lvl: float = CONFIDENCE_LVL, window: int = VOL_WINDOW,
+                       estimator: str = VOL_ESTIMATOR) -> pd.DataFrame:
+    """The scored option chain a Submit shows in the option chain table (before its ROI/delta filters), SCORED_CHAIN_COLUMNS."""
+    from lib.tos_api_calls import tos_get_option_chain
+    from lib.tos_helper import scored_option_chain
+    price_df, est_vol, forecast, stock_price = submit_inputs(ticker, apiKey, window, estimator)
+    if price_df.empty or stock_price is None:
+        return pd.DataFrame(columns=SCORED_CHAIN_COLUMNS)
+    option_chain = tos_get_option_chain(ticker, contractType='ALL', rangeType='ALL', apiKey=apiKey)
+    # Same shared-cache entry as the dashboard's Submit
+    insert, _ = scored_option_chain(option_chain, ticker, stock_price, est_vol, expday_range, confidence_lvl, vol_forecast=forecast)
+    scored_df = pd.DataFrame(insert, columns=SCORED_CHAIN_COLUMNS)
+    # Contracts without a delta carry the provider's 'NaN' string
+    scored_df['delta'] = pd.to_numeric(scored_df['delta'], errors='coerce')
+    return scored_df
+
+def volatility_frame(ticker: str, apiKey=None, window: int = VOL_WINDOW, estimators=VOLATILITY_ESTIMATORS) -> pd.DataFrame:
+    """Daily close and the rolling volatility of every estimator over window days, one row per daily candle."""
+    from lib.tos_api_calls import tos_get_price_hist
+    price_df = tos_get_price_hist(ticker, apiKey=apiKey)['candles'].to_frame()
+    vol_df = pd.DataFrame({'ticker': ticker, 'datetime': price_df['datetime'].to_numpy().astype('datetime64[ms]'), 'close': price_df['close']})
+    for estimator in estimators:
+        vol_df[estimator] = get_hist_volatility(price_df, window, estimator=estimator) if len(price_df) else pd.Series(dtype=np.float64)
+    return vol_df
+
+def strategies_frame(ticker: str, apiKey=None, expday_range: int = EXPDAY_RANGE, confidence_lvl: float = CONFIDENCE_LVL, window: int = VOL_WINDOW,
+                     estimator: str = VOL_ESTIMATOR, strategies=STRATEGIES, max_delta: float = MAX_DELTA) -> pd.DataFrame:
+    """Strategy Search results for a ticker (lib.strategies.STRATEGY_COLUMNS), with the ticker as the first column."""
+    from lib.tos_api_calls import tos_get_option_chain
+    price_df, est_vol, _, _ = submit_inputs(ticker, apiKey, window, estimator)
+    option_chain = tos_get_option_chain(ticker, contractType='ALL', rangeType='ALL', apiKey=apiKey)
+    strategy_df = search_strategies(flatten_option_chain(option_chain), option_chain.get('underlyingPrice'), est_vol, expday_range,
+                                    strategies=strategies, max_delta=max_delta, min_pop=confidence_lvl)
+    strategy_df.insert(0, 'ticker', ticker)
+    return strategy_df
+
+EXPORT_KINDS = {
+    'chain': scored_chain_frame,
+    'volatility': volatility_frame,
+    'strategies': strategies_frame,
+}
+
+def export_format(path: str, fmt: str = None) -> str:
+    """The export format named by fmt, else the one selected by path's extension."""
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        fmt = next((name for name, spec in EXPORT_FORMATS.items() if extension in spec['extensions']), None)
+        if fmt is None:
+            raise ValueError(f"Can't tell the export format of {path}; use one of {[ext for spec in EXPORT_FORMATS.values() for ext in spec['extensions']]}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {list(EXPORT_FORMATS)}")
+    return fmt
+
+def _write_batches(sink, frames, fmt, compression):
+    # Writes one record batch per non-empty frame, yielding the running row count after each; the writer (and with
+    # it the Parquet footer or Arrow file footer) is closed once frames is exhausted
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    spec = EXPORT_FORMATS[fmt]
+    compression = spec['compression'] if compression is None else (None if compression == 'none' else compression)
+    writer = schema = None
+    rows = 0
+    try:
+        for frame in frames:
+            if frame is None or frame.empty:
+                continue
+            if schema is None:
+                schema = pa.Schema.from_pandas(frame, preserve_index=False)
+                if fmt == 'parquet':
+                    writer = pq.ParquetWriter(sink, schema, compression=compression)
+                else:
+                    writer = ipc.new_file(sink, schema, options=ipc.IpcWriteOptions(compression=compression))
+            batch = pa.RecordBatch.from_pandas(frame.reindex(columns=schema.names), schema=schema, preserve_index=False)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            yield rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_batches(sink, frames, fmt: str, compression: str = None) -> int:
+    """Write DataFrames one record batch at a time to sink (a path or a writable file object).
+
+    frames may be a generator, so only one batch is held in memory. The schema is taken from the first non-empty
+    frame and later frames are cast to it (columns missing from a frame are written as nulls). compression=None uses
+    the format's default and 'none' disables it. Returns the number of rows written.
+    """
+    rows = 0
+    for rows in _write_batches(sink, frames, fmt, compression):
+        pass
+    return rows
+
+
+class _ChunkSink:
+    """Write-only file object collecting the bytes an export writer produced since the last take()."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_batches(frames, fmt: str, compression: str = None):
+    """Like write_batches, but yields the encoded bytes after every batch (e.g. as a streaming HTTP response body)."""
+    import pyarrow as pa
+    sink = _ChunkSink()
+    for _ in _write_batches(pa.PythonFile(sink, mode='w'), frames, fmt, compression):
+        yield sink.take()
+    yield sink.take()
+
+def export_frames(kind: str, tickers, apiKey=None, **params):
+    """Yield the kind export of every ticker, one DataFrame at a time. Tickers that fail are reported and skipped."""
+    from lib.scheduler import BACKGROUND, provider_priority
+    build = EXPORT_KINDS[kind]
+    for ticker in tickers:
+        try:
+            # A multi-ticker scan yields the provider's rate limit to the dashboard's users
+            with provider_priority(BACKGROUND):
+                frame = build(ticker, apiKey=apiKey, **params)
+        except Exception as e:
+            print(f"Export of {kind} for {ticker} failed: {str(e)}")
+            continue
+        print(f"Exported {len(frame)} {kind} rows for {ticker}")
+        yield frame
+
+def read_export(path: str, columns=None, fmt: str = None):
+    """Memory-map an export and return it as a pyarrow Table (optionally only some columns)."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    if export_format(path, fmt) == 'parquet':
+        return pq.read_table(path, columns=columns, memory_map=True)
+    table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table.select(columns) if columns else table
+
+def register_export_routes(server, apiKey=None):
+    """Serve exports at /export/<kind>?tickers=AAPL,MSFT&format=parquet|arrow on the Dash Flask server.
+
+    Optional arguments: compression, expdays, confidence, window and estimator (as in the CLI). The response is
+    streamed one ticker's batch at a time.
+    """
+    from flask import Response, abort, request
+
+    casts = {'expdays': ('expday_range', int), 'confidence': ('confidence_lvl', float), 'window': ('window', int), 'estimator': ('estimator', str)}
+
+    @server.route('/export/<kind>')
+    def export(kind):
+        tickers = [ticker.strip().upper() for ticker in request.args.get('tickers', '').split(',') if ticker.strip()]
+        fmt = request.args.get('format', 'parquet')
+        if kind not in EXPORT_KINDS:
+            abort(404)
+        if not tickers or fmt not in EXPORT_FORMATS:
+            abort(400)
+        try:
+            params = {name: cast(request.args[arg]) for arg, (name, cast) in casts.items() if arg in request.args}
+        except ValueError:
+            abort(400)
+        if kind == 'volatility':
+            params = {name: value for name, value in params.items() if name == 'window'}
+        body = stream_batches(export_frames(kind, tickers, apiKey=apiKey, **params), fmt, request.args.get('compression'))
+        filename = f"{kind}{EXPORT_FORMATS[fmt]['extensions'][0]}"
+        return Response(body, mimetype=EXPORT_FORMATS[fmt]['mimetype'], headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export scored option chains, volatility series or Strategy Search results as Parquet or Arrow IPC")
+    parser.add_argument('kind', choices=list(EXPORT_KINDS))
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('-o', '--output', required=True, help="Output file; .parquet/.pq writes Parquet, .arrow/.feather/.ipc writes Arrow IPC")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), help="Override the format implied by the extension")
+    parser.add_argument('--compression', help="Codec (default zstd for Parquet, lz4 for Arrow; 'none' to disable)")
+    parser.add_argument('--expdays', type=int, default=EXPDAY_RANGE, help="Days to expiration range (chain, strategies)")
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE_LVL, help="Confidence level (chain, strategies)")
+    parser.add_argument('--window', type=int, default=VOL_WINDOW, help="Historical volatility window")
+    parser.add_argument('--estimator', default=VOL_ESTIMATOR, help="Volatility estimator used for scoring (chain, strategies)")
+    args = parser.parse_args(argv)
+
+    params = {'window': args.window}
+    if args.kind != 'volatility':
+        params.update(expday_range=args.expdays, confidence_lvl=args.confidence, estimator=args.estimator)
+    fmt = export_format(args.output, args.format)
+    rows = write_batches(os.path.expanduser(args.output), export_frames(args.kind, args.tickers, apiKey=os.environ.get('POLYGON_API_KEY'), **params), fmt, args.compression)
+    print(f"Wrote {rows} rows to {args.output} ({fmt})")
+    return 0 if rows else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
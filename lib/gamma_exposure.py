@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Hypothetical spot grid: GRID_POINTS prices spanning stock_price * (1 +/- GRID_RANGE)
+GRID_RANGE = 0.2
+GRID_POINTS = 201
+
+# Contracts x grid cells evaluated per chunk (8 bytes each): bounds the working memory and keeps a chunk in cache
+CHUNK_CELLS = 1 << 18
+
+# Expiries closer than this (in years) are evaluated at this horizon, so 0-day contracts keep a finite gamma
+MIN_YEARS = 0.5 / 365
+
+def _gex_inputs(chain_df: pd.DataFrame, r: float) -> dict:
+    # Contracts that carry exposure: open interest and a usable implied volatility. Dealers are assumed long the
+    # calls and short the puts customers trade, so calls add and puts subtract gamma
+    live = (chain_df['openInterest'] > 0) & (chain_df['impliedVolatility'] > 0) & (chain_df['expDays'] >= 0)
+    chain_df = chain_df.loc[live]
+    years = np.maximum(chain_df['expDays'].to_numpy(dtype=np.float64) / 365, MIN_YEARS)
+    iv = chain_df['impliedVolatility'].to_numpy(dtype=np.float64)
+    multiplier = chain_df['multiplier'].to_numpy(dtype=np.float64) if 'multiplier' in chain_df else 100.0
+    sign = np.where(chain_df['putCall'].to_numpy() == 'CALL', 1.0, -1.0)
+    sigma_t = iv * np.sqrt(years)
+    return {
+        'strike': chain_df['strikePrice'].to_numpy(dtype=np.float64),
+        'log_strike': np.log(chain_df['strikePrice'].to_numpy(dtype=np.float64)),
+        'carry': (r + iv ** 2 / 2) * years,
+        'sigma_t': sigma_t,
+        # Signed contract weight divided by sigma * sqrt(T), the per-contract part of dollar gamma
+        'weight': sign * chain_df['openInterest'].to_numpy(dtype=np.float64) * multiplier / sigma_t,
+        'sign': sign,
+    }
+
+def _dollar_gamma(inputs: dict, prices: np.ndarray, chunk_cells: int) -> np.ndarray:
+    # Net dollar gamma per 1% move at each price: sum over contracts of sign * OI * multiplier * gamma * S**2 / 100,
+    # with gamma = pdf(d1) / (S * sigma * sqrt(T)). Contracts are processed in row chunks of a contracts x prices array
+    # and each chunk is reduced with one matrix-vector product
+    log_price = np.log(prices)
+    total = np.zeros(len(prices))
+    rows = max(1, chunk_cells // max(len(prices), 1))
+    for start in range(0, len(inputs['weight']), rows):
+        part = slice(start, start + rows)
+        d1 = (log_price[None, :] - inputs['log_strike'][part, None] + inputs['carry'][part, None]) / inputs['sigma_t'][part, None]
+        np.square(d1, out=d1)
+        d1 *= -0.5
+        np.exp(d1, out=d1)
+        total += inputs['weight'][part] @ d1
+    return total * prices / (100 * math.sqrt(2 * math.pi))
+
+def _zero_crossing(prices: np.ndarray, gex: np.ndarray, stock_price: float) -> float:
+    # Linear interpolation of the sign change closest to stock_price (NaN when the profile never changes sign)
+    flips = np.flatnonzero(np.sign(gex[:-1]) * np.sign(gex[1:]) < 0)
+    if not len(flips):
+        return float('nan')
+    i = flips[np.abs(prices[flips] - stock_price).argmin()]
+    return float(prices[i] - gex[i] * (prices[i + 1] - prices[i]) / (gex[i + 1] - gex[i]))
+
+def gamma_exposure(chain_df: pd.DataFrame, stock_price: float, grid_range: float = GRID_RANGE, grid_points: int = GRID_POINTS,
+                   r: float = 0.0, chunk_cells: int = CHUNK_CELLS) -> dict:
+    """Net dealer gamma exposure (GEX) of a flattened option chain across a grid of hypothetical underlying prices.
+
+    Every contract with open interest and an implied volatility is re-priced with Black-Scholes gamma at each grid price
+    (its IV held fixed), with dealers assumed long calls and short puts. Exposure is in dollars of delta change per 1%
+    move. Returns the price grid, the GEX at each grid price, the zero-gamma flip (where the net exposure changes sign,
+    nearest stock_price), the GEX at stock_price and the GEX at stock_price by strike.
+    """
+    prices = np.linspace(stock_price * (1 - grid_range), stock_price * (1 + grid_range), grid_points)
+    inputs = _gex_inputs(chain_df, r)
+    gex = _dollar_gamma(inputs, prices, chunk_cells)
+
+    # Exposure at the current price, split by strike for the bar profile
+    at_spot = np.exp(-0.5 * ((math.log(stock_price) - inputs['log_strike'] + inputs['carry']) / inputs['sigma_t']) ** 2)
+    at_spot *= inputs['weight'] * stock_price / (100 * math.sqrt(2 * math.pi))
+    strikes, index = np.unique(inputs['strike'], return_inverse=True)
+    calls = inputs['sign'] > 0
+    return {
+        'prices': prices,
+        'gex': gex,
+        'zero_gamma': _zero_crossing(prices, gex, stock_price),
+        'gex_at_spot': float(at_spot.sum()),
+        'strikes': strikes,
+        'call_gex': np.bincount(index[calls], weights=at_spot[calls], minlength=len(strikes)),
+        'put_gex': np.bincount(index[~calls], weights=at_spot[~calls], minlength=len(strikes)),
+    }
@@ -1,9 +1,39 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-import statistics as stat
-import matplotlib.pyplot as plt
-from scipy.stats import norm
 
-def geo_brownian_paths(S, T, r, q, sigma, steps, N):
+# Paths simulated per chunk; each chunk gets its own child seed and runs on the thread pool (numpy releases the GIL)
+CHUNK_PATHS = 1 << 16
+
+# Default jump and stochastic-volatility parameters for the dashboard (annualized; theta defaults to sigma**2)
+MERTON_PARAMS = {'jump_intensity': 1.0, 'jump_mean': -0.05, 'jump_std': 0.1}
+HESTON_PARAMS = {'kappa': 2.0, 'theta': None, 'vol_of_vol': 0.5, 'rho': -0.7}
+
+def _simulate(chunk_paths, S, steps, N, seed=None, terminal=False, chunk_size=CHUNK_PATHS, workers=None):
+    # Run chunk_paths(rng, n) -> log(S_t / S) of shape (steps, n), or (n,) when terminal, over N paths in chunks.
+    # Chunk seeds are spawned from seed, so a seeded run gives the same paths whatever the chunk/worker layout
+    sizes = [min(chunk_size, N - start) for start in range(0, N, chunk_size)]
+    starts = np.cumsum([0] + sizes[:-1])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    out = np.empty(N) if terminal else np.empty((steps, N))
+
+    def run(i):
+        log_paths = chunk_paths(np.random.default_rng(seeds[i]), sizes[i])
+        view = out[starts[i]:starts[i] + sizes[i]] if terminal else out[:, starts[i]:starts[i] + sizes[i]]
+        np.exp(log_paths, out=view)
+        view *= S
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sizes) == 1:
+        for i in range(len(sizes)):
+            run(i)
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            list(pool.map(run, range(len(sizes))))
+    return out
+
+def geo_brownian_paths(S, T, r, q, sigma, steps, N, seed=None, terminal=False, chunk_size=CHUNK_PATHS, workers=None):
     '''
     S = Stock price
     T = time to maturity
@@ -11,21 +41,78 @@ def geo_brownian_paths(S, T, r, q, sigma, steps, N):
     q = dividend rate
     steps = time increments
     N = Number of trials
+    seed = optional seed for reproducible paths
+    terminal = only return the prices at T (exact in one draw, no path matrix is built)
 
     returns:
-    matrix of price paths
+    matrix of price paths (steps x N), or the N terminal prices
     '''
 
     dt = T/steps
+    drift = (r - q - sigma**2/2)*dt
 
-    # ito integral
-    ST = np.log(S) + np.cumsum(((r - q - sigma**2/2)*dt +\
+    def chunk_paths(rng, n):
+        # ito integral
+        if terminal:
+            return drift*steps + sigma*np.sqrt(T)*rng.standard_normal(n)
+        return np.cumsum(drift + sigma*np.sqrt(dt)*rng.standard_normal((steps, n)), axis=0)
 
-    sigma*np.sqrt(dt) * \
+    return _simulate(chunk_paths, S, steps, N, seed=seed, terminal=terminal, chunk_size=chunk_size, workers=workers)
 
-    np.random.normal(size=(steps,N))),axis=0)
+def merton_paths(S, T, r, q, sigma, steps, N, jump_intensity=MERTON_PARAMS['jump_intensity'], jump_mean=MERTON_PARAMS['jump_mean'],
+                 jump_std=MERTON_PARAMS['jump_std'], seed=None, terminal=False, chunk_size=CHUNK_PATHS, workers=None):
+    '''
+    Merton jump-diffusion: GBM with diffusion volatility sigma plus Poisson jumps (jump_intensity per year) whose
+    log sizes are normal(jump_mean, jump_std). The drift is compensated so the expected growth matches GBM.
+    Other arguments and the return value are as in geo_brownian_paths.
+    '''
 
-    return np.exp(ST)
+    dt = T/steps
+    compensator = jump_intensity*(np.exp(jump_mean + jump_std**2/2) - 1)
+    drift = (r - q - sigma**2/2 - compensator)*dt
+
+    def chunk_paths(rng, n):
+        # n jumps in an interval sum to one normal(n * jump_mean, n * jump_std**2) draw
+        shape = n if terminal else (steps, n)
+        horizon = T if terminal else dt
+        jumps = rng.poisson(jump_intensity*horizon, size=shape)
+        increments = (drift*(steps if terminal else 1) + sigma*np.sqrt(horizon)*rng.standard_normal(shape)
+                      + jump_mean*jumps + jump_std*np.sqrt(jumps)*rng.standard_normal(shape))
+        return increments if terminal else np.cumsum(increments, axis=0)
+
+    return _simulate(chunk_paths, S, steps, N, seed=seed, terminal=terminal, chunk_size=chunk_size, workers=workers)
+
+def heston_paths(S, T, r, q, sigma, steps, N, kappa=HESTON_PARAMS['kappa'], theta=HESTON_PARAMS['theta'], vol_of_vol=HESTON_PARAMS['vol_of_vol'],
+                 rho=HESTON_PARAMS['rho'], seed=None, terminal=False, chunk_size=CHUNK_PATHS, workers=None):
+    '''
+    Heston stochastic volatility with the full-truncation Euler scheme (negative variance is floored at zero in the
+    drift and diffusion but kept in the state). sigma is the initial volatility (v0 = sigma**2); the variance reverts
+    at rate kappa to theta (default sigma**2) with volatility vol_of_vol and price/variance correlation rho.
+    Accuracy depends on steps (use about one per trading day). Other arguments are as in geo_brownian_paths.
+    '''
+
+    dt = T/steps
+    theta = sigma**2 if theta is None else theta
+    rho_c = np.sqrt(1 - rho**2)
+
+    def chunk_paths(rng, n):
+        v = np.full(n, sigma**2)
+        x = np.zeros(n)
+        paths = None if terminal else np.empty((steps, n))
+        for step in range(steps):
+            z_x, z_v = rng.standard_normal((2, n))
+            v_pos = np.maximum(v, 0.0)
+            sd = np.sqrt(v_pos*dt)
+            x += (r - q - v_pos/2)*dt + sd*z_x
+            v += kappa*(theta - v_pos)*dt + vol_of_vol*sd*(rho*z_x + rho_c*z_v)
+            if paths is not None:
+                paths[step] = x
+        return x if terminal else paths
+
+    return _simulate(chunk_paths, S, steps, N, seed=seed, terminal=terminal, chunk_size=chunk_size, workers=workers)
+
+# Simulators by gbm_sim model name
+SIMULATORS = {'gbm': geo_brownian_paths, 'merton': merton_paths, 'heston': heston_paths}
 
 def prob_over(value, S, T, r, q, sigma, steps, N, show_plot=True):
     '''
@@ -37,6 +124,7 @@ def prob_over(value, S, T, r, q, sigma, steps, N, show_plot=True):
     # print(f"probability of stock being above {value} is {round(over/len(ST)*100,3)}%")
 
     if show_plot:
+        import matplotlib.pyplot as plt  # Only needed for notebook plotting, too slow to import at startup
         _ = plt.hist(paths[-1],bins=200)
         plt.axvline(value, color='black', linestyle='dashed', linewidth=2)
         plt.show()
@@ -57,6 +145,7 @@ def prob_under(value, S, T, r, q, sigma, steps, N, show_plot=True):
     # print(f"probability of stock being below {value} is {round(under/len(ST)*100,3)}%")
 
     if show_plot:
+        import matplotlib.pyplot as plt
         _ = plt.hist(paths[-1],bins=200,color='blue')
         plt.axvline(value, color='black', linestyle='dashed', linewidth=2) 
         plt.show()   
@@ -72,22 +161,25 @@ def prob_under(value, S, T, r, q, sigma, steps, N, show_plot=True):
 # sigma = hist_volatility # annualized volatility
 # steps = 1 # no need to have more than 1 for non-path dependent security
 # N = 1000000 # larger the better
-def gbm_sim(price_df, S, T, r, q, sigma, steps, N, bin_size=10):
+def gbm_sim(price_df, S, T, r, q, sigma, steps, N, bin_size=10, model='gbm', seed=None, **model_params):
     x_ls, y_ls = [], []
 
     # Using pop stdev is correct: We have the entire popn data for N, thus we dont have to use sample std dev
-    std_dev = stat.pstdev(price_df['close'].to_list())
+    std_dev = float(np.std(price_df['close'].to_numpy(dtype=np.float64)))
     step = int((std_dev * 2)//bin_size)
 
-    for price in np.arange(start=S-std_dev, stop=S, step=step).tolist():
-                prob_val = prob_under(price, S, T, r, q, sigma, steps, N, show_plot=False)
-                x_ls.append(price)
-                y_ls.append(round(prob_val*100,1))
+    # Simulate the terminal prices once; every price level is then a binary search in the sorted sample
+    ST = np.sort(SIMULATORS[model](S, T, r, q, sigma, steps, N, seed=seed, terminal=True, **model_params))
+
+    below = np.arange(start=S-std_dev, stop=S, step=step)
+    prob_val = np.searchsorted(ST, below, side='left') / N
+    x_ls.extend(below.tolist())
+    y_ls.extend(np.round(prob_val*100, 1).tolist())
 
-    for price in np.arange(start=S, stop=S+std_dev, step=step).tolist():
-        prob_val = prob_over(price, S, T, r, q, sigma, steps, N, show_plot=False)
-        x_ls.append(price)
-        y_ls.append(round(prob_val*100,1))
+    above = np.arange(start=S, stop=S+std_dev, step=step)
+    prob_val = (N - np.searchsorted(ST, above, side='right')) / N
+    x_ls.extend(above.tolist())
+    y_ls.extend(np.round(prob_val*100, 1).tolist())
 
     return x_ls, y_ls
 
@@ -0,0 +1,474 @@
+import atexit
+import bisect
+import collections
+import contextvars
+import functools
+import glob
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+# Histogram bucket upper bounds (Prometheus "le" labels)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, math.inf)
+ROWS_BUCKETS = (1, 10, 100, 1e3, 1e4, 1e5, 1e6, math.inf)
+
+# Seconds between the snapshots a worker publishes to DASHBOARD_METRICS_DIR (how stale other workers' counts may be)
+PUBLISH_INTERVAL = 5.0
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with labelled series."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            series['counts'][idx] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def reset(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            series = [(key, {'counts': list(s['counts']), 'sum': s['sum'], 'count': s['count']}) for key, s in self._series.items()]
+        return {'type': 'histogram', 'help': self.help_text, 'buckets': list(self.buckets), 'series': series}
+
+    def render(self):
+        return _render(self.name, self.snapshot())
+
+
+class Counter:
+    """Labelled monotonic counter, exported as <name>_total."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            series = list(self._values.items())
+        return {'type': 'counter', 'help': self.help_text, 'series': series}
+
+    def render(self):
+        return _render(self.name, self.snapshot())
+
+
+class Gauge:
+    """Labelled gauge whose value is either set directly or read from a callback at scrape time."""
+
+    def __init__(self, name, help_text, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+        if self.callback is not None:
+            values.update({tuple(sorted(labels.items())): value for labels, value in self.callback()})
+        return {'type': 'gauge', 'help': self.help_text, 'series': list(values.items())}
+
+    def render(self):
+        return _render(self.name, self.snapshot())
+
+
+def _render(name, snapshot):
+    # Text exposition of one metric snapshot; counters are exported under <name>_total
+    kind = snapshot['type']
+    family = f"{name}_total" if kind == 'counter' else name
+    lines = [f"# HELP {family} {snapshot['help']}", f"# TYPE {family} {kind}"]
+    for key, value in sorted(snapshot['series']):
+        if kind != 'histogram':
+            lines.append(f"{family}{_format_labels(key)} {value}")
+            continue
+        cumulative = 0
+        for bound, count in zip(snapshot['buckets'], value['counts']):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else repr(float(bound))
+            lines.append(f"{name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(key)} {value['sum']}")
+        lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+    return lines
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in key)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + '}'
+
+
+# Process-wide registry, rendered by the /metrics route
+_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _reset_after_fork():
+    # A forked worker starts from zero: the parent's counts are the parent's, and would be counted twice once the
+    # workers' snapshots are summed. Locks are replaced in case another thread held one at the fork
+    global _REGISTRY_LOCK
+    _REGISTRY_LOCK = threading.Lock()
+    for metric in _REGISTRY.values():
+        metric.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def histogram(name, help_text, buckets=SECONDS_BUCKETS):
+    """Return the registered histogram called name, creating it on first use."""
+    with _REGISTRY_LOCK:
+        if name not in _REGISTRY:
+            _REGISTRY[name] = Histogram(name, help_text, buckets)
+        return _REGISTRY[name]
+
+
+def counter(name, help_text):
+    """Return the registered counter called name (exported as name_total), creating it on first use."""
+    with _REGISTRY_LOCK:
+        if name not in _REGISTRY:
+            _REGISTRY[name] = Counter(name, help_text)
+        return _REGISTRY[name]
+
+
+def gauge(name, help_text, callback=None):
+    """Return the registered gauge called name, creating it on first use.
+
+    callback, if given, returns (labels_dict, value) pairs evaluated at every scrape.
+    """
+    with _REGISTRY_LOCK:
+        if name not in _REGISTRY:
+            _REGISTRY[name] = Gauge(name, help_text, callback)
+        return _REGISTRY[name]
+
+
+def _snapshot_registry():
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.items())
+    return {name: metric.snapshot() for name, metric in metrics}
+
+
+def render_prometheus():
+    """Render every registered metric in the Prometheus text exposition format.
+
+    With DASHBOARD_METRICS_DIR set (multi-worker serving), the snapshots every worker publishes there are merged:
+    counters and histograms are summed over all workers, including exited ones so totals never go backwards, and
+    gauges are reported per live worker with a pid label.
+    """
+    directory = os.environ.get('DASHBOARD_METRICS_DIR')
+    if directory:
+        publish_metrics(directory)
+        registry = _merge_snapshots(_read_snapshots(directory))
+    else:
+        registry = _snapshot_registry()
+    lines = []
+    for name, snapshot in registry.items():
+        lines.extend(_render(name, snapshot))
+    return '\n'.join(lines) + '\n'
+
+
+def publish_metrics(directory):
+    """Write this process's metric snapshot to directory (atomically replacing its previous one)."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(_snapshot_registry(), f)
+    os.replace(temp_path, path)
+
+
+def _read_snapshots(directory):
+    snapshots = {}
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+        try:
+            with open(path) as f:
+                registry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        snapshots[int(os.path.basename(path)[len('metrics_'):-len('.json')])] = registry
+    return snapshots
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge_snapshots(snapshots):
+    # {pid: {name: snapshot}} -> {name: snapshot}; label keys come back from JSON as lists of [name, value] pairs
+    merged = {}
+    for pid, registry in sorted(snapshots.items()):
+        alive = _alive(pid)
+        for name, snapshot in registry.items():
+            kind = snapshot['type']
+            target = merged.setdefault(name, dict(snapshot, series={}))
+            for key, value in snapshot['series']:
+                key = tuple(tuple(label) for label in key)
+                if kind == 'gauge':
+                    if alive:
+                        target['series'][tuple(sorted(key + (('pid', str(pid)),)))] = value
+                elif kind == 'counter':
+                    target['series'][key] = target['series'].get(key, 0) + value
+                else:
+                    total = target['series'].setdefault(key, {'counts': [0] * len(value['counts']), 'sum': 0.0, 'count': 0})
+                    total['counts'] = [a + b for a, b in zip(total['counts'], value['counts'])]
+                    total['sum'] += value['sum']
+                    total['count'] += value['count']
+    for snapshot in merged.values():
+        snapshot['series'] = list(snapshot['series'].items())
+    return merged
+
+
+_publisher = None
+
+
+def start_metrics_publisher(directory=None, interval=PUBLISH_INTERVAL):
+    """Publish this process's metrics to directory (default DASHBOARD_METRICS_DIR) every interval seconds and at exit.
+
+    Call it in every worker process (gunicorn.conf.py does, in post_fork); a no-op without a directory.
+    """
+    global _publisher
+    directory = directory or os.environ.get('DASHBOARD_METRICS_DIR')
+    if not directory or (_publisher is not None and _publisher[0] == os.getpid()):
+        return
+
+    def run():
+        while True:
+            try:
+                publish_metrics(directory)
+            except OSError as e:
+                print(f"Metrics publish failed: {e}")
+            time.sleep(interval)
+    thread = threading.Thread(target=run, name='metrics-publisher', daemon=True)
+    thread.start()
+    _publisher = (os.getpid(), thread)
+    atexit.register(publish_metrics, directory)
+
+
+# Span of the callback/provider call currently executing, so nested code can report rows and bytes
+_current_span = contextvars.ContextVar('metrics_span', default=None)
+
+
+def add_rows(n):
+    """Count n rows as processed by the instrumented call in progress (no-op outside one)."""
+    span = _current_span.get()
+    if span is not None:
+        span['rows'] += n
+
+
+def add_bytes(bytes_in=0, bytes_out=0):
+    """Count payload bytes received/sent by the instrumented call in progress (no-op outside one)."""
+    span = _current_span.get()
+    if span is not None:
+        span['bytes_in'] += bytes_in
+        span['bytes_out'] += bytes_out
+
+
+def instrument(kind, name=None, rows=None):
+    """Decorator recording wall time, payload bytes and rows of a call as histograms labelled by kind and name.
+
+    Args:
+        kind (str): 'callback' for Dash callbacks, 'provider' for market data API calls.
+        name (str): Label for the call, defaults to the function name.
+        rows (callable): Optional function of the return value giving the number of rows it holds.
+    """
+    def decorator(func):
+        label = name or func.__name__
+        duration = histogram(f'dashboard_{kind}_duration_seconds', f'Wall time of {kind} calls')
+        row_hist = histogram(f'dashboard_{kind}_rows', f'Rows processed per {kind} call', ROWS_BUCKETS)
+        bytes_in = histogram(f'dashboard_{kind}_bytes_in', f'Payload bytes received per {kind} call', BYTES_BUCKETS)
+        bytes_out = histogram(f'dashboard_{kind}_bytes_out', f'Payload bytes sent per {kind} call', BYTES_BUCKETS)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            span = {'rows': 0, 'bytes_in': 0, 'bytes_out': 0}
+            token = _current_span.set(span)
+            _note_request_callback(kind, label)
+            status = 'ok'
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    span['rows'] += rows(result)
+                return result
+            except BaseException as error:
+                # PreventUpdate is Dash control flow rather than a failure
+                status = 'prevented' if type(error).__name__ == 'PreventUpdate' else 'error'
+                raise
+            finally:
+                _current_span.reset(token)
+                duration.observe(time.perf_counter() - start, name=label, status=status)
+                if span['rows']:
+                    row_hist.observe(span['rows'], name=label)
+                if span['bytes_in']:
+                    bytes_in.observe(span['bytes_in'], name=label)
+                if span['bytes_out']:
+                    bytes_out.observe(span['bytes_out'], name=label)
+        return wrapper
+    return decorator
+
+
+def _note_request_callback(kind, label):
+    # Remember which callback the current Dash request ran, so the HTTP hooks can label its payload sizes
+    if kind != 'callback':
+        return
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return
+    if has_request_context():
+        g.metrics_callback = label
+
+
+class SamplingProfiler:
+    """Low-overhead sampling profiler: periodically records the stack of every thread.
+
+    Samples are aggregated as collapsed stacks ("frame;frame;frame count"), the input format of flamegraph tools.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self, reset=False):
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+            if reset:
+                self.samples.clear()
+        return '\n'.join(lines) + '\n'
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(names)))
+            with self._lock:
+                self.samples.update(stacks)
+
+
+_profiler = None
+
+
+def start_profiler(interval=0.01):
+    """Start (or return) the process-wide sampling profiler."""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(interval=interval)
+    return _profiler.start()
+
+
+def register_metrics_route(server, enable_profiler=None):
+    """Expose /metrics (Prometheus text format) on the Dash Flask server and measure Dash callback payloads.
+
+    Every /_dash-update-component request is timed and its request/response sizes are recorded under the name of
+    the instrumented callback that handled it. When enable_profiler is true (default: DASHBOARD_PROFILER env var),
+    a sampling profiler runs in the background and /metrics/profile serves its collapsed stacks.
+    """
+    from flask import Response, g, request
+
+    payload_in = histogram('dashboard_http_callback_request_bytes', 'Dash callback request body bytes', BYTES_BUCKETS)
+    payload_out = histogram('dashboard_http_callback_response_bytes', 'Dash callback response body bytes', BYTES_BUCKETS)
+    http_duration = histogram('dashboard_http_callback_duration_seconds', 'Wall time of Dash callback HTTP requests')
+
+    @server.before_request
+    def _metrics_start_timer():
+        if request.path.endswith('/_dash-update-component'):
+            g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def _metrics_record_payload(response):
+        start = g.get('metrics_start')
+        if start is not None:
+            label = g.get('metrics_callback', 'unknown')
+            http_duration.observe(time.perf_counter() - start, name=label, status=str(response.status_code))
+            payload_in.observe(request.content_length or 0, name=label)
+            if not response.direct_passthrough:
+                payload_out.observe(response.calculate_content_length() or len(response.get_data()), name=label)
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    if enable_profiler is None:
+        enable_profiler = os.environ.get('DASHBOARD_PROFILER', '').lower() in ('1', 'true', 'yes')
+    if enable_profiler:
+        profiler = start_profiler(float(os.environ.get('DASHBOARD_PROFILER_INTERVAL', 0.01)))
+
+        @server.route('/metrics/profile')
+        def metrics_profile():
+            return Response(profiler.collapsed(reset=request.args.get('reset') == '1'), mimetype='text/plain')
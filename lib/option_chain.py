@@ -0,0 +1,300 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from lib.stats import forecast_volatility, get_prob, prob_cone
+
+# Columns of the flattened option chain, in the order of the TOS-style contract dicts
+OPTION_CHAIN_COLUMNS = ['putCall', 'expDate', 'expDays', 'strikePrice', 'bid', 'ask', 'lastPrice', 'openInterest', 'volume', 'delta', 'gamma', 'theta', 'vega', 'impliedVolatility', 'multiplier']
+
+def flatten_option_chain(option_chain: dict) -> pd.DataFrame:
+    """Flatten the nested call/put ExpDateMaps returned by tos_get_option_chain into one row per contract."""
+    columns = {col: [] for col in OPTION_CHAIN_COLUMNS}
+    for option_chain_type in ['call', 'put']:
+        for exp_date, strikes in option_chain.get(f'{option_chain_type}ExpDateMap', {}).items():
+            exp_day, day_diff = exp_date.split(':')
+            for strike in strikes.values():
+                contract = strike[0]
+                columns['putCall'].append(contract['putCall'])
+                columns['expDate'].append(exp_day)
+                columns['expDays'].append(int(day_diff))
+                columns['strikePrice'].append(contract['strikePrice'])
+                columns['bid'].append(contract['bid'] or 0)
+                columns['ask'].append(contract['ask'] or 0)
+                columns['lastPrice'].append(contract['lastPrice'] or 0)
+                columns['openInterest'].append(contract['openInterest'] or 0)
+                columns['volume'].append(contract['volume'] or 0)
+                columns['delta'].append(np.nan if contract['delta'] in ('NaN', None) else contract['delta'])
+                for greek in ('gamma', 'theta', 'vega', 'impliedVolatility'):
+                    value = contract.get(greek)
+                    columns[greek].append(np.nan if value is None else value)
+                columns['multiplier'].append(contract['multiplier'])
+
+    chain_df = pd.DataFrame(columns)
+    numeric_cols = ['strikePrice', 'bid', 'ask', 'lastPrice', 'openInterest', 'volume', 'delta', 'gamma', 'theta', 'vega', 'impliedVolatility']
+    chain_df[numeric_cols] = chain_df[numeric_cols].astype(np.float64)
+    return chain_df
+
+# Columns of a score_option_chain row (the ids of the dashboard's base option chain table)
+SCORED_CHAIN_COLUMNS = ['ticker', 'exp_date', 'option_type', 'strike_price', 'exp_days', 'delta', 'prob_val', 'open_interest', 'total_volume', 'premium',
+                        'option_leverage', 'bid_size', 'ask_size', 'roi_val', 'lower_bound', 'upper_bound']
+
+def score_option_chain(option_chain: dict, ticker: str, stock_price: float, hist_volatility: float, expday_range: int, confidence_lvl: float, current_date: datetime = None, vol_forecast: dict = None) -> list:
+    """Score every contract expiring within expday_range days (premium, ROI, leverage, probability and cone bounds).
+
+    With a vol_forecast (lib.stats.vol_forecast), probabilities and bounds use the forecast volatility at each
+    contract's horizon instead of the flat hist_volatility.
+    Returns one row per contract in the column order of the dashboard's base option chain table.
+    """
+    insert = []
+    current_date = current_date or datetime.now()
+    horizon_vol = {}
+    for option_chain_type in ['call', 'put']:
+        exp_map = option_chain[f'{option_chain_type}ExpDateMap']
+        for exp_date, strikes in exp_map.items():
+            for strike in strikes.values():
+                strike_data = strike[0]
+                expiry_date = datetime.fromtimestamp(strike_data["expirationDate"] / 1000.0)
+                day_diff = (expiry_date - current_date).days
+                if day_diff < 0:
+                    continue
+                if day_diff > expday_range:
+                    break
+
+                option_type = strike_data['putCall']
+                strike_price = strike_data['strikePrice']
+                bid_size = strike_data.get('bidSize', 0)
+                ask_size = strike_data.get('askSize', 0)
+                delta_val = strike_data['delta']
+                total_volume = strike_data['volume']
+                open_interest = strike_data['openInterest']
+                option_premium = round(strike_data['bid'] * strike_data['multiplier'], 2)
+                roi_val = round(option_premium / (strike_price * 100) * 100, 2)
+
+                # Handle 'NaN' or None delta_val
+                if delta_val == 'NaN' or delta_val is None:
+                    option_leverage = 0.0
+                else:
+                    option_leverage = 0.0 if option_premium == 0 else round((abs(float(delta_val)) * stock_price) / option_premium, 3)
+
+                if vol_forecast and day_diff not in horizon_vol:
+                    horizon_vol[day_diff] = forecast_volatility(vol_forecast, day_diff)
+                volatility = horizon_vol[day_diff] if vol_forecast else hist_volatility
+                prob_val = get_prob(stock_price, strike_price, volatility, day_diff) if day_diff > 0 else 0.0
+                lower_bound, upper_bound = prob_cone(stock_price, volatility, day_diff, confidence_lvl)
+
+                insert.append([ticker, expiry_date, option_type, strike_price, day_diff, delta_val, prob_val, open_interest, total_volume, option_premium, option_leverage, bid_size, ask_size, roi_val, lower_bound, upper_bound])
+    return insert
+
+# Contract identity, and the fields compared between two snapshots of a chain (diff_option_chain)
+CONTRACT_KEY = ['putCall', 'expDate', 'strikePrice']
+DIFF_COLUMNS = ['expDays', 'bid', 'ask', 'lastPrice', 'openInterest', 'volume', 'delta', 'gamma', 'theta', 'vega', 'impliedVolatility']
+
+def diff_option_chain(previous_df: pd.DataFrame, chain_df: pd.DataFrame) -> tuple:
+    """Match the contracts of a flattened chain to a previous snapshot by (type, expiry, strike) and find the changes.
+
+    Returns (position, changed): the row of every chain_df contract in previous_df (-1 for a new contract) and a mask
+    of the chain_df rows that are new or differ in any of DIFF_COLUMNS (NaN matches NaN). A previous snapshot with
+    duplicate contracts can't be matched, so every contract counts as new.
+    """
+    previous_index = pd.MultiIndex.from_frame(previous_df[CONTRACT_KEY])
+    if not previous_index.is_unique:
+        return np.full(len(chain_df), -1), np.ones(len(chain_df), dtype=bool)
+    position = previous_index.get_indexer(pd.MultiIndex.from_frame(chain_df[CONTRACT_KEY]))
+    new = position < 0
+    current = chain_df[DIFF_COLUMNS].to_numpy(dtype=np.float64)
+    before = previous_df[DIFF_COLUMNS].to_numpy(dtype=np.float64)[np.where(new, 0, position)] if len(previous_df) else np.full_like(current, np.nan)
+    differs = (current != before) & ~(np.isnan(current) & np.isnan(before))
+    return position, new | differs.any(axis=1)
+
+def select_contracts(option_chain: dict, contracts) -> dict:
+    """Copy of a tos_get_option_chain result keeping only the contracts whose (putCall, expDate, strikePrice) is in
+    contracts, so score_option_chain can score just those."""
+    contracts = set(contracts)
+    selected = dict(option_chain)
+    for option_chain_type in ['call', 'put']:
+        exp_map = {}
+        for exp_date, strikes in option_chain.get(f'{option_chain_type}ExpDateMap', {}).items():
+            exp_day = exp_date.split(':')[0]
+            kept = {key: strike for key, strike in strikes.items() if (strike[0]['putCall'], exp_day, strike[0]['strikePrice']) in contracts}
+            if kept:
+                exp_map[exp_date] = kept
+        selected[f'{option_chain_type}ExpDateMap'] = exp_map
+    return selected
+
+def _bracket_interp(exp_days: np.ndarray, strikes: np.ndarray, bid: np.ndarray, ask: np.ndarray, target: float):
+    """For every expiry, find the strikes bracketing target and linearly interpolate the mid price at target.
+
+    Returns the expiries, the interpolated mid prices and the ask/bid ratios of the lower and upper bracketing strikes.
+    Expiries without a strike on both sides of target get NaN.
+    """
+    order = np.lexsort((strikes, exp_days))
+    exp_days, strikes, bid, ask = exp_days[order], strikes[order], bid[order], ask[order]
+    expiries, group = np.unique(exp_days, return_inverse=True)
+    n_exp = len(expiries)
+    if n_exp == 0:
+        empty = np.empty(0)
+        return expiries, empty, empty, empty
+
+    # Offsetting each expiry's strikes by a multiple of the strike span keeps the whole array sorted,
+    # so one searchsorted call locates target inside every expiry at once
+    span = 2.0 * (max(strikes.max(), target) + 1.0)
+    keys = group * span + strikes
+    hi = np.searchsorted(keys, np.arange(n_exp) * span + target, side='left')
+    lo = hi - 1
+    hi_clip, lo_clip = np.minimum(hi, len(keys) - 1), np.maximum(lo, 0)
+    exact = (hi < len(keys)) & (group[hi_clip] == np.arange(n_exp)) & (strikes[hi_clip] == target)
+    lo = np.where(exact, hi, lo)
+    lo_clip = np.where(exact, hi_clip, lo_clip)
+    valid = (hi < len(keys)) & (lo >= 0) & (group[hi_clip] == np.arange(n_exp)) & (group[lo_clip] == np.arange(n_exp))
+
+    mid = (bid + ask) / 2
+    k_lo, k_hi = strikes[lo_clip], strikes[hi_clip]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(k_hi > k_lo, (target - k_lo) / (k_hi - k_lo), 0.0)
+        askbid_lo = np.where(bid[lo_clip] > 0, ask[lo_clip] / bid[lo_clip], 0.0)
+        askbid_hi = np.where(bid[hi_clip] > 0, ask[hi_clip] / bid[hi_clip], 0.0)
+        spread = np.where(mid[lo_clip] + mid[hi_clip] > 0, ((ask - bid)[lo_clip] + (ask - bid)[hi_clip]) / (mid[lo_clip] + mid[hi_clip]), np.nan)
+    price = mid[lo_clip] + weight * (mid[hi_clip] - mid[lo_clip])
+    price = np.where(valid, price, np.nan)
+    return expiries, price, np.stack([askbid_lo, askbid_hi], axis=1), np.where(valid, spread, np.nan)
+
+def skew_term_structure(chain_df: pd.DataFrame, stock_price: float, moneyness: float = 0.1, liquidity_limit: float = 1.25) -> pd.DataFrame:
+    """Compute the OTM call/put skew and bid/ask liquidity for every expiry in a flattened option chain.
+
+    The call price is interpolated at stock_price * (1 + moneyness) and the put price at stock_price * (1 - moneyness).
+    """
+    result_cols = ['exp_date', 'exp_days', 'skew_category', 'skew', 'call_price', 'put_price', 'spread', 'liquidity']
+    if chain_df.empty or not stock_price:
+        return pd.DataFrame(columns=result_cols)
+
+    legs = {}
+    for option_type, target in [('CALL', stock_price * (1 + moneyness)), ('PUT', stock_price * (1 - moneyness))]:
+        leg = chain_df.loc[chain_df['putCall'] == option_type]
+        expiries, price, askbid, spread = _bracket_interp(leg['expDays'].to_numpy(), leg['strikePrice'].to_numpy(dtype=np.float64), leg['bid'].to_numpy(dtype=np.float64), leg['ask'].to_numpy(dtype=np.float64), target)
+        legs[option_type] = pd.DataFrame({'exp_days': expiries, f'{option_type}_price': price, f'{option_type}_askbid_lo': askbid[:, 0], f'{option_type}_askbid_hi': askbid[:, 1], f'{option_type}_spread': spread})
+
+    skew_df = legs['CALL'].merge(legs['PUT'], on='exp_days', how='inner').dropna()
+    skew_df = skew_df.loc[(skew_df['CALL_price'] > 0) & (skew_df['PUT_price'] > 0)]
+    call_price, put_price = skew_df['CALL_price'].to_numpy(), skew_df['PUT_price'].to_numpy()
+    askbid = skew_df[['CALL_askbid_lo', 'CALL_askbid_hi', 'PUT_askbid_lo', 'PUT_askbid_hi']].to_numpy()
+
+    exp_dates = chain_df.drop_duplicates('expDays').set_index('expDays')['expDate']
+    return pd.DataFrame({
+        'exp_date': exp_dates.reindex(skew_df['exp_days']).to_numpy(),
+        'exp_days': skew_df['exp_days'].to_numpy(),
+        'skew_category': np.where(put_price > call_price, 'Put Skew', 'Call Skew'),
+        'skew': np.round(np.maximum(put_price, call_price) / np.minimum(put_price, call_price), 3),
+        'call_price': np.round(call_price, 3),
+        'put_price': np.round(put_price, 3),
+        'spread': np.round((skew_df['CALL_spread'].to_numpy() + skew_df['PUT_spread'].to_numpy()) / 2, 3),
+        'liquidity': np.where((askbid > liquidity_limit).all(axis=1), 'FAILED', 'PASSED'),
+    }, columns=result_cols)
+
+def otm_vol_grid(chain_df: pd.DataFrame, stock_price: float, strike_range: float = 0.5) -> tuple:
+    """Implied volatility of the OTM contract at every expiry x strike within stock_price * (1 +/- strike_range).
+
+    Calls are used at and above stock_price, puts below. Returns (exp_dates, exp_days, strikes, iv_grid); grid cells
+    without a quote are NaN.
+    """
+    strikes = chain_df['strikePrice']
+    in_range = (strikes >= stock_price * (1 - strike_range)) & (strikes <= stock_price * (1 + strike_range))
+    otm = ((chain_df['putCall'] == 'CALL') & (strikes >= stock_price)) | ((chain_df['putCall'] == 'PUT') & (strikes < stock_price))
+    leg = chain_df.loc[in_range & otm]
+    grid = leg.pivot_table(index='expDays', columns='strikePrice', values='impliedVolatility', aggfunc='mean', dropna=False)
+    exp_dates = leg.drop_duplicates('expDays').set_index('expDays')['expDate'].reindex(grid.index)
+    iv = grid.to_numpy(dtype=np.float64)
+    return exp_dates.to_numpy(), grid.index.to_numpy(), grid.columns.to_numpy(dtype=np.float64), np.where(iv > 0, iv, np.nan)
+
+# Columns of the per-expiry open interest summary (oi_summary)
+OI_SUMMARY_COLUMNS = ['exp_date', 'exp_days', 'max_pain', 'call_wall', 'call_wall_oi', 'put_wall', 'put_wall_oi', 'call_oi', 'put_oi', 'put_call_ratio']
+
+def oi_profile(chain_df: pd.DataFrame) -> pd.DataFrame:
+    """Open interest by expiry and strike with per-expiry cumulative OI and the max-pain payout curve.
+
+    One row per (expiry, strike), strikes ascending within each expiry. cum_call_oi/cum_put_oi accumulate OI up to and
+    including the strike; pain is the total dollar payout to option holders if the stock settles at that strike.
+    Pain is computed from prefix sums over the sorted strikes, so every expiry of the chain costs O(n log n) in total
+    instead of a strikes x strikes payout loop per expiry:
+        calls: sum over strikes k <= K of call_oi[k] * (K - k) = K * cum_call_oi(K) - cum(call_oi * k)(K)
+        puts:  sum over strikes k > K of put_oi[k] * (k - K)
+    """
+    chain_df = chain_df.loc[chain_df['expDays'] >= 0]
+    exp_days = chain_df['expDays'].to_numpy(dtype=np.int64)
+    strikes = chain_df['strikePrice'].to_numpy(dtype=np.float64)
+    open_interest = np.nan_to_num(chain_df['openInterest'].to_numpy(dtype=np.float64))
+    is_call = chain_df['putCall'].to_numpy() == 'CALL'
+    multiplier = chain_df['multiplier'].to_numpy(dtype=np.float64) if 'multiplier' in chain_df else np.full(len(strikes), 100.0)
+    if not len(strikes):
+        return pd.DataFrame(columns=['exp_date', 'exp_days', 'strike', 'call_oi', 'put_oi', 'cum_call_oi', 'cum_put_oi', 'pain'])
+
+    # Collapse calls and puts onto one row per (expiry, strike)
+    order = np.lexsort((strikes, exp_days))
+    exp_days, strikes, open_interest, is_call, multiplier = exp_days[order], strikes[order], open_interest[order], is_call[order], multiplier[order]
+    new_row = np.ones(len(strikes), dtype=bool)
+    new_row[1:] = (exp_days[1:] != exp_days[:-1]) | (strikes[1:] != strikes[:-1])
+    starts = np.flatnonzero(new_row)
+    call_oi = np.add.reduceat(np.where(is_call, open_interest, 0.0), starts)
+    put_oi = np.add.reduceat(np.where(is_call, 0.0, open_interest), starts)
+    exp_days, strikes, multiplier = exp_days[starts], strikes[starts], multiplier[starts]
+    exp_date = chain_df['expDate'].to_numpy()[order][starts]
+
+    # Per-expiry prefix sums: a global cumsum minus its value just before each expiry starts
+    first = np.ones(len(strikes), dtype=bool)
+    first[1:] = exp_days[1:] != exp_days[:-1]
+    group = np.cumsum(first) - 1
+    group_starts = np.flatnonzero(first)
+
+    def group_cumsum(values):
+        total = np.cumsum(values)
+        return total - (total - values)[group_starts][group]
+
+    def group_total(values):
+        return np.add.reduceat(values, group_starts)[group]
+
+    cum_call_oi, cum_put_oi = group_cumsum(call_oi), group_cumsum(put_oi)
+    call_payout = strikes * cum_call_oi - group_cumsum(call_oi * strikes)
+    put_payout = (group_total(put_oi * strikes) - group_cumsum(put_oi * strikes)) - strikes * (group_total(put_oi) - cum_put_oi)
+    return pd.DataFrame({
+        'exp_date': exp_date,
+        'exp_days': exp_days,
+        'strike': strikes,
+        'call_oi': call_oi,
+        'put_oi': put_oi,
+        'cum_call_oi': cum_call_oi,
+        'cum_put_oi': cum_put_oi,
+        'pain': (call_payout + put_payout) * multiplier,
+    })
+
+def oi_summary(profile: pd.DataFrame) -> pd.DataFrame:
+    """Max-pain strike, call/put OI walls (largest OI strike) and OI totals for every expiry of an oi_profile frame."""
+    if profile.empty:
+        return pd.DataFrame(columns=OI_SUMMARY_COLUMNS)
+    exp_days = profile['exp_days'].to_numpy()
+    strikes = profile['strike'].to_numpy()
+    call_oi, put_oi = profile['call_oi'].to_numpy(), profile['put_oi'].to_numpy()
+    first = np.ones(len(exp_days), dtype=bool)
+    first[1:] = exp_days[1:] != exp_days[:-1]
+    group = np.cumsum(first) - 1
+    group_starts = np.flatnonzero(first)
+
+    # Sorting by (expiry, value) puts each expiry's extreme at that expiry's start position (ties go to the lower strike)
+    max_pain = np.lexsort((profile['pain'].to_numpy(), group))[group_starts]
+    call_wall = np.lexsort((-call_oi, group))[group_starts]
+    put_wall = np.lexsort((-put_oi, group))[group_starts]
+    total_call, total_put = np.add.reduceat(call_oi, group_starts), np.add.reduceat(put_oi, group_starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        put_call_ratio = np.where(total_call > 0, total_put / total_call, np.nan)
+    return pd.DataFrame({
+        'exp_date': profile['exp_date'].to_numpy()[group_starts],
+        'exp_days': exp_days[group_starts],
+        'max_pain': strikes[max_pain],
+        'call_wall': strikes[call_wall],
+        'call_wall_oi': call_oi[call_wall],
+        'put_wall': strikes[put_wall],
+        'put_wall_oi': put_oi[put_wall],
+        'call_oi': total_call,
+        'put_oi': total_put,
+        'put_call_ratio': put_call_ratio,
+    }, columns=OI_SUMMARY_COLUMNS)
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.metrics import counter
+from lib.scheduler import PREFETCH, provider_priority
+
+# Seconds a prefetched result is served before a lookup fetches it again
+PREFETCH_TTL = 60
+
+# Background fetches running at once. Further prefetches queue behind them, so prefetching never holds more than
+# this many provider connections and foreground requests (which run on the callback's own thread) are never queued
+PREFETCH_WORKERS = 2
+
+_requests = counter('dashboard_prefetch_requests', 'Prefetch lookups by result (hit, wait, miss) and prefetches cancelled')
+
+
+class Prefetcher:
+    """Speculative background fetches into a short-TTL in-process cache.
+
+    prefetch() submits fetches for results the user is likely to ask for next (e.g. every price chart timeframe once
+    a ticker is submitted) to a small thread pool; get() serves a finished result, waits for one that is already
+    running, and otherwise fetches in the foreground. A result that is still queued when get() asks for it is
+    cancelled and fetched in the foreground instead, so a lookup never waits behind other prefetches.
+
+    Prefetches are grouped per scope: submitting a new group for a scope (a different ticker) cancels the queued
+    fetches of its previous group that no other scope still wants. Fetches already running can't be interrupted;
+    they finish and their results stay cached for the TTL.
+
+    Args:
+        ttl (float): Seconds a prefetched result stays fresh, counted from its submission.
+        max_workers (int): Background fetches running at once.
+    """
+
+    def __init__(self, ttl=PREFETCH_TTL, max_workers=PREFETCH_WORKERS):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='prefetch')
+        self._entries = {}
+        self._scopes = {}
+        # Set last: other threads only skip the lock in _check_fork once the new pool is in place
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # Created before a fork (e.g. gunicorn preload_app): the pool threads didn't survive, start a fresh pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+    def prefetch(self, scope, group, jobs):
+        """Start background fetches on behalf of scope, cancelling the queued fetches of its previous group.
+
+        Args:
+            scope (str): Who the prefetches are for; each scope has one current group.
+            group: Identifies this batch of prefetches (e.g. the ticker). Re-submitting the current group keeps
+                its fetches and only refreshes expired ones.
+            jobs (dict): Cache key -> zero-argument callable fetching the value. Keys still fresh are skipped.
+        """
+        self._check_fork()
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            previous = self._scopes.get(scope)
+            self._scopes[scope] = (group, list(jobs))
+            if previous is not None and previous[0] != group:
+                self._cancel(previous[1])
+            for key, fetch in jobs.items():
+                if key not in self._entries:
+                    self._entries[key] = (now + self.ttl, self._executor.submit(_run_prefetch, fetch))
+
+    def get(self, key, fetch, cacheable=None):
+        """Return the prefetched value of key, or fetch() it in the foreground when it isn't available.
+
+        Args:
+            key: Cache key used by prefetch().
+            fetch (callable): Zero-argument function fetching the value in the foreground.
+            cacheable (callable): Optional predicate on a prefetched value; falsy results (e.g. an empty response
+                from a failed fetch) are discarded and fetched again.
+        """
+        self._check_fork()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] <= time.monotonic() or entry[1].cancel() or entry[1].cancelled()):
+                # Expired, or still queued (just cancelled): fetching now beats waiting behind other prefetches
+                del self._entries[key]
+                entry = None
+
+        if entry is not None:
+            future = entry[1]
+            result = 'hit' if future.done() else 'wait'
+            try:
+                value = future.result()
+                if cacheable is None or cacheable(value):
+                    _requests.inc(result=result)
+                    return value
+            except Exception as e:
+                print(f"Prefetch of {key} failed: {str(e)}")
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+        _requests.inc(result='miss')
+        return fetch()
+
+    def _cancel(self, keys):
+        # Keys another scope's current group still wants keep their fetch
+        wanted = {key for _, scope_keys in self._scopes.values() for key in scope_keys}
+        for key in keys:
+            entry = self._entries.get(key)
+            if key not in wanted and entry is not None and entry[1].cancel():
+                del self._entries[key]
+                _requests.inc(result='cancelled')
+
+    def _purge(self, now):
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            self._entries.pop(key)[1].cancel()
+        # Scopes (e.g. closed browser sessions) whose prefetches have all expired
+        for scope in [scope for scope, (_, keys) in self._scopes.items() if not any(key in self._entries for key in keys)]:
+            del self._scopes[scope]
+
+
+def _run_prefetch(fetch):
+    # Speculative fetches queue behind provider requests a user is waiting on
+    with provider_priority(PREFETCH):
+        return fetch()
+
+
+_default_prefetcher = None
+_default_prefetcher_lock = threading.Lock()
+
+
+def default_prefetcher():
+    """Process-wide Prefetcher (its pool threads only start with the first prefetch)."""
+    global _default_prefetcher
+    with _default_prefetcher_lock:
+        if _default_prefetcher is None:
+            _default_prefetcher = Prefetcher()
+        return _default_prefetcher
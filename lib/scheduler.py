@@ -0,0 +1,288 @@
+import contextlib
+import contextvars
+import email.utils
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import urllib3
+
+from lib.metrics import counter, gauge, histogram
+from lib.shared_cache import default_cache
+
+# Priority classes, most urgent first: a user waiting on a callback, speculative prefetches, background refreshes and
+# batch exports. A waiting request is only sent once no more urgent request of this process is waiting
+INTERACTIVE, PREFETCH, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', PREFETCH: 'prefetch', BACKGROUND: 'background'}
+
+# Provider requests per minute allowed by the plan (0: unlimited), and how many of them may be sent back to back.
+# A burst of 1 spaces requests evenly, which also stays under a sliding-window quota
+RATE_LIMIT = float(os.environ.get('DASHBOARD_PROVIDER_RATE_LIMIT', 0))
+BURST = float(os.environ.get('DASHBOARD_PROVIDER_BURST', 1))
+
+# Retries of a rate-limited (429), failed (5xx) or dropped request, with exponential backoff when the provider
+# doesn't say how long to wait
+MAX_RETRIES = 4
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+MAX_RETRY_AFTER = 120.0
+
+# Name of the token bucket in the shared cache
+BUCKET_NAME = 'polygon'
+
+_requests = counter('dashboard_provider_requests', 'Provider HTTP requests by priority and result (sent, coalesced, retried, rate_limited, failed)')
+_queue_wait = histogram('dashboard_provider_queue_wait_seconds', 'Seconds provider requests waited for a rate limit token')
+
+_priority = contextvars.ContextVar('provider_priority', default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def provider_priority(priority):
+    """Send the provider requests made in this block (this thread or task) with the given priority class."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """In-process token bucket: up to burst tokens, refilled at rate tokens per second (rate 0: unlimited)."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take a token and return 0, or return the seconds until one is available."""
+        if not self.rate:
+            # Unlimited: only a pause holds requests back
+            return max(0.0, self._paused_until - time.monotonic())
+        with self._lock:
+            now = time.monotonic()
+            if self._paused_until > now:
+                return self._paused_until - now
+            start = max(self._updated_at, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+            self._updated_at = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            return 0.0
+
+    def pause(self, seconds):
+        with self._lock:
+            self._tokens = 0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class SharedTokenBucket:
+    """Token bucket kept in the shared cache file, so every worker process draws on the same provider quota."""
+
+    def __init__(self, cache, name, rate, burst):
+        self.cache = cache
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+    def take(self):
+        return self.cache.take_token(self.name, self.rate, self.burst)
+
+    def pause(self, seconds):
+        self.cache.pause_bucket(self.name, seconds)
+
+
+class _Waiter:
+    # A request queued for a token; its priority can be raised while it waits
+    __slots__ = ('priority', 'seq')
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def retry_after(response):
+    """Seconds from a response's Retry-After header (delay-seconds or HTTP date), or None."""
+    value = response.headers.get('Retry-After') if response.headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """Sends every provider HTTP request through one rate limit, in priority order.
+
+    attach() routes a Polygon client's transport through request(), which:
+      - coalesces identical GETs already in flight in this process onto one request,
+      - waits for a token from the bucket, the most urgent waiting request first (FIFO within a class),
+      - retries 429 and 5xx responses and dropped connections; a 429 pauses the whole bucket (every worker, when the
+        bucket is shared) for the provider's Retry-After, so no request is sent into an exhausted quota.
+
+    Args:
+        bucket: TokenBucket or SharedTokenBucket.
+        max_retries (int): Retries per request before the last response (or error) is returned to the client.
+    """
+
+    def __init__(self, bucket, max_retries=MAX_RETRIES):
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = {}
+
+    def attach(self, client):
+        """Route the requests of a polygon RESTClient through this scheduler (no-op for clients without a transport)."""
+        transport = getattr(client, 'client', None)
+        send = getattr(transport, 'request', None)
+        if send is None:
+            return
+
+        def scheduled_request(method, url, *args, **kwargs):
+            return self.request(send, method, url, *args, **kwargs)
+        transport.request = scheduled_request
+
+    def queue_depth(self):
+        """Requests waiting for a token, by priority class."""
+        with self._cond:
+            counts = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+            for waiter in self._waiting:
+                counts[PRIORITY_NAMES[waiter.priority]] += 1
+            return counts
+
+    def request(self, send, method, url, *args, **kwargs):
+        """send(method, url, ...) once a token is available, retrying rate-limited and failed attempts."""
+        waiter = _Waiter(_priority.get(), None)
+        if method != 'GET':
+            return self._send(send, waiter, method, url, *args, **kwargs)
+
+        headers = kwargs.get('headers') or {}
+        key = (url, repr(sorted((kwargs.get('fields') or {}).items())), headers.get('Authorization'))
+        with self._cond:
+            flight = self._in_flight.get(key)
+            if flight is None:
+                future = Future()
+                self._in_flight[key] = (future, waiter)
+            elif waiter.priority < flight[1].priority:
+                # A more urgent caller wants the same response: the queued request inherits its priority
+                flight[1].priority = waiter.priority
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+        if flight is not None:
+            _requests.inc(priority=PRIORITY_NAMES[waiter.priority], result='coalesced')
+            return flight[0].result()
+
+        try:
+            response = self._send(send, waiter, method, url, *args, **kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cond:
+                del self._in_flight[key]
+
+    def _acquire(self, waiter):
+        # Queue for a token. Only the head of the queue draws from the bucket; it sleeps until the next token unless
+        # a more urgent request arrives and takes its place
+        start = time.perf_counter()
+        with self._cond:
+            waiter.seq = next(self._seq)
+            heapq.heappush(self._waiting, waiter)
+            self._cond.notify_all()
+            try:
+                while True:
+                    if self._waiting[0] is waiter:
+                        wait = self.bucket.take()
+                        if not wait:
+                            heapq.heappop(self._waiting)
+                            return
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                if waiter in self._waiting:
+                    self._waiting.remove(waiter)
+                    heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                _queue_wait.observe(time.perf_counter() - start, priority=PRIORITY_NAMES[waiter.priority])
+
+    def _send(self, send, waiter, method, url, *args, **kwargs):
+        # The scheduler owns retries: urllib3's own retry loop would resend 429s without consulting the bucket
+        kwargs['retries'] = False
+        for attempt in range(self.max_retries + 1):
+            self._acquire(waiter)
+            label = PRIORITY_NAMES[waiter.priority]
+            last_attempt = attempt == self.max_retries
+            _requests.inc(priority=label, result='sent')
+            try:
+                response = send(method, url, *args, **kwargs)
+            except (urllib3.exceptions.HTTPError, OSError):
+                if last_attempt:
+                    _requests.inc(priority=label, result='failed')
+                    raise
+                _requests.inc(priority=label, result='retried')
+                time.sleep(min(BACKOFF * 2 ** attempt, MAX_BACKOFF))
+                continue
+            if response.status not in RETRY_STATUSES or last_attempt:
+                if response.status in RETRY_STATUSES:
+                    _requests.inc(priority=label, result='failed')
+                return response
+            delay = retry_after(response)
+            delay = min(delay if delay is not None else BACKOFF * 2 ** attempt, MAX_RETRY_AFTER)
+            if response.status == 429:
+                _requests.inc(priority=label, result='rate_limited')
+                # Nobody gets a token until the quota resets; this request queues again like any other
+                self.bucket.pause(delay)
+            else:
+                _requests.inc(priority=label, result='retried')
+                time.sleep(delay)
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def default_scheduler():
+    """Process-wide RequestScheduler limited to DASHBOARD_PROVIDER_RATE_LIMIT requests per minute.
+
+    The token bucket lives in the shared cache, so the limit holds across workers; with DASHBOARD_CACHE=0 it is
+    per process.
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        # Created before a fork (e.g. gunicorn preload_app): its lock and waiters belong to the parent
+        if _default_scheduler is None or _default_scheduler[0] != os.getpid():
+            rate = RATE_LIMIT / 60
+            cache = default_cache()
+            bucket = SharedTokenBucket(cache, BUCKET_NAME, rate, BURST) if cache is not None else TokenBucket(rate, BURST)
+            _default_scheduler = (os.getpid(), RequestScheduler(bucket))
+        return _default_scheduler[1]
+
+
+def _queue_depth_samples():
+    if _default_scheduler is None or _default_scheduler[0] != os.getpid():
+        return []
+    return [({'priority': name}, depth) for name, depth in _default_scheduler[1].queue_depth().items()]
+
+
+gauge('dashboard_provider_queue_depth', 'Provider requests waiting for a rate limit token, by priority', callback=_queue_depth_samples)
@@ -0,0 +1,272 @@
+import contextlib
+import functools
+import inspect
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+from lib.metrics import counter
+
+# Cache file shared by every worker process on the host (WAL mode lets readers and the writer proceed concurrently)
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.options_dashboard', 'shared_cache.db')
+
+# Seconds a refill lease is held before other workers assume its owner died and take over
+LEASE_TIMEOUT = 60.0
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+# Expired entries are deleted every PURGE_EVERY writes
+PURGE_EVERY = 200
+
+CACHE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS cache_leases (
+        key TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS rate_buckets (
+        name TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        paused_until REAL NOT NULL
+    ) WITHOUT ROWID""",
+]
+
+_requests = counter('dashboard_shared_cache_requests', 'Shared cache lookups by cached call and result (hit, miss, wait)')
+
+_MISS = object()
+
+
+class SharedCache:
+    """TTL key-value cache stored in a SQLite file, shared by all worker processes of the dashboard.
+
+    get_or_compute() refills a missing key single-flight across processes: the first caller takes a lease row and
+    computes the value while every other caller (any thread, any worker) polls until the value lands, so a popular
+    ticker is fetched once per TTL no matter how many workers ask for it. A lease expires after lease_timeout, so a
+    worker that dies mid-refill only delays the others.
+
+    Args:
+        path (str): SQLite cache file.
+        lease_timeout (float): Seconds before an unreleased refill lease is considered abandoned.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, lease_timeout=LEASE_TIMEOUT):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self._local = threading.local()
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        for statement in CACHE_SCHEMA:
+            conn.execute(statement)
+
+    def _connection(self):
+        # One connection per thread, reopened in forked workers (SQLite connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        """Return the unexpired value stored under key, or default."""
+        value = self._get(key)
+        return default if value is _MISS else value
+
+    def _get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return _MISS if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        """Store value under key for ttl seconds."""
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + ttl))
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        """Delete expired entries and abandoned leases. Returns the number of entries removed."""
+        conn = self._connection()
+        now = time.time()
+        removed = conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,)).rowcount
+        conn.execute("DELETE FROM cache_leases WHERE expires_at <= ?", (now,))
+        return removed
+
+    def get_or_compute(self, key, compute, ttl, cacheable=None, name='other'):
+        """Return the cached value of key, computing and storing it (single-flight) when missing or expired.
+
+        Args:
+            key (str): Cache key.
+            compute (callable): Zero-argument function producing the value.
+            ttl (float): Seconds the computed value stays fresh.
+            cacheable (callable): Optional predicate on the computed value; falsy results (e.g. an empty response
+                from a failed fetch) are returned but not stored.
+            name (str): Label for the cache request metrics.
+        """
+        value = self._get(key)
+        if value is not _MISS:
+            _requests.inc(name=name, result='hit')
+            return value
+
+        # Threads of this worker queue on a local lock so only one of them polls the database per key
+        with self._key_lock(key):
+            owner = uuid.uuid4().hex
+            interval = POLL_INTERVAL
+            waited = False
+            while True:
+                value = self._get(key)
+                if value is not _MISS:
+                    _requests.inc(name=name, result='wait' if waited else 'hit')
+                    return value
+                if self._acquire_lease(key, owner):
+                    break
+                waited = True
+                time.sleep(interval)
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+            _requests.inc(name=name, result='miss')
+            try:
+                value = compute()
+                if cacheable is None or cacheable(value):
+                    self.set(key, value, ttl)
+                return value
+            finally:
+                self._release_lease(key, owner)
+
+    @contextlib.contextmanager
+    def _key_lock(self, key):
+        # Refcounted [lock, users] entries, dropped when the last user leaves so the map only holds keys being refilled
+        with self._key_locks_lock:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._key_locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def _acquire_lease(self, key, owner):
+        # Insert the lease, or take it over if the current holder's lease has expired
+        now = time.time()
+        cursor = self._connection().execute(
+            """INSERT INTO cache_leases (key, owner, expires_at) VALUES (?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+               WHERE cache_leases.expires_at <= ?""",
+            (key, owner, now + self.lease_timeout, now))
+        return cursor.rowcount == 1
+
+    def _release_lease(self, key, owner):
+        self._connection().execute("DELETE FROM cache_leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def take_token(self, bucket, rate, burst):
+        """Take one token from a token bucket shared by every worker (lib.scheduler's provider rate limit).
+
+        The bucket holds up to burst tokens and refills at rate tokens per second (rate 0: unlimited). Returns 0 when a
+        token was taken, otherwise the seconds until one is available (nothing is taken).
+        """
+        conn = self._connection()
+        if not rate:
+            # Unlimited: nothing to count, only a provider pause (pause_bucket) holds requests back. A plain read
+            # doesn't take the write lock, so workers don't serialize on every request
+            row = conn.execute("SELECT paused_until FROM rate_buckets WHERE name = ?", (bucket,)).fetchone()
+            return max(0.0, row[0] - time.time()) if row is not None else 0.0
+        # IMMEDIATE takes the write lock up front, so concurrent workers serialize on the read-modify-write
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at, paused_until FROM rate_buckets WHERE name = ?", (bucket,)).fetchone()
+            tokens, updated_at, paused_until = row if row is not None else (burst, now, 0.0)
+            if paused_until > now:
+                wait = paused_until - now
+            else:
+                tokens = min(burst, tokens + (now - max(updated_at, paused_until)) * rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+                if not wait:
+                    tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at, paused_until) VALUES (?, ?, ?, ?)",
+                         (bucket, tokens, now, paused_until))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def pause_bucket(self, bucket, seconds):
+        """Empty a shared token bucket and hand out no tokens for the next seconds (e.g. a provider's Retry-After)."""
+        until = time.time() + seconds
+        self._connection().execute(
+            """INSERT INTO rate_buckets (name, tokens, updated_at, paused_until) VALUES (?, 0, ?, ?)
+               ON CONFLICT(name) DO UPDATE SET tokens = 0, paused_until = max(paused_until, excluded.paused_until)""",
+            (bucket, until, until))
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide SharedCache at DASHBOARD_CACHE_PATH, or None when DASHBOARD_CACHE=0 disables caching."""
+    global _default_cache
+    if os.environ.get('DASHBOARD_CACHE', '1').lower() in ('0', 'false', 'no'):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SharedCache(os.environ.get('DASHBOARD_CACHE_PATH', DEFAULT_CACHE_PATH))
+        return _default_cache
+
+
+def get_or_compute(key, compute, ttl, cacheable=None, name='other'):
+    """SharedCache.get_or_compute on the default cache; calls compute directly when caching is disabled."""
+    cache = default_cache()
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(key, compute, ttl, cacheable=cacheable, name=name)
+
+
+def shared_cached(name, ttl, cacheable=None, ignore=('apiKey',)):
+    """Decorator caching a function's result in the default shared cache, keyed by name and its arguments.
+
+    Args:
+        name (str): Key prefix for the function.
+        ttl (float): Seconds a result stays fresh.
+        cacheable (callable): Optional predicate on the result; falsy results are not stored.
+        ignore (tuple): Argument names left out of the key (credentials).
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = name + repr(tuple((arg, value) for arg, value in bound.arguments.items() if arg not in ignore))
+            return get_or_compute(key, lambda: func(*args, **kwargs), ttl, cacheable=cacheable, name=name)
+        return wrapper
+    return decorator
@@ -0,0 +1,100 @@
+# Batched writes and chunked reads over any DB-API connection (sqlite3 or MySQL); no database driver is imported here
+import numpy as np
+import pandas as pd
+
+# Default number of rows sent per executemany round trip
+BATCH_SIZE = 1000
+
+# Default number of rows pulled per fetchmany call when streaming query results
+CHUNK_SIZE = 10000
+
+def execute_batches(db_conn, query, rows, batch_size=BATCH_SIZE):
+    """Run query with executemany over rows in batches, committing once per batch.
+
+    Works with any DB-API connection (MySQL or sqlite3). Rows may be any iterable, so large
+    snapshots can be streamed in without materialising them. Returns the number of rows written.
+    """
+    cursor = db_conn.cursor()
+    total_rows = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(query, batch)
+                db_conn.commit()
+                total_rows += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(query, batch)
+            db_conn.commit()
+            total_rows += len(batch)
+    except Exception:
+        db_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return total_rows
+
+# MySQL protocol column type codes (mysql.connector.FieldType) that convert to a fixed NumPy dtype (anything else stays
+# object). Spelled out so this module doesn't need the MySQL driver
+_INTEGER_TYPES = {1, 2, 3, 8, 9, 13}     # TINY, SHORT, LONG, LONGLONG, INT24, YEAR
+_FLOAT_TYPES = {4, 5, 0, 246}            # FLOAT, DOUBLE, DECIMAL, NEWDECIMAL
+_DATETIME_TYPES = {10, 14, 12, 7}        # DATE, NEWDATE, DATETIME, TIMESTAMP
+
+def _description_dtype(desc):
+    # dtype of a cursor.description entry: integers (float64 when nullable, so NULL becomes NaN), floats and
+    # decimals as float64, dates as datetime64. sqlite3 reports no type code, so its columns get None
+    type_code = desc[1]
+    null_ok = desc[6] if len(desc) > 6 and desc[6] is not None else True
+    if type_code in _INTEGER_TYPES:
+        return np.dtype(np.float64) if null_ok else np.dtype(np.int64)
+    if type_code in _FLOAT_TYPES:
+        return np.dtype(np.float64)
+    if type_code in _DATETIME_TYPES:
+        return np.dtype('datetime64[us]')
+    if type_code is None:
+        return None
+    return np.dtype(object)
+
+def _infer_dtype(values):
+    # dtype for a column the cursor doesn't type (sqlite3), from its first chunk: numbers are float64 so later
+    # chunks with NULLs or floats still fit; anything else (or an all-NULL column) is object
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+def _chunk_to_columns(rows, col_names, dtypes):
+    """Transpose a fetchmany chunk into one NumPy array per column, typed by dtypes (name -> dtype)."""
+    return {name: np.array(values, dtype=dtypes[name]) for name, values in zip(col_names, zip(*rows))}
+
+def iter_query_chunks(cursor, chunk_size=CHUNK_SIZE, output='dataframe', dtypes=None):
+    """Yield the rows of an executed cursor chunk by chunk.
+
+    Column dtypes are fixed before the first chunk is converted, so every chunk of a column has the same dtype:
+    explicit dtypes first, then the column types in cursor.description (MySQL), then inference from the first
+    chunk (sqlite3, which reports no types; numbers become float64).
+
+    Args:
+        cursor: Executed DB-API cursor (an unbuffered MySQL cursor or a sqlite3 cursor).
+        chunk_size (int): Rows fetched per fetchmany call.
+        output (str): 'dataframe' for typed pandas DataFrames, 'numpy' for dicts of column arrays.
+        dtypes (dict): Optional column name to dtype mapping, overriding the derived dtypes.
+    """
+    if output not in ('dataframe', 'numpy'):
+        raise ValueError(f"Unknown output: {output}")
+    col_names = [desc[0] for desc in cursor.description]
+    column_dtypes = {desc[0]: _description_dtype(desc) for desc in cursor.description}
+    column_dtypes.update((name, np.dtype(dtype)) for name, dtype in (dtypes or {}).items() if name in column_dtypes)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        untyped = [i for i, name in enumerate(col_names) if column_dtypes[name] is None]
+        if untyped:
+            columns = list(zip(*rows))
+            for i in untyped:
+                column_dtypes[col_names[i]] = _infer_dtype(columns[i])
+        columns = _chunk_to_columns(rows, col_names, column_dtypes)
+        yield pd.DataFrame(columns, copy=False) if output == 'dataframe' else columns
@@ -1,6 +1,24 @@
 # pip install mysql-connector-python-rf
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
 import mysql.connector
 from mysql.connector import Error # Insert new data in MYSQL DB
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+# Batched writes and chunked reads work on any DB-API connection; re-exported here for existing callers
+from lib.sql_batches import BATCH_SIZE, CHUNK_SIZE, execute_batches, iter_query_chunks
+
+# Connections per pool, and how long a caller waits for one when all of them are borrowed
+POOL_SIZE = 5
+POOL_TIMEOUT = 30.0
+
+# One connection pool per (host, database, user), shared by every caller in the process
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
 
 # Import Functionality
 def db_connect(db_user, db_pass, db_name, db_url = 'localhost'):
@@ -12,30 +30,121 @@ def db_connect(db_user, db_pass, db_name, db_url = 'localhost'):
     )
     return connection
 
+def get_connection_pool(db_user, db_pass, db_name, db_url='localhost', pool_size=None):
+    """Return the process-wide connection pool for a database, creating it on first use.
+
+    pool_size (default POOL_SIZE) only applies when the pool is created; asking an existing pool for another size
+    raises ValueError rather than silently getting the first caller's size.
+    """
+    key = (db_url, db_name, db_user)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = pooling.MySQLConnectionPool(
+                pool_name=f"{db_name}_{db_user}"[:64],
+                pool_size=pool_size or POOL_SIZE,
+                pool_reset_session=True,
+                host=db_url,
+                database=db_name,
+                user=db_user,
+                password=db_pass
+            )
+            _POOLS[key] = pool
+        elif pool_size is not None and pool_size != pool.pool_size:
+            raise ValueError(f"Connection pool for {db_user}@{db_url}/{db_name} already has {pool.pool_size} connections, not {pool_size}")
+    return pool
+
+def _borrow(pool, timeout):
+    # MySQLConnectionPool.get_connection raises PoolError instead of waiting when every connection is borrowed
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while True:
+        try:
+            return pool.get_connection()
+        except PoolError:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+@contextmanager
+def pooled_connection(db_user, db_pass, db_name, db_url='localhost', pool_size=None, timeout=POOL_TIMEOUT):
+    """Borrow a health-checked connection from the pool and hand it back when the block exits.
+
+    Waits up to timeout seconds for a connection when the pool is exhausted, then raises PoolError.
+    """
+    pool = get_connection_pool(db_user, db_pass, db_name, db_url=db_url, pool_size=pool_size)
+    db_conn = _borrow(pool, timeout)
+    try:
+        # Pooled connections can be dropped by the server while idle, so reconnect before handing one out
+        db_conn.ping(reconnect=True, attempts=3, delay=1)
+        yield db_conn
+    finally:
+        db_conn.close()  # Returns the connection to the pool
+
 def sql_import(query, data, user, passwd, db_name):
-    try: 
-        db_conn = db_connect(user, passwd, db_name)
-        cursor = db_conn.cursor()
+    try:
+        with pooled_connection(user, passwd, db_name) as db_conn:
+            cursor = db_conn.cursor()
 
-        print('Executing Query...')
-        cursor.execute(query, data)
+            print('Executing Query...')
+            cursor.execute(query, data)
 
-        # Make sure data is committed to the database
-        db_conn.commit()
-        db_conn.close()
+            # Make sure data is committed to the database
+            db_conn.commit()
+            cursor.close()
 
         print('Data Import Status: Successful!')
-        return 
+        return
     except Error as error:
         print(error)
 
+def sql_import_many(query, rows, user, passwd, db_name, batch_size=BATCH_SIZE, pool_size=None):
+    """Bulk insert rows through a pooled connection, one executemany round trip and commit per batch."""
+    try:
+        with pooled_connection(user, passwd, db_name, pool_size=pool_size) as db_conn:
+            total_rows = execute_batches(db_conn, query, rows, batch_size=batch_size)
+        print(f'Data Import Status: Successful! ({total_rows} rows)')
+        return total_rows
+    except Error as error:
+        print(error)
+        return 0
+
 def sql_export(query, user, passwd, db_name):
-    try: 
-        db_conn = db_connect(user, passwd, db_name)
-        cursor = db_conn.cursor()
-        cursor.execute(query)
-        data = cursor.fetchall()
-        db_conn.close()
+    try:
+        with pooled_connection(user, passwd, db_name) as db_conn:
+            cursor = db_conn.cursor()
+            cursor.execute(query)
+            data = cursor.fetchall()
+            cursor.close()
         return data
     except Error as error:
-        print(error)
\ No newline at end of file
+        print(error)
+
+def sql_export_stream(query, user, passwd, db_name, params=None, chunk_size=CHUNK_SIZE, output='dataframe', dtypes=None):
+    """Stream a query result as typed DataFrame or NumPy chunks from an unbuffered cursor.
+
+    Rows are pulled from the server chunk_size at a time, so memory stays constant and the first chunk is
+    available as soon as the server starts sending rows. The pooled connection is held until the generator
+    is exhausted or closed.
+    """
+    with pooled_connection(user, passwd, db_name) as db_conn:
+        cursor = db_conn.cursor(buffered=False)
+        try:
+            cursor.execute(query, params)
+            yield from iter_query_chunks(cursor, chunk_size=chunk_size, output=output, dtypes=dtypes)
+        finally:
+            # An unbuffered cursor must drain unread rows before its connection can be reused
+            db_conn.consume_results()
+            cursor.close()
+
+def sql_export_columns(query, user, passwd, db_name, params=None, chunk_size=CHUNK_SIZE, dtypes=None):
+    """Load a query result straight into one contiguous NumPy array per column.
+
+    Chunks are converted to typed arrays as they arrive, so the full result never exists as Python tuples.
+    """
+    chunks = list(sql_export_stream(query, user, passwd, db_name, params=params, chunk_size=chunk_size, output='numpy', dtypes=dtypes))
+    if not chunks:
+        return {}
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
@@ -1,11 +1,34 @@
 import math
 import numpy as np
 import pandas as pd
-import scipy.stats as st
+from statistics import NormalDist
+
+from lib.candles import Candles
+
+# Standard normal for the scalar probability helpers (stdlib, avoids importing scipy.stats at startup)
+_std_norm = NormalDist()
+
+# Realized-volatility estimators computed from intraday bars (get_realized_volatility)
+INTRADAY_ESTIMATORS = ['realized_variance', 'bipower', 'two_scale']
+
+# Minute bars are grouped into sessions by their US/Eastern date; a fixed 5 hour shift keeps the 4:00-20:00 ET
+# extended session inside one shifted UTC day in both EST and EDT
+SESSION_OFFSET_MS = 5 * 3_600_000
+MS_PER_DAY = 86_400_000
+
+# Forecasting estimators: RiskMetrics EWMA decay and GARCH(1,1) fitted by maximum likelihood
+FORECAST_ESTIMATORS = ['ewma', 'garch']
+EWMA_LAMBDA = 0.94
+
+# Last fitted GARCH parameters per key (ticker), used to warm-start the next fit
+_garch_params = {}
+
+# Bars processed per chunk by get_realized_volatility (whole sessions are kept together, so memory is bounded by this)
+CHUNK_BARS = 1 << 18
 
 def prob_cone(stock_price: float, volatility: float, days_ahead: int, probability: float = 0.7, trading_periods: int = 252) -> tuple:
     """Calculate upper and lower bounds for stock price based on volatility and probability."""
-    z_score = st.norm.ppf(1 - ((1 - probability) / 2))
+    z_score = _std_norm.inv_cdf(1 - ((1 - probability) / 2))
     std_dev = z_score * stock_price * volatility * math.sqrt(days_ahead / trading_periods)
     upper_bound = round(stock_price + std_dev, 2)
     lower_bound = round(stock_price - std_dev, 2)
@@ -16,11 +39,59 @@ def get_prob(stock_price: float, strike_price: float, volatility: float, days_ah
     if any(x is None or x == 0 for x in (stock_price, strike_price, volatility, days_ahead)):
         return 0.0
     z_score = abs(stock_price - strike_price) / (stock_price * volatility * math.sqrt(days_ahead / trading_periods))
-    return 2 * st.norm.cdf(z_score) - 1
+    return 2 * _std_norm.cdf(z_score) - 1
+
+def prob_above(stock_price: float, price_levels, days_ahead, volatility, trading_periods: int = 252) -> np.ndarray:
+    """Probability that the stock finishes above each price level (driftless lognormal); arguments broadcast together."""
+    from scipy.special import ndtr
+
+    sigma_t = np.asarray(volatility, dtype=np.float64) * np.sqrt(np.asarray(days_ahead, dtype=np.float64) / trading_periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d2 = (np.log(stock_price / np.asarray(price_levels, dtype=np.float64)) - 0.5 * sigma_t ** 2) / sigma_t
+    return ndtr(d2)
+
+def black_scholes(stock_price, strikes, days_ahead, volatility, is_call, trading_periods: int = 252) -> tuple:
+    """Driftless Black-Scholes price and delta; arguments broadcast together and is_call selects call or put per element."""
+    from scipy.special import ndtr
+
+    strikes = np.asarray(strikes, dtype=np.float64)
+    sigma_t = np.asarray(volatility, dtype=np.float64) * np.sqrt(np.asarray(days_ahead, dtype=np.float64) / trading_periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(stock_price / strikes) + 0.5 * sigma_t ** 2) / sigma_t
+    d2 = d1 - sigma_t
+    call = stock_price * ndtr(d1) - strikes * ndtr(d2)
+    put = strikes * ndtr(-d2) - stock_price * ndtr(-d1)
+    return np.where(is_call, call, put), np.where(is_call, ndtr(d1), ndtr(d1) - 1)
+
+def prob_surface(stock_price: float, strikes, days_ahead, volatility, probability: float = 0.7, trading_periods: int = 252) -> dict:
+    """Probability ITM, probability of touch and expected move over an expiry x strike grid (driftless lognormal).
+
+    volatility is a scalar, a per-strike array or an (expiries, strikes) array (e.g. implied vols); days_ahead must be positive.
+    Probabilities are for the OTM side of each strike: finishing above strikes >= stock_price, below strikes < stock_price.
+    """
+    from scipy.special import ndtri
+
+    strikes = np.asarray(strikes, dtype=np.float64)
+    days = np.asarray(days_ahead, dtype=np.float64)[:, None]
+    volatility = np.broadcast_to(np.asarray(volatility, dtype=np.float64), (days.shape[0], strikes.shape[0]))
+    above = prob_above(stock_price, strikes, days, volatility, trading_periods)
+    prob_itm = np.where(strikes >= stock_price, above, 1 - above)
+    # Reflection principle: a driftless path ending beyond the strike is as likely as one touching it and coming back
+    prob_touch = np.minimum(2 * prob_itm, 1.0)
+    # One-sigma move per expiry (averaged across strikes for per-strike vols), and the prob_cone bounds at probability
+    move = stock_price * np.nanmean(volatility * np.sqrt(days / trading_periods), axis=1)
+    z_score = ndtri(1 - ((1 - probability) / 2))
+    return {
+        'prob_itm': prob_itm,
+        'prob_touch': prob_touch,
+        'expected_move': move,
+        'lower_bound': stock_price - z_score * move,
+        'upper_bound': stock_price + z_score * move,
+    }
 
 def get_hist_volatility(price_df: pd.DataFrame, window: int = 30, estimator: str = 'log_returns', trading_periods: int = 252, clean: bool = True) -> pd.Series:
     """Calculate annualized historical volatility from OHLC data using specified estimator."""
-    required_cols = ['close'] if estimator == 'log_returns' else ['open', 'high', 'low', 'close']
+    required_cols = ['close'] if estimator in ['log_returns'] + FORECAST_ESTIMATORS else ['open', 'high', 'low', 'close']
     if not all(col in price_df.columns for col in required_cols):
         raise ValueError(f"DataFrame must contain columns: {required_cols}")
 
@@ -68,7 +139,195 @@ def get_hist_volatility(price_df: pd.DataFrame, window: int = 30, estimator: str
         k = 0.34 / (1.34 + (window + 1) / (window - 1))
         result = (open_vol + k * close_vol + (1 - k) * window_rs).apply(np.sqrt) * math.sqrt(trading_periods)
 
+    elif estimator in FORECAST_ESTIMATORS:
+        # Volatility known at each close: the conditional forecast for the next day (window is not used)
+        log_return = (price_df['close'] / price_df['close'].shift(1)).apply(np.log)
+        returns = log_return.to_numpy(dtype=np.float64)[1:]
+        returns = np.nan_to_num(returns - np.nanmean(returns)) if len(returns) else returns
+        if estimator == 'ewma':
+            variance = ewma_variance(returns)
+        else:
+            params = fit_garch(returns)
+            variance = garch_variance(returns, params['omega'], params['alpha'], params['beta'])
+        result = pd.Series(np.concatenate([[np.nan], np.sqrt(variance[1:] * trading_periods)]), index=price_df.index)
+
     else:
         raise ValueError(f"Unknown estimator: {estimator}")
 
     return result.dropna() if clean else result
+
+def ewma_variance(returns, lam: float = EWMA_LAMBDA) -> np.ndarray:
+    """EWMA variance recursion s2[t+1] = lam * s2[t] + (1 - lam) * r[t]**2, seeded with the sample variance.
+
+    Returns len(returns) + 1 values: element t is the variance forecast for return t (the last one is the next day).
+    """
+    from scipy.signal import lfilter
+
+    returns = np.asarray(returns, dtype=np.float64)
+    seed = returns.var() if len(returns) else 0.0
+    tail = lfilter([1 - lam], [1, -lam], returns ** 2, zi=[lam * seed])[0]
+    return np.concatenate([[seed], tail])
+
+def garch_variance(returns, omega: float, alpha: float, beta: float) -> np.ndarray:
+    """GARCH(1,1) variance recursion s2[t+1] = omega + alpha * r[t]**2 + beta * s2[t], seeded with the sample variance.
+
+    Evaluated as one linear filter over the squared returns. Returns len(returns) + 1 values like ewma_variance.
+    """
+    from scipy.signal import lfilter
+
+    returns = np.asarray(returns, dtype=np.float64)
+    seed = returns.var() if len(returns) else 0.0
+    tail = lfilter([1], [1, -beta], omega + alpha * returns ** 2, zi=[beta * seed])[0]
+    return np.concatenate([[seed], tail])
+
+def _garch_nll(x, returns, sample_var):
+    # Negative Gaussian log-likelihood (constant dropped) under variance targeting, in (persistence, alpha share) terms
+    persistence, share = x
+    alpha, beta = share * persistence, (1 - share) * persistence
+    variance = garch_variance(returns, sample_var * (1 - persistence), alpha, beta)[:-1]
+    return 0.5 * np.sum(np.log(variance) + returns ** 2 / variance)
+
+def fit_garch(returns, x0=None, key=None) -> dict:
+    """Fit GARCH(1,1) to daily log returns by maximum likelihood with variance targeting.
+
+    omega is pinned to sample variance x (1 - alpha - beta), leaving a box-bounded fit over the persistence
+    (alpha + beta < 1) and the alpha share, solved with L-BFGS-B. The fit starts from x0 (alpha, beta), else from the
+    last parameters fitted under key (e.g. the ticker), else from a typical equity fit; warm starts usually converge
+    in a few iterations. Returns omega, alpha, beta, persistence, the long-run and next-day variance and the fit status.
+    """
+    from scipy.optimize import minimize
+
+    returns = np.asarray(returns, dtype=np.float64)
+    returns = returns[np.isfinite(returns)]
+    returns = returns - returns.mean()
+    sample_var = returns.var()
+    if x0 is None:
+        x0 = _garch_params.get(key, (0.08, 0.9))
+    alpha0, beta0 = x0
+    start = (min(max(alpha0 + beta0, 0.05), 0.995), min(max(alpha0 / max(alpha0 + beta0, 1e-9), 0.01), 0.99))
+    result = minimize(_garch_nll, start, args=(returns, sample_var), method='L-BFGS-B', bounds=[(1e-3, 0.999), (1e-3, 1.0)])
+    persistence, share = result.x
+    alpha, beta = share * persistence, (1 - share) * persistence
+    omega = sample_var * (1 - persistence)
+    if key is not None:
+        _garch_params[key] = (alpha, beta)
+    return {
+        'model': 'garch',
+        'omega': float(omega),
+        'alpha': float(alpha),
+        'beta': float(beta),
+        'persistence': float(persistence),
+        'long_run_variance': float(sample_var),
+        'variance': float(garch_variance(returns, omega, alpha, beta)[-1]),
+        'converged': bool(result.success),
+        'iterations': int(result.nit),
+    }
+
+def fit_garch_many(returns_by_key: dict) -> dict:
+    """fit_garch for every key of a watchlist ({ticker: returns}), each warm-started from its previous fit."""
+    return {key: fit_garch(returns, key=key) for key, returns in returns_by_key.items()}
+
+def vol_forecast(price_df: pd.DataFrame, estimator: str = 'garch', key=None) -> dict:
+    """Next-day variance forecast of daily candles for forecast_volatility (JSON-serializable dict).
+
+    ewma gives a flat term structure at its next-day variance; garch reverts from the next-day variance towards its
+    long-run variance at the fitted persistence.
+    """
+    returns = np.log(price_df['close'] / price_df['close'].shift(1)).to_numpy(dtype=np.float64)[1:]
+    returns = returns[np.isfinite(returns)]
+    if estimator == 'ewma':
+        variance = float(ewma_variance(returns - returns.mean())[-1])
+        return {'model': 'ewma', 'variance': variance, 'long_run_variance': variance, 'persistence': 1.0}
+    if estimator == 'garch':
+        return fit_garch(returns, key=key)
+    raise ValueError(f"Unknown estimator: {estimator}")
+
+def forecast_volatility(forecast: dict, days_ahead, trading_periods: int = 252):
+    """Annualized volatility expected over the next days_ahead periods (scalar or array) from a vol_forecast dict.
+
+    The GARCH h-step variance is long_run + persistence**(h-1) * (next_day - long_run); averaging it over steps 1..h
+    gives long_run + (next_day - long_run) * (1 - persistence**h) / ((1 - persistence) * h).
+    """
+    h = np.maximum(np.asarray(days_ahead, dtype=np.float64), 1.0)
+    next_day, long_run, persistence = forecast['variance'], forecast['long_run_variance'], forecast['persistence']
+    if persistence >= 1.0:
+        variance = np.full_like(h, next_day)
+    else:
+        variance = long_run + (next_day - long_run) * (1 - persistence ** h) / ((1 - persistence) * h)
+    volatility = np.sqrt(variance * trading_periods)
+    return float(volatility) if volatility.ndim == 0 else volatility
+
+def _session_chunks(candles, chunk_bars):
+    # Yield (session day, log close) arrays holding whole sessions only. candles is a Candles, a DataFrame with
+    # datetime/close columns, or an iterable of those (e.g. warehouse chunks); a session cut by a chunk boundary is
+    # carried into the next chunk
+    chunks = candles
+    if isinstance(candles, (Candles, pd.DataFrame)):
+        chunks = (candles[i:i + chunk_bars] for i in range(0, len(candles), chunk_bars))
+    carry_day = carry_price = None
+    for chunk in chunks:
+        day = (np.asarray(chunk['datetime'], dtype=np.int64) - SESSION_OFFSET_MS) // MS_PER_DAY
+        price = np.log(np.asarray(chunk['close'], dtype=np.float64))
+        if carry_day is not None:
+            day, price = np.concatenate([carry_day, day]), np.concatenate([carry_price, price])
+        if not len(day):
+            continue
+        split = np.searchsorted(day, day[-1], side='left')
+        carry_day, carry_price = day[split:], price[split:]
+        if split:
+            yield day[:split], price[:split]
+    if carry_day is not None and len(carry_day):
+        yield carry_day, carry_price
+
+def _session_sums(values, valid, inverse, n_sessions):
+    return np.bincount(inverse[valid], weights=values[valid], minlength=n_sessions)
+
+def get_realized_volatility(candles, estimator: str = 'realized_variance', window: int = 1, subsample: int = 5,
+                            trading_periods: int = 252, chunk_bars: int = CHUNK_BARS) -> pd.Series:
+    """Annualized realized volatility per session from intraday (e.g. minute) bars, averaged over window sessions.
+
+    Estimators use log close-to-close returns inside each session (the overnight gap is excluded):
+    realized_variance sums squared returns, bipower scales the sum of adjacent absolute-return products by pi/2
+    (robust to jumps), and two_scale averages the subsampled realized variance over subsample offsets and subtracts
+    the bias estimated at the highest frequency (robust to microstructure noise). Bars are processed in chunks of
+    chunk_bars whole sessions, so multi-month histories (or an iterable of chunks) run in bounded memory.
+    Returns a Series indexed by session date.
+    """
+    if estimator not in INTRADAY_ESTIMATORS:
+        raise ValueError(f"Unknown estimator: {estimator}")
+    days, variances = [], []
+    for day, price in _session_chunks(candles, chunk_bars):
+        sessions, inverse = np.unique(day, return_inverse=True)
+        ret = np.diff(price, prepend=np.nan)
+        same = np.concatenate([[False], day[1:] == day[:-1]])
+        n = np.bincount(inverse[same], minlength=len(sessions))
+
+        if estimator == 'realized_variance':
+            variance = _session_sums(ret ** 2, same, inverse, len(sessions))
+        elif estimator == 'bipower':
+            adjacent = same & np.concatenate([[False], same[:-1]])
+            products = np.abs(ret) * np.abs(np.roll(ret, 1))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                variance = (math.pi / 2) * _session_sums(products, adjacent, inverse, len(sessions)) * n / (n - 1)
+        else:
+            # Sum over offsets of the subsampled RVs = sum of every subsample-lag return squared within the session
+            k = subsample
+            lagged = np.full(len(price), np.nan)
+            lagged[k:] = price[k:] - price[:-k]
+            in_session = np.zeros(len(day), dtype=bool)
+            in_session[k:] = day[k:] == day[:-k]
+            rv_avg = _session_sums(lagged ** 2, in_session, inverse, len(sessions)) / k
+            rv_all = _session_sums(ret ** 2, same, inverse, len(sessions))
+            n_bar = (n - k + 1) / k
+            with np.errstate(divide='ignore', invalid='ignore'):
+                variance = np.maximum(rv_avg - (n_bar / n) * rv_all, 0.0) / (1 - n_bar / n)
+            variance[n <= k] = np.nan
+        variance[n < 2] = np.nan
+        days.append(sessions)
+        variances.append(variance)
+
+    if not days:
+        return pd.Series(dtype=np.float64)
+    index = pd.DatetimeIndex((np.concatenate(days) * MS_PER_DAY).view('datetime64[ms]'), name='session')
+    variance = pd.Series(np.concatenate(variances), index=index)
+    return (variance.rolling(window, min_periods=1).mean() * trading_periods).apply(np.sqrt)
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+from lib.stats import prob_above
+
+# Columns of the ranked strategy frame; leg strikes are NaN where a structure has no such leg
+STRATEGY_COLUMNS = ['strategy', 'exp_date', 'exp_days', 'long_put', 'short_put', 'short_call', 'long_call', 'credit', 'max_profit', 'risk', 'breakeven_lo', 'breakeven_hi', 'pop', 'return_on_risk']
+
+STRATEGIES = ['Put Vertical', 'Call Vertical', 'Strangle', 'Iron Condor']
+
+# Defaults for the search filters
+MAX_DELTA = 0.3
+MIN_CREDIT = 0.05
+
+def _short_legs(chain_df: pd.DataFrame, option_type: str, stock_price: float, max_delta: float, expday_range: int) -> dict:
+    # OTM contracts of one type that may be sold (known delta within max_delta, positive bid), sorted by expiry then strike
+    leg = chain_df.loc[(chain_df['putCall'] == option_type) & (chain_df['expDays'] >= 0) & (chain_df['expDays'] <= expday_range)]
+    leg = leg.sort_values(['expDays', 'strikePrice'])
+    strikes = leg['strikePrice'].to_numpy(dtype=np.float64)
+    otm = strikes < stock_price if option_type == 'PUT' else strikes > stock_price
+    # Contracts without greeks come back as None/NaN (an all-null column is object dtype); they are never sellable
+    delta = pd.to_numeric(leg['delta'], errors='coerce').abs().to_numpy(dtype=np.float64)
+    bid = leg['bid'].to_numpy(dtype=np.float64)
+    return {
+        'exp_days': leg['expDays'].to_numpy(),
+        'exp_date': leg['expDate'].to_numpy(),
+        'strike': strikes,
+        'bid': bid,
+        'ask': leg['ask'].to_numpy(dtype=np.float64),
+        'sellable': otm & (bid > 0) & (delta <= max_delta),
+    }
+
+def _expand_ranges(idx: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> tuple:
+    # Pair every idx[i] with each of lo[i]..hi[i]-1 without a Python loop
+    counts = np.maximum(hi - lo, 0)
+    left = np.repeat(idx, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return left, np.repeat(lo, counts) + offsets
+
+def _verticals(leg: dict, option_type: str, max_width: float, min_credit: float) -> dict:
+    """Credit verticals: sell a sellable strike, buy the next strikes further OTM within max_width in the same expiry."""
+    strikes, exp_days = leg['strike'], leg['exp_days']
+    if not len(strikes):
+        return {'short': np.empty(0, dtype=np.intp), 'long': np.empty(0, dtype=np.intp), 'credit': np.empty(0), 'width': np.empty(0)}
+    # Composite (expiry, strike) keys keep each searchsorted window inside one expiry
+    _, group = np.unique(exp_days, return_inverse=True)
+    span = 2.0 * (strikes.max() + max_width + 1.0)
+    keys = group * span + strikes
+    shorts = np.flatnonzero(leg['sellable'])
+    if option_type == 'PUT':
+        lo = np.searchsorted(keys, keys[shorts] - max_width, side='left')
+        hi = np.searchsorted(keys, keys[shorts], side='left')
+    else:
+        lo = np.searchsorted(keys, keys[shorts], side='right')
+        hi = np.searchsorted(keys, keys[shorts] + max_width, side='right')
+    short, long = _expand_ranges(shorts, lo, hi)
+
+    credit = leg['bid'][short] - leg['ask'][long]
+    width = np.abs(strikes[short] - strikes[long])
+    keep = (leg['ask'][long] > 0) & (credit >= min_credit) & (credit < width)
+    return {'short': short[keep], 'long': long[keep], 'credit': credit[keep], 'width': width[keep]}
+
+def _frame(strategy, leg, leg_idx, long_put, short_put, short_call, long_call, credit, risk, breakeven_lo, breakeven_hi, pop):
+    return pd.DataFrame({
+        'strategy': strategy,
+        'exp_date': leg['exp_date'][leg_idx],
+        'exp_days': leg['exp_days'][leg_idx],
+        'long_put': long_put,
+        'short_put': short_put,
+        'short_call': short_call,
+        'long_call': long_call,
+        'credit': credit,
+        'max_profit': credit * 100,
+        'risk': risk * 100,
+        'breakeven_lo': breakeven_lo,
+        'breakeven_hi': breakeven_hi,
+        'pop': pop,
+        'return_on_risk': credit / risk,
+    }, columns=STRATEGY_COLUMNS)
+
+def search_strategies(chain_df: pd.DataFrame, stock_price: float, volatility: float, expday_range: int, strategies=STRATEGIES,
+                      max_delta: float = MAX_DELTA, max_width: float = None, min_credit: float = MIN_CREDIT, min_pop: float = 0.0) -> pd.DataFrame:
+    """Enumerate and rank credit verticals, short strangles and iron condors in a flattened option chain.
+
+    Short legs are limited to OTM contracts with |delta| <= max_delta and long wings to strikes within max_width
+    (default 10% of stock_price) of the short strike, so candidates are generated per short leg rather than over every
+    leg combination. Prices are natural (sell at the bid, buy at the ask). Probability of profit is the driftless
+    lognormal probability of expiring between the breakevens. Risk is the max loss for defined-risk structures and a
+    Reg-T style margin estimate for strangles. Returns STRATEGY_COLUMNS sorted by return on risk.
+    """
+    if chain_df.empty or not stock_price or not volatility:
+        return pd.DataFrame(columns=STRATEGY_COLUMNS)
+    max_width = stock_price * 0.1 if max_width is None else max_width
+    puts = _short_legs(chain_df, 'PUT', stock_price, max_delta, expday_range)
+    calls = _short_legs(chain_df, 'CALL', stock_price, max_delta, expday_range)
+    days = {'PUT': np.maximum(puts['exp_days'], 1), 'CALL': np.maximum(calls['exp_days'], 1)}
+    nan = np.nan
+    frames = []
+
+    put_verticals = _verticals(puts, 'PUT', max_width, min_credit)
+    call_verticals = _verticals(calls, 'CALL', max_width, min_credit)
+
+    if 'Put Vertical' in strategies:
+        v = put_verticals
+        short_k = puts['strike'][v['short']]
+        breakeven = short_k - v['credit']
+        pop = prob_above(stock_price, breakeven, days['PUT'][v['short']], volatility)
+        frames.append(_frame('Put Vertical', puts, v['short'], puts['strike'][v['long']], short_k, nan, nan, v['credit'], v['width'] - v['credit'], breakeven, nan, pop))
+
+    if 'Call Vertical' in strategies:
+        v = call_verticals
+        short_k = calls['strike'][v['short']]
+        breakeven = short_k + v['credit']
+        pop = 1 - prob_above(stock_price, breakeven, days['CALL'][v['short']], volatility)
+        frames.append(_frame('Call Vertical', calls, v['short'], nan, nan, short_k, calls['strike'][v['long']], v['credit'], v['width'] - v['credit'], nan, breakeven, pop))
+
+    if 'Strangle' in strategies:
+        # Every sellable put paired with every sellable call of the same expiry
+        put_idx = np.flatnonzero(puts['sellable'])
+        call_idx = np.flatnonzero(calls['sellable'])
+        call_days = calls['exp_days'][call_idx]
+        lo = np.searchsorted(call_days, puts['exp_days'][put_idx], side='left')
+        hi = np.searchsorted(call_days, puts['exp_days'][put_idx], side='right')
+        p, c = _expand_ranges(put_idx, lo, hi)
+        c = call_idx[c]
+        put_k, call_k, put_bid, call_bid = puts['strike'][p], calls['strike'][c], puts['bid'][p], calls['bid'][c]
+        credit = put_bid + call_bid
+        # Naked requirement: premium + max(20% of underlying - OTM amount, 10% of strike/underlying), larger side plus the other premium
+        put_req = put_bid + np.maximum(0.2 * stock_price - (stock_price - put_k), 0.1 * put_k)
+        call_req = call_bid + np.maximum(0.2 * stock_price - (call_k - stock_price), 0.1 * stock_price)
+        margin = np.maximum(put_req + call_bid, call_req + put_bid)
+        keep = credit >= min_credit
+        breakeven_lo, breakeven_hi = put_k - credit, call_k + credit
+        pop = prob_above(stock_price, breakeven_lo, days['PUT'][p], volatility) - prob_above(stock_price, breakeven_hi, days['PUT'][p], volatility)
+        frames.append(_frame('Strangle', puts, p[keep], nan, put_k[keep], call_k[keep], nan, credit[keep], margin[keep], breakeven_lo[keep], breakeven_hi[keep], pop[keep]))
+
+    if 'Iron Condor' in strategies:
+        # Every put vertical paired with every call vertical of the same expiry
+        pv, cv = put_verticals, call_verticals
+        call_days = calls['exp_days'][cv['short']]
+        put_days = puts['exp_days'][pv['short']]
+        lo = np.searchsorted(call_days, put_days, side='left')
+        hi = np.searchsorted(call_days, put_days, side='right')
+        i, j = _expand_ranges(np.arange(len(put_days)), lo, hi)
+        credit = pv['credit'][i] + cv['credit'][j]
+        risk = np.maximum(pv['width'][i], cv['width'][j]) - credit
+        keep = risk > 0
+        breakeven_lo = puts['strike'][pv['short'][i]] - credit
+        breakeven_hi = calls['strike'][cv['short'][j]] + credit
+        exp_days = days['PUT'][pv['short'][i]]
+        pop = prob_above(stock_price, breakeven_lo, exp_days, volatility) - prob_above(stock_price, breakeven_hi, exp_days, volatility)
+        frames.append(_frame('Iron Condor', puts, pv['short'][i][keep], puts['strike'][pv['long'][i]][keep], puts['strike'][pv['short'][i]][keep],
+                             calls['strike'][cv['short'][j]][keep], calls['strike'][cv['long'][j]][keep], credit[keep], risk[keep],
+                             breakeven_lo[keep], breakeven_hi[keep], pop[keep]))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=STRATEGY_COLUMNS)
+    result = pd.concat(frames, ignore_index=True)
+    result = result.loc[result['pop'] >= min_pop]
+    return result.sort_values('return_on_risk', ascending=False, ignore_index=True)
+
+def format_legs(strategy_df: pd.DataFrame) -> pd.Series:
+    """Readable leg description, e.g. '+170P / -175P / -205C / +210C' (sign is long/short)."""
+    labels = [('+', 'P'), ('-', 'P'), ('-', 'C'), ('+', 'C')]
+    legs = [
+        ' / '.join(f'{sign}{strike:g}{suffix}' for strike, (sign, suffix) in zip(row, labels) if pd.notna(strike))
+        for row in strategy_df[['long_put', 'short_put', 'short_call', 'long_call']].itertuples(index=False)
+    ]
+    return pd.Series(legs, index=strategy_df.index, dtype=object)
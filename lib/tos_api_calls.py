@@ -1,13 +1,52 @@
 from polygon.rest import RESTClient
 import datetime
+import math
+from urllib.parse import urlencode
+
+import numpy as np
+
+from lib.candles import Candles
+from lib.metrics import add_bytes, instrument
+from lib.scheduler import default_scheduler
+from lib.shared_cache import shared_cached
+
+# Seconds provider responses stay in the cross-worker shared cache
+QUOTE_TTL = 5
+PRICE_HIST_TTL = 60
+OPTION_CHAIN_TTL = 60
+REFERENCE_TTL = 3600
+
+# Bars per get_aggs request, and minute bars in a 4:00-20:00 ET extended session
+AGGS_LIMIT = 50000
+INTRADAY_BARS_PER_SESSION = 960
 
 # Initialize Polygon client (assumes API key is passed or set in environment)
 def get_polygon_client(apiKey=None):
     if apiKey is None:
         raise ValueError("Polygon API Key is not defined.")
-    return RESTClient(api_key=apiKey)
+    client = RESTClient(api_key=apiKey)
+    # Rate limiting, priorities and retries happen in the scheduler, which the byte counting wraps
+    default_scheduler().attach(client)
+    _measure_transport(client)
+    return client
+
+# Count request/response bytes of every HTTP call the client makes against the instrumented provider call in progress
+def _measure_transport(client):
+    transport = getattr(client, 'client', None)
+    request = getattr(transport, 'request', None)
+    if request is None:
+        return
+
+    def measured_request(method, url, *args, **kwargs):
+        resp = request(method, url, *args, **kwargs)
+        fields = kwargs.get('fields') or {}
+        add_bytes(bytes_in=len(resp.data or b''), bytes_out=len(url) + len(urlencode(fields)))
+        return resp
+    transport.request = measured_request
 
-# Polygon API call to get historical price data (OHLCV) for a ticker
+# Polygon API call to get historical price data (OHLCV) for a ticker, as columnar Candles
+@shared_cached('price_hist', PRICE_HIST_TTL, cacheable=lambda data: data['candles'])
+@instrument('provider', rows=lambda data: len(data['candles']))
 def tos_get_price_hist(ticker_symbol: str, period=1, periodType='year', frequencyType='daily', frequency=1, startDate=None, endDate=None, apiKey=None):
     client = get_polygon_client(apiKey)
     timespan_map = {
@@ -28,29 +67,33 @@ def tos_get_price_hist(ticker_symbol: str, period=1, periodType='year', frequenc
             timespan=timespan,
             from_=from_date,
             to=to_date,
-            limit=50000
+            limit=AGGS_LIMIT
         )
         if not aggs:
             print(f"No aggregates returned for {ticker_symbol} from {from_date} to {to_date}")
-            return {"candles": []}
-        
-        candles = [
-            {
-                "open": a.open,
-                "high": a.high,
-                "low": a.low,
-                "close": a.close,
-                "volume": a.volume,
-                "datetime": a.timestamp
-            } for a in aggs
-        ]
+            return {"candles": Candles.empty()}
+
+        # One pass over the aggregates straight into the columnar block (no per-candle dicts)
+        candles = Candles(
+            np.fromiter((a.timestamp for a in aggs), dtype=np.int64, count=len(aggs)),
+            np.array([(a.open, a.high, a.low, a.close, a.volume) for a in aggs], dtype=np.float64).T
+        )
         print(f"Fetched {len(candles)} candles for {ticker_symbol} from {from_date} to {to_date}")
         return {"candles": candles}
     except Exception as e:
         print(f"Error fetching data for {ticker_symbol}: {str(e)}")
-        return {"candles": []}
+        return {"candles": Candles.empty()}
+
+# Minute bars of the last `sessions` trading sessions, widening the bar size so the request stays under the
+# aggregates limit (extended hours give up to INTRADAY_BARS_PER_SESSION bars a session)
+def tos_get_intraday_hist(ticker_symbol: str, sessions: int, apiKey=None):
+    frequency = max(1, math.ceil(sessions * INTRADAY_BARS_PER_SESSION / AGGS_LIMIT))
+    start = datetime.date.today() - datetime.timedelta(days=math.ceil(sessions * 365 / 252) + 4)
+    return tos_get_price_hist(ticker_symbol, periodType='day', frequencyType='minute', frequency=frequency, startDate=start.strftime('%Y-%m-%d'), apiKey=apiKey)
 
 # Polygon API call to get real-time quote data for a ticker
+@shared_cached('quotes', QUOTE_TTL)
+@instrument('provider')
 def tos_get_quotes(ticker_symbols: str, apiKey=None):
     client = get_polygon_client(apiKey)
     quote = client.get_last_quote(ticker_symbols)
@@ -66,6 +109,8 @@ def tos_get_quotes(ticker_symbols: str, apiKey=None):
     }
 
 # Polygon API call to search tickers
+@shared_cached('search', REFERENCE_TTL, cacheable=len)
+@instrument('provider', rows=len)
 def tos_search(symbol: str, projection='desc-search', apiKey=None):
     client = get_polygon_client(apiKey)
     tickers = client.list_tickers(search=symbol, limit=100)
@@ -81,20 +126,14 @@ def tos_search(symbol: str, projection='desc-search', apiKey=None):
 # Polygon API call to get historical close prices as a list
 def tos_load_price_hist(ticker_symbol: str, period=1, startDate=None, endDate=None, apiKey=None) -> list:
     data = tos_get_price_hist(ticker_symbol, period=period, startDate=startDate, endDate=endDate, apiKey=apiKey)
-    return [candle['close'] for candle in data['candles']]
+    return data['candles'].close.tolist()
 
-# Polygon API call to get option chain data
-def tos_get_option_chain(ticker_symbol: str, contractType='ALL', rangeType='OTM', apiKey=None):
-    client = get_polygon_client(apiKey)
+# Convert Polygon option snapshots into the TOS option chain structure (call/put ExpDateMaps keyed by "date:days" and strike)
+def build_option_chain(snapshots, underlying_price) -> dict:
     options = []
-    print(f"Fetching options chain for {ticker_symbol}")
-    
-    params = {}
-    if contractType != 'ALL':
-        params["contract_type"] = contractType.lower()
-    
-    for opt in client.list_snapshot_options_chain(ticker_symbol, params=params):
+    for opt in snapshots:
         delta = opt.greeks.delta if opt.greeks and opt.greeks.delta is not None else 'NaN'
+        greeks = {greek: getattr(opt.greeks, greek, None) if opt.greeks else None for greek in ('gamma', 'theta', 'vega')}
         options.append({
             "putCall": opt.details.contract_type.upper(),
             "strikePrice": opt.details.strike_price,
@@ -105,14 +144,13 @@ def tos_get_option_chain(ticker_symbol: str, contractType='ALL', rangeType='OTM'
             "openInterest": opt.open_interest,
             "volume": opt.day.volume,
             "delta": delta,
+            "gamma": greeks['gamma'],
+            "theta": greeks['theta'],
+            "vega": greeks['vega'],
+            "impliedVolatility": opt.implied_volatility,
             "multiplier": 100
         })
-    print(f"Fetched {len(options)} options for {ticker_symbol}")
-    
-    trade = client.get_last_trade(ticker_symbol)
-    underlying_price = trade.price if trade else 0
-    print(f"Underlying price for {ticker_symbol}: {underlying_price}")
-    
+
     call_exp_date_map = {}
     put_exp_date_map = {}
     for opt in options:
@@ -122,14 +160,36 @@ def tos_get_option_chain(ticker_symbol: str, contractType='ALL', rangeType='OTM'
             call_exp_date_map.setdefault(exp_date, {})[strike_key] = [opt]
         else:
             put_exp_date_map.setdefault(exp_date, {})[strike_key] = [opt]
-    
+
     return {
         "underlyingPrice": underlying_price,
         "callExpDateMap": call_exp_date_map,
         "putExpDateMap": put_exp_date_map
     }
 
+# Polygon API call to get option chain data
+@shared_cached('option_chain', OPTION_CHAIN_TTL)
+@instrument('provider', rows=lambda data: sum(len(strikes) for exp_map in ('callExpDateMap', 'putExpDateMap') for strikes in data[exp_map].values()))
+def tos_get_option_chain(ticker_symbol: str, contractType='ALL', rangeType='OTM', apiKey=None):
+    client = get_polygon_client(apiKey)
+    print(f"Fetching options chain for {ticker_symbol}")
+    
+    params = {}
+    if contractType != 'ALL':
+        params["contract_type"] = contractType.lower()
+    
+    snapshots = list(client.list_snapshot_options_chain(ticker_symbol, params=params))
+    print(f"Fetched {len(snapshots)} options for {ticker_symbol}")
+    
+    trade = client.get_last_trade(ticker_symbol)
+    underlying_price = trade.price if trade else 0
+    print(f"Underlying price for {ticker_symbol}: {underlying_price}")
+    
+    return build_option_chain(snapshots, underlying_price)
+
 # Polygon API call to get fundamental data (limited compared to TOS)
+@shared_cached('fundamental', REFERENCE_TTL)
+@instrument('provider')
 def tos_get_fundamental_data(ticker_symbol: str, apiKey=None, search='fundamental', raw=False):
     client = get_polygon_client(apiKey)
     details = client.get_ticker_details(ticker_symbol)
@@ -1,13 +1,24 @@
+from datetime import datetime
+
+import pandas as pd
+
+from lib.candles import Candles
+from lib.metrics import add_rows
+from lib.option_chain import flatten_option_chain, score_option_chain
+from lib.shared_cache import get_or_compute
+from lib.stats import FORECAST_ESTIMATORS, INTRADAY_ESTIMATORS, forecast_volatility, get_hist_volatility, get_realized_volatility, vol_forecast
+from lib.tos_api_calls import OPTION_CHAIN_TTL, tos_get_intraday_hist
+
 def extract_price_field(hist_price, field='close'):
     """
     Extract a list of specified field values from historical price data.
     
     Args:
-        hist_price (dict): Historical price data with a 'candles' key.
+        hist_price (dict): Historical price data with a 'candles' key (Candles or a list of candle dicts).
         field (str): Field to extract (e.g., 'close', 'open', 'high', 'low', 'volume'). Defaults to 'close'.
     
     Returns:
-        list: List of values for the specified field.
+        np.ndarray | list: Zero-copy view of the field for Candles, otherwise a list of values.
     
     Raises:
         KeyError: If 'candles' or the specified field is missing.
@@ -15,6 +26,9 @@ def extract_price_field(hist_price, field='close'):
     if not isinstance(hist_price, dict) or 'candles' not in hist_price:
         raise KeyError("Input must be a dictionary with a 'candles' key")
     
+    if isinstance(hist_price['candles'], Candles):
+        return hist_price['candles'][field]
+
     output_ls = []
     for candle in hist_price['candles']:
         if field not in candle:
@@ -25,3 +39,39 @@ def extract_price_field(hist_price, field='close'):
 
 # Alias for backward compatibility
 create_pricelist = extract_price_field
+
+def estimate_volatility(ticker, price_df, volatility_period, vol_est_type, apiKey=None):
+    """The volatility a Submit scores with: (est_vol, vol_forecast), vol_forecast being None except for forecast estimators.
+
+    Minute-bar estimators read the last volatility_period sessions of intraday bars; forecast estimators return the
+    forecast over volatility_period days and the fitted term structure (lib.stats.vol_forecast).
+    """
+    forecast = None
+    if vol_est_type in INTRADAY_ESTIMATORS:
+        # Minute-bar estimators react to the last few sessions instead of lagging a daily window
+        intraday = tos_get_intraday_hist(ticker, volatility_period, apiKey=apiKey)['candles']
+        add_rows(len(intraday))
+        vol_series = get_realized_volatility(intraday, vol_est_type, window=volatility_period).dropna()
+    elif vol_est_type in FORECAST_ESTIMATORS:
+        # A forecast term structure: scoring and the cone read the volatility at each expiry's horizon, and est_vol
+        # is the forecast over the volatility period (warm-started from this ticker's last fit)
+        forecast = vol_forecast(price_df, vol_est_type, key=ticker)
+        vol_series = pd.Series([forecast_volatility(forecast, volatility_period)])
+    else:
+        vol_series = get_hist_volatility(price_df, volatility_period, estimator=vol_est_type)
+    return (vol_series.iloc[-1] if not vol_series.empty else 0), forecast
+
+def scored_option_chain(option_chain, ticker, stock_price, hist_volatility, expday_range, confidence_lvl, vol_forecast=None):
+    """score_option_chain rows and the flattened chain, shared through the shared cache for the chain's lifetime.
+
+    Every worker (and the dashboard and the JSON API alike) scoring the same chain with the same inputs shares one
+    computation.
+    """
+    current_date = datetime.now()
+
+    def compute_frames():
+        insert = score_option_chain(option_chain, ticker, stock_price, hist_volatility, expday_range, confidence_lvl, current_date=current_date, vol_forecast=vol_forecast)
+        # Keep the full chain (all expiries) so downstream analytics don't have to refetch it
+        return insert, flatten_option_chain(option_chain)
+    frames_key = 'scored_chain' + repr((ticker, stock_price, hist_volatility, vol_forecast, expday_range, confidence_lvl))
+    return get_or_compute(frames_key, compute_frames, OPTION_CHAIN_TTL, name='scored_chain')
@@ -0,0 +1,196 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+# Defaults sized for a watchlist of chains every few minutes (a large chain is a few thousand rows)
+BATCH_ROWS = 5000
+FLUSH_INTERVAL = 2.0
+MAX_PENDING_ROWS = 250000
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+
+
+class WriteBehindQueue:
+    """Background write-behind queue that batches records and flushes them through bulk writers.
+
+    Producers (Dash callbacks) call submit(), which only appends to an in-memory queue and never touches the
+    database. A daemon thread flushes pending records once BATCH_ROWS rows are waiting or FLUSH_INTERVAL seconds
+    have passed, calling writers[kind](items) with every pending item of that kind. Failed flushes are retried with
+    exponential backoff and then dropped (and counted) so one bad batch can't wedge the queue.
+
+    Args:
+        writers (dict): Record kind -> callable taking a list of items and bulk-writing them.
+        batch_rows (int): Pending row count that triggers a flush before the interval elapses.
+        flush_interval (float): Maximum seconds a record waits before being flushed.
+        max_pending_rows (int): Memory budget. submit() refuses (or waits for) records that would exceed it.
+        max_retries (int): Attempts per batch before it is dropped.
+        retry_backoff (float): Initial retry delay in seconds, doubled after every failure.
+    """
+
+    def __init__(self, writers, batch_rows=BATCH_ROWS, flush_interval=FLUSH_INTERVAL, max_pending_rows=MAX_PENDING_ROWS, max_retries=MAX_RETRIES, retry_backoff=RETRY_BACKOFF):
+        self.writers = writers
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_pending_rows = max_pending_rows
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._closed = False
+        self._fork_lock = threading.Lock()
+        self._start()
+        atexit.register(self.close)
+
+    def _start(self):
+        self._pending = deque()
+        self._pending_rows = 0
+        self._in_flight = 0
+        self._flush_requested = False
+        self._cond = threading.Condition()
+        self._stats = {'submitted': 0, 'written': 0, 'rejected': 0, 'failed': 0, 'retries': 0}
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        # Set last: other threads only skip the lock in _check_fork once the new queue is complete
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # Created before a fork (e.g. gunicorn preload_app): the writer thread didn't survive, start a fresh queue.
+        # Threads of the child racing here must start exactly one
+        if self._pid != os.getpid():
+            with self._fork_lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+    def submit(self, kind, item, rows=1, timeout=0):
+        """Queue one record for writing. Returns False if it was rejected by backpressure.
+
+        Args:
+            kind (str): Record kind, must be a key of writers.
+            item: Record passed to the writer.
+            rows (int): Rows the record will produce, charged against the memory budget.
+            timeout (float): Seconds to wait for budget to free up. The default of 0 never blocks the caller.
+        """
+        if kind not in self.writers:
+            raise KeyError(f"No writer registered for '{kind}'")
+        self._check_fork()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending_rows + rows > self.max_pending_rows and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['rejected'] += 1
+                    return False
+                self._cond.wait(remaining)
+            if self._closed:
+                self._stats['rejected'] += 1
+                return False
+            self._pending.append((kind, item, rows))
+            self._pending_rows += rows
+            self._stats['submitted'] += 1
+            if self._pending_rows >= self.batch_rows:
+                self._cond.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Block until every record submitted so far has been written (or dropped). Returns True if drained."""
+        self._check_fork()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=30):
+        """Stop accepting records, flush what is pending and stop the background thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Counters and current queue depth, for monitoring."""
+        with self._cond:
+            return dict(self._stats, pending_records=len(self._pending), pending_rows=self._pending_rows)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not (self._closed or self._flush_requested) and self._pending_rows < self.batch_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = list(self._pending)
+                self._pending.clear()
+                self._pending_rows = 0
+                self._in_flight = len(batch)
+                self._flush_requested = False
+                closed = self._closed
+                # Budget is freed as soon as records leave the queue, so waiting producers can proceed
+                self._cond.notify_all()
+
+            if batch:
+                self._write(batch)
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+            if closed and not batch:
+                return
+
+    def _write(self, batch):
+        by_kind = {}
+        for kind, item, _ in batch:
+            by_kind.setdefault(kind, []).append(item)
+
+        for kind, items in by_kind.items():
+            delay = self.retry_backoff
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    self.writers[kind](items)
+                    with self._cond:
+                        self._stats['written'] += len(items)
+                    break
+                except Exception as error:
+                    if attempt == self.max_retries:
+                        print(f"Write-behind: dropping {len(items)} '{kind}' records after {attempt} attempts: {error}")
+                        with self._cond:
+                            self._stats['failed'] += len(items)
+                        break
+                    with self._cond:
+                        self._stats['retries'] += 1
+                    time.sleep(delay)
+                    delay *= 2
+
+
+def warehouse_queue(warehouse, **kwargs):
+    """Create a WriteBehindQueue flushing chain snapshots, candles and metrics into an OptionChainWarehouse.
+
+    Record kinds:
+        'chain': (ticker, option_chain, snapshot_time)
+        'candles': (ticker, timespan, candles)
+        'metrics': (ticker, metric, as_of, value)
+    """
+    writers = {
+        'chain': warehouse.ingest_many,
+        'candles': warehouse.ingest_candles,
+        'metrics': warehouse.ingest_metrics,
+    }
+    return WriteBehindQueue(writers, **kwargs)
+
+
+def queue_from_env():
+    """Build the dashboard's persistence queue from OPTIONS_WAREHOUSE_PATH, or return None when it is unset."""
+    path = os.environ.get('OPTIONS_WAREHOUSE_PATH')
+    if not path:
+        return None
+    from lib.chain_warehouse import OptionChainWarehouse
+    return warehouse_queue(OptionChainWarehouse(path=path))
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import lib/ and dashboard_app/ from the repository root, and never touch the shared cache file
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DASHBOARD_CACHE', '0')
@@ -0,0 +1,35 @@
+import json
+
+import flask
+import pytest
+
+from dashboard_app.api import register_api_routes
+
+
+@pytest.fixture
+def client():
+    server = flask.Flask(__name__)
+    register_api_routes(server, apiKey='test')
+    return server.test_client()
+
+
+# Scoring inputs are validated before any provider call, so a bad request never reaches Polygon
+@pytest.mark.parametrize('path', [
+    '/api/chain/SPY?estimator=foo',
+    '/api/cone/SPY?estimator=foo',
+    '/api/gbm/SPY?estimator=foo',
+    '/api/chain/SPY?expdays=0',
+    '/api/cone/SPY?expdays=100000',
+    '/api/chain/SPY?window=1',
+    '/api/vol/SPY?window=-5',
+    '/api/chain/SPY?confidence=1',
+    '/api/cone/SPY?confidence=0',
+    '/api/cone/SPY?confidence=nan',
+    '/api/chain/SPY?expdays=abc',
+    '/api/vol/SPY?estimators=foo',
+])
+def test_invalid_inputs_are_400(client, path):
+    response = client.get(path)
+    assert response.status_code == 400
+    assert response.mimetype == 'application/json'
+    assert 'error' in json.loads(response.data)
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from lib.backtest import warehouse_chain_history
+from lib.chain_warehouse import SNAPSHOT_COLUMNS, OptionChainWarehouse
+
+
+def _daily_candles(days):
+    # Polygon daily bars: stamped at midnight New York time of their session
+    stamps = pd.DatetimeIndex(days).tz_localize('America/New_York').as_unit('ms').asi8
+    close = 100.0 + np.arange(len(days))
+    return pd.DataFrame({'datetime': stamps, 'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1e6})
+
+
+def test_stored_contract_settles_at_its_expiry_close(tmp_path):
+    sessions = pd.bdate_range('2024-01-02', '2024-03-29')
+    price_df = _daily_candles(sessions)
+    warehouse = OptionChainWarehouse(path=str(tmp_path / 'warehouse.db'))
+    chain_df = pd.DataFrame({column: [np.nan] for column in SNAPSHOT_COLUMNS.values()})
+    chain_df = chain_df.assign(expDate='2024-03-15', strikePrice=150.0, putCall='PUT', bid=1.25, delta=-0.2)
+    snapshot_time = int(pd.Timestamp('2024-03-04 10:30', tz='America/New_York').timestamp() * 1000)
+    warehouse.ingest('TEST', chain_df, snapshot_time=snapshot_time)
+
+    history = warehouse_chain_history(warehouse, 'TEST', price_df, window=5)
+    assert len(history) == 1
+    row = history.iloc[0]
+    # Friday 2024-03-15's candle, not the Thursday before it
+    assert row['settle_price'] == price_df['close'].iloc[sessions.get_loc('2024-03-15')]
+    assert row['stock_price'] == price_df['close'].iloc[sessions.get_loc('2024-03-04')]
+    assert row['exp_days'] == 10
+
+
+def test_contract_expiring_on_the_last_candle_is_settled(tmp_path):
+    sessions = pd.bdate_range('2024-01-02', '2024-03-15')
+    warehouse = OptionChainWarehouse(path=str(tmp_path / 'warehouse.db'))
+    chain_df = pd.DataFrame({column: [np.nan] for column in SNAPSHOT_COLUMNS.values()})
+    chain_df = chain_df.assign(expDate='2024-03-15', strikePrice=150.0, putCall='CALL', bid=1.0, delta=0.2)
+    warehouse.ingest('TEST', chain_df, snapshot_time=int(pd.Timestamp('2024-03-04 10:30', tz='America/New_York').timestamp() * 1000))
+    assert len(warehouse_chain_history(warehouse, 'TEST', _daily_candles(sessions), window=5)) == 1
@@ -0,0 +1,46 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.fixtures import synthetic_candles
+from lib.candles import Candles
+
+
+@pytest.fixture
+def candles():
+    return Candles.from_records(synthetic_candles(50))
+
+
+def test_records_round_trip(candles):
+    records = synthetic_candles(50)
+    assert candles.to_records() == [{**record, 'volume': float(record['volume'])} for record in records]
+    assert Candles.from_records(candles) is candles
+
+
+def test_bytes_and_store_round_trip(candles):
+    for loaded in (Candles.from_bytes(candles.to_bytes()), Candles.from_store(candles.to_store()), pickle.loads(pickle.dumps(candles))):
+        np.testing.assert_array_equal(loaded.datetime, candles.datetime)
+        np.testing.assert_array_equal(loaded.values, candles.values)
+    with pytest.raises(ValueError):
+        Candles.from_bytes(b'XXXX' + candles.to_bytes()[4:])
+
+
+def test_fields_and_frame_are_views(candles):
+    assert np.shares_memory(candles['close'], candles.values)
+    assert np.shares_memory(candles.close, candles.values)
+    frame = candles.to_frame()
+    assert list(frame.columns) == ['datetime', 'open', 'high', 'low', 'close', 'volume']
+    pd.testing.assert_frame_equal(Candles.from_frame(frame).to_frame(), frame)
+    with pytest.raises(KeyError):
+        candles['vwap']
+
+
+def test_slices(candles):
+    start, end = candles.datetime[10], candles.datetime[19]
+    window = candles.between(start, end)
+    assert len(window) == 10 and window.datetime[0] == start and window.datetime[-1] == end
+    assert len(candles.between(pd.Timestamp(start, unit='ms'))) == 40
+    assert len(candles[:5]) == 5 and np.shares_memory(candles[:5].values, candles.values)
+    assert len(Candles.empty()) == 0
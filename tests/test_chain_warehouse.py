@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.chain_warehouse import SNAPSHOT_COLUMNS, OptionChainWarehouse
+
+HOUR = 3_600_000
+
+
+def _chain(strikes, bid):
+    chain_df = pd.DataFrame({column: [np.nan] * len(strikes) for column in SNAPSHOT_COLUMNS.values()})
+    return chain_df.assign(expDate='2024-03-15', strikePrice=[float(k) for k in strikes], putCall='CALL', bid=bid)
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    return OptionChainWarehouse(path=str(tmp_path / 'warehouse.db'))
+
+
+def test_query_as_of_returns_the_latest_row_per_contract(warehouse):
+    warehouse.ingest_many([
+        ('TEST', _chain([100, 105, 110], 1.0), 0),
+        ('TEST', _chain([100, 105], 2.0), 2 * HOUR),
+        ('TEST', _chain([100], 3.0), 4 * HOUR),
+        ('OTHER', _chain([100], 9.0), 3 * HOUR),
+    ])
+    chain = warehouse.query_as_of('TEST', 3 * HOUR)
+    assert chain['strike_price'].tolist() == [100.0, 105.0, 110.0]
+    assert chain['bid'].tolist() == [2.0, 2.0, 1.0]
+    assert chain['snapshot_time'].dtype == np.int64
+    assert warehouse.query_as_of('TEST', -1).empty
+
+
+def test_query_as_of_only_searches_the_lookback(warehouse):
+    warehouse.ingest_many([('TEST', _chain([100, 105], 1.0), 0), ('TEST', _chain([100], 2.0), 48 * HOUR)])
+    assert warehouse.query_as_of('TEST', 50 * HOUR)['strike_price'].tolist() == [100.0]
+    assert warehouse.query_as_of('TEST', 50 * HOUR, lookback=None)['strike_price'].tolist() == [100.0, 105.0]
+    assert warehouse.query_as_of('TEST', 50 * HOUR, lookback=48 * HOUR)['bid'].tolist() == [2.0, 1.0]
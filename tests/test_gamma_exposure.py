@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.gamma_exposure import _zero_crossing, gamma_exposure
+
+
+def _chain(rows):
+    return pd.DataFrame(rows, columns=['putCall', 'strikePrice', 'openInterest', 'impliedVolatility', 'expDays'])
+
+
+def _naive_gex(chain_df, price):
+    # Dealers long calls, short puts: sign * OI * 100 * gamma * S**2 / 100, gamma from the Black-Scholes formula (r = 0)
+    total = 0.0
+    for row in chain_df.itertuples():
+        years = row.expDays / 365
+        sigma_t = row.impliedVolatility * math.sqrt(years)
+        d1 = (math.log(price / row.strikePrice) + row.impliedVolatility ** 2 / 2 * years) / sigma_t
+        gamma = math.exp(-d1 ** 2 / 2) / math.sqrt(2 * math.pi) / (price * sigma_t)
+        total += (1 if row.putCall == 'CALL' else -1) * row.openInterest * 100 * gamma * price ** 2 / 100
+    return total
+
+
+def test_gamma_flip_between_put_and_call_walls():
+    # Heavy puts below spot and calls above: negative gamma on the downside, positive on the upside
+    chain = _chain([('PUT', 90.0, 5000, 0.3, 30), ('CALL', 110.0, 5000, 0.3, 30),
+                    ('CALL', 100.0, 200, 0.25, 30), ('PUT', 95.0, 0, 0.3, 30)])
+    result = gamma_exposure(chain, 100.0)
+    expected = [_naive_gex(chain, price) for price in result['prices']]
+    np.testing.assert_allclose(result['gex'], expected, rtol=1e-9, atol=1e-6)
+    assert result['gex'][0] < 0 < result['gex'][-1]
+    flip = result['zero_gamma']
+    i = np.searchsorted(result['prices'], flip)
+    assert result['gex'][i - 1] < 0 < result['gex'][i]
+    # The interpolated flip is a root of the exposure profile, up to the grid's linear interpolation error
+    assert abs(_naive_gex(chain, flip)) < 1e-3 * np.abs(result['gex']).max()
+    assert result['gex_at_spot'] == pytest.approx(_naive_gex(chain, 100.0))
+    assert result['call_gex'].sum() + result['put_gex'].sum() == pytest.approx(result['gex_at_spot'])
+    np.testing.assert_allclose(gamma_exposure(chain, 100.0, chunk_cells=64)['gex'], result['gex'])
+
+
+def test_one_sided_chain_has_no_flip():
+    chain = _chain([('CALL', 100.0, 1000, 0.2, 14), ('CALL', 105.0, 500, 0.2, 14)])
+    assert math.isnan(gamma_exposure(chain, 100.0)['zero_gamma'])
+
+
+def test_zero_crossing_picks_flip_nearest_spot():
+    prices, gex = np.array([1.0, 2.0, 3.0, 4.0, 5.0]), np.array([-2.0, -1.0, 1.0, 2.0, -2.0])
+    assert _zero_crossing(prices, gex, 2.0) == pytest.approx(2.5)
+    assert _zero_crossing(prices, gex, 5.0) == pytest.approx(4.5)
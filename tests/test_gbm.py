@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from lib.gbm import heston_paths, merton_paths
+
+S, T, R, Q, SIGMA = 100.0, 1.0, 0.03, 0.01, 0.2
+
+
+def test_merton_terminal_moments():
+    jump_intensity, jump_mean, jump_std = 2.0, -0.05, 0.1
+    params = dict(jump_intensity=jump_intensity, jump_mean=jump_mean, jump_std=jump_std, seed=7)
+    terminal = merton_paths(S, T, R, Q, SIGMA, 1, 400_000, terminal=True, **params)
+    paths = merton_paths(S, T, R, Q, SIGMA, 50, 100_000, **params)
+    compensator = jump_intensity * (np.exp(jump_mean + jump_std ** 2 / 2) - 1)
+    log_mean = (R - Q - SIGMA ** 2 / 2 - compensator + jump_intensity * jump_mean) * T
+    log_var = (SIGMA ** 2 + jump_intensity * (jump_mean ** 2 + jump_std ** 2)) * T
+    for final, n in ((terminal, 400_000), (paths[-1], 100_000)):
+        # The compensated drift keeps the expected growth at r - q, as for GBM
+        assert final.mean() == pytest.approx(S * np.exp((R - Q) * T), abs=4 * final.std() / np.sqrt(n))
+        log_return = np.log(final / S)
+        assert log_return.mean() == pytest.approx(log_mean, abs=4 * np.sqrt(log_var / n))
+        assert log_return.var() == pytest.approx(log_var, rel=0.02)
+
+
+def test_heston_terminal_mean():
+    kappa, theta, v0 = 3.0, 0.09, SIGMA ** 2
+    final = heston_paths(S, T, R, Q, SIGMA, 100, 200_000, kappa=kappa, theta=theta, seed=11, terminal=True)
+    assert final.mean() == pytest.approx(S * np.exp((R - Q) * T), abs=4 * final.std() / np.sqrt(len(final)))
+    # E[log S_T] = (r - q) T - 1/2 * integral of E[v_t], with E[v_t] reverting from v0 to theta at rate kappa
+    integrated_variance = theta * T + (v0 - theta) * (1 - np.exp(-kappa * T)) / kappa
+    assert np.log(final / S).mean() == pytest.approx((R - Q) * T - integrated_variance / 2, abs=0.005)
+
+
+def test_heston_full_truncation_keeps_variance_usable():
+    # A vol of vol far beyond the Feller bound drives the variance state negative on many steps; full truncation
+    # floors it in the drift and diffusion, so no path turns NaN and the price process stays a martingale
+    paths = heston_paths(S, T, R, Q, SIGMA, 250, 50_000, kappa=1.0, vol_of_vol=1.5, rho=-0.9, seed=3)
+    assert np.isfinite(paths).all() and (paths > 0).all()
+    assert paths[-1].mean() == pytest.approx(S * np.exp((R - Q) * T), abs=4 * paths[-1].std() / np.sqrt(50_000))
+    terminal = heston_paths(S, T, R, Q, SIGMA, 250, 50_000, kappa=1.0, vol_of_vol=1.5, rho=-0.9, seed=3, terminal=True)
+    np.testing.assert_allclose(terminal, paths[-1])
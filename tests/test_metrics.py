@@ -0,0 +1,54 @@
+import multiprocessing
+import os
+
+import pytest
+
+from lib.metrics import counter, gauge, histogram, publish_metrics, render_prometheus
+
+
+def _samples(text, prefix):
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(prefix)}
+
+
+def test_counter_is_exported_with_total_suffix(monkeypatch):
+    monkeypatch.delenv('DASHBOARD_METRICS_DIR', raising=False)
+    requests = counter('test_single_requests', 'Test requests')
+    requests.inc(result='hit')
+    requests.inc(2, result='hit')
+    text = render_prometheus()
+    assert '# TYPE test_single_requests_total counter' in text
+    assert _samples(text, 'test_single_requests_total') == {'test_single_requests_total{result="hit"}': 3}
+    with pytest.raises(ValueError):
+        requests.inc(-1)
+
+
+def _worker(directory):
+    counter('test_mp_requests', 'Test requests').inc(5, result='hit')
+    histogram('test_mp_seconds', 'Test durations', buckets=(1.0, float('inf'))).observe(0.5, name='a')
+    gauge('test_mp_depth', 'Test depth').set(7)
+    publish_metrics(directory)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_workers_are_aggregated(tmp_path, monkeypatch):
+    monkeypatch.setenv('DASHBOARD_METRICS_DIR', str(tmp_path))
+    requests = counter('test_mp_requests', 'Test requests')
+    seconds = histogram('test_mp_seconds', 'Test durations', buckets=(1.0, float('inf')))
+    depth = gauge('test_mp_depth', 'Test depth')
+    # Counted before the fork: the child starts from zero rather than counting this again
+    requests.inc(result='hit')
+    # An exited worker: its counts stay in the totals, its gauges are dropped
+    process = multiprocessing.get_context('fork').Process(target=_worker, args=(str(tmp_path),))
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+
+    requests.inc(result='hit')
+    seconds.observe(2.0, name='a')
+    depth.set(3)
+    text = render_prometheus()
+    assert _samples(text, 'test_mp_requests_total') == {'test_mp_requests_total{result="hit"}': 7}
+    assert _samples(text, 'test_mp_seconds') == {
+        'test_mp_seconds_bucket{name="a",le="1.0"}': 1, 'test_mp_seconds_bucket{name="a",le="+Inf"}': 2,
+        'test_mp_seconds_sum{name="a"}': 2.5, 'test_mp_seconds_count{name="a"}': 2}
+    assert _samples(text, 'test_mp_depth') == {f'test_mp_depth{{pid="{os.getpid()}"}}': 3}
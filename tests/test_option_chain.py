@@ -0,0 +1,101 @@
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.fixtures import fixture_snapshots
+from lib.option_chain import (CONTRACT_KEY, _bracket_interp, diff_option_chain, flatten_option_chain, oi_profile, oi_summary, score_option_chain,
+                              select_contracts)
+from lib.tos_api_calls import build_option_chain
+
+
+@pytest.fixture(scope='module')
+def chain_df():
+    return flatten_option_chain(build_option_chain(fixture_snapshots(), 190.0))
+
+
+def test_oi_profile_matches_naive_payout_loop(chain_df):
+    profile = oi_profile(chain_df)
+    for exp_days, expiry in profile.groupby('exp_days'):
+        leg = chain_df.loc[chain_df['expDays'] == exp_days]
+        calls, puts = leg.loc[leg['putCall'] == 'CALL'], leg.loc[leg['putCall'] == 'PUT']
+        # Holder payout at every settlement strike, one strike at a time
+        naive = [100 * (np.sum(calls['openInterest'] * np.maximum(strike - calls['strikePrice'], 0))
+                        + np.sum(puts['openInterest'] * np.maximum(puts['strikePrice'] - strike, 0)))
+                 for strike in expiry['strike']]
+        np.testing.assert_allclose(expiry['pain'], naive, rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(expiry['cum_call_oi'].iloc[-1], calls['openInterest'].sum())
+        np.testing.assert_allclose(expiry['cum_put_oi'].iloc[-1], puts['openInterest'].sum())
+
+
+def test_oi_summary_picks_extremes(chain_df):
+    profile = oi_profile(chain_df)
+    summary = oi_summary(profile).set_index('exp_days')
+    for exp_days, expiry in profile.groupby('exp_days'):
+        row = summary.loc[exp_days]
+        assert row['max_pain'] == expiry['strike'].iloc[expiry['pain'].argmin()]
+        assert row['call_wall'] == expiry['strike'].iloc[expiry['call_oi'].argmax()]
+        assert row['put_wall'] == expiry['strike'].iloc[expiry['put_oi'].argmax()]
+
+
+def test_bracket_interp_matches_loop():
+    # Six expiries listing random (unique) subsets of the strikes, in shuffled order
+    rng = np.random.default_rng(1)
+    listed = [rng.choice(np.arange(50.0, 150.0, 2.5), rng.integers(1, 30), replace=False) for _ in range(6)]
+    exp_days = np.concatenate([np.full(len(k), day) for day, k in enumerate(listed)])
+    strikes = np.concatenate(listed)
+    shuffle = rng.permutation(len(strikes))
+    exp_days, strikes = exp_days[shuffle], strikes[shuffle]
+    bid = rng.uniform(0, 5, len(strikes))
+    ask = bid + rng.uniform(0, 1, len(strikes))
+    for target in (49.0, 60.0, 97.5, 101.3, 160.0):
+        expiries, price, askbid, spread = _bracket_interp(exp_days, strikes, bid, ask, target)
+        for i, day in enumerate(expiries):
+            leg = pd.DataFrame({'k': strikes, 'mid': (bid + ask) / 2}).loc[exp_days == day].sort_values('k')
+            below, above = leg.loc[leg['k'] <= target], leg.loc[leg['k'] >= target]
+            if below.empty or above.empty:
+                assert np.isnan(price[i])
+                continue
+            lo, hi = below.iloc[-1], above.iloc[0]
+            expected = lo['mid'] if hi['k'] == lo['k'] else lo['mid'] + (target - lo['k']) / (hi['k'] - lo['k']) * (hi['mid'] - lo['mid'])
+            assert price[i] == pytest.approx(expected)
+
+
+def test_diff_option_chain():
+    previous = pd.DataFrame({'putCall': ['CALL', 'CALL', 'PUT'], 'expDate': ['2025-01-17'] * 3, 'strikePrice': [100.0, 105.0, 100.0],
+                             **{column: [1.0, 2.0, np.nan] for column in ['expDays', 'bid', 'ask', 'lastPrice', 'openInterest', 'volume', 'delta',
+                                                                           'gamma', 'theta', 'vega', 'impliedVolatility']}})
+    current = previous.iloc[[2, 1, 0]].reset_index(drop=True)
+    current.loc[1, 'bid'] = 2.5
+    current = pd.concat([current, previous.iloc[[0]].assign(strikePrice=110.0)], ignore_index=True)
+    position, changed = diff_option_chain(previous, current)
+    assert position.tolist() == [2, 1, 0, -1]
+    # NaN matches NaN; the moved bid and the new contract are changes
+    assert changed.tolist() == [False, True, False, True]
+    position, changed = diff_option_chain(pd.concat([previous, previous.iloc[[0]]]), current)
+    assert (position == -1).all() and changed.all()
+
+
+def test_partial_rescore_matches_full_rescore():
+    # The auto-refresh path: rescoring only the changed contracts gives the rows a full rescore would
+    snapshots = fixture_snapshots()
+    previous_df = flatten_option_chain(build_option_chain(snapshots, 190.0))
+    for snapshot in snapshots[::50]:
+        snapshot.last_quote = SimpleNamespace(bid=(snapshot.last_quote.bid or 0) + 0.05, ask=snapshot.last_quote.ask)
+    option_chain = build_option_chain(snapshots, 190.0)
+    chain_df = flatten_option_chain(option_chain)
+    _, changed = diff_option_chain(previous_df, chain_df)
+    assert 0 < changed.sum() < len(chain_df)
+
+    now = datetime.datetime.now()
+    columns = ['ticker', 'exp_date', 'option_type', 'strike_price', 'exp_days', 'delta', 'prob_val', 'open_interest', 'total_volume', 'premium',
+               'option_leverage', 'bid_size', 'ask_size', 'roi_val', 'lower_bound', 'upper_bound']
+    full = pd.DataFrame(score_option_chain(option_chain, 'FIXT', 190.0, 0.3, 10_000, 0.7, current_date=now), columns=columns)
+    contracts = list(chain_df.loc[changed, CONTRACT_KEY].itertuples(index=False, name=None))
+    partial = pd.DataFrame(score_option_chain(select_contracts(option_chain, contracts), 'FIXT', 190.0, 0.3, 10_000, 0.7, current_date=now), columns=columns)
+    assert len(partial) == len(contracts)
+    key = ['option_type', 'exp_date', 'strike_price']
+    expected = full.merge(partial[key], on=key).sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(partial.sort_values(key, ignore_index=True), expected)
@@ -0,0 +1,47 @@
+import threading
+
+from lib.prefetch import Prefetcher
+
+
+def _blocked(prefetcher):
+    # Occupy the only pool thread, so the prefetches submitted next stay queued until release is set
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+    prefetcher.prefetch(('blocker', None), 'block', {'block': block})
+    assert started.wait(5)
+    return release
+
+
+def test_new_ticker_cancels_only_the_sessions_own_prefetches():
+    prefetcher = Prefetcher(max_workers=1)
+    release = _blocked(prefetcher)
+    prefetcher.prefetch(('price_tabs', 'a'), 'AAPL', {('AAPL', 'tab'): lambda: 'aapl'})
+    prefetcher.prefetch(('price_tabs', 'b'), 'MSFT', {('MSFT', 'tab'): lambda: 'msft'})
+    # Session a moves on to another ticker: its queued AAPL fetch goes, session b's MSFT fetch stays
+    prefetcher.prefetch(('price_tabs', 'a'), 'TSLA', {('TSLA', 'tab'): lambda: 'tsla'})
+    assert ('AAPL', 'tab') not in prefetcher._entries
+    assert not prefetcher._entries[('MSFT', 'tab')][1].cancelled()
+    release.set()
+    assert prefetcher._entries[('MSFT', 'tab')][1].result(5) == 'msft'
+
+
+def test_fetch_wanted_by_another_session_is_kept():
+    prefetcher = Prefetcher(max_workers=1)
+    release = _blocked(prefetcher)
+    prefetcher.prefetch(('price_tabs', 'a'), 'AAPL', {('AAPL', 'tab'): lambda: 'aapl'})
+    prefetcher.prefetch(('price_tabs', 'b'), 'AAPL', {('AAPL', 'tab'): lambda: 'aapl'})
+    prefetcher.prefetch(('price_tabs', 'a'), 'MSFT', {('MSFT', 'tab'): lambda: 'msft'})
+    assert not prefetcher._entries[('AAPL', 'tab')][1].cancelled()
+    release.set()
+    assert prefetcher._entries[('AAPL', 'tab')][1].result(5) == 'aapl'
+
+
+def test_expired_sessions_are_forgotten():
+    prefetcher = Prefetcher(ttl=0)
+    prefetcher.prefetch(('price_tabs', 'a'), 'AAPL', {('AAPL', 'tab'): lambda: 'aapl'})
+    prefetcher.prefetch(('price_tabs', 'b'), 'MSFT', {('MSFT', 'tab'): lambda: 'msft'})
+    assert set(prefetcher._scopes) == {('price_tabs', 'b')}
@@ -0,0 +1,142 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+import lib.scheduler as scheduler
+from lib.scheduler import BACKGROUND, INTERACTIVE, RequestScheduler, SharedTokenBucket, TokenBucket, provider_priority
+from lib.shared_cache import SharedCache
+
+
+class Response:
+    def __init__(self, status=200, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+
+class GateBucket:
+    # Hands out exactly the tokens the test releases
+    rate = 1.0
+
+    def __init__(self):
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            if self.tokens:
+                self.tokens -= 1
+                return 0.0
+            return 0.005
+
+    def pause(self, seconds):
+        pass
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_interactive_requests_go_first():
+    bucket = GateBucket()
+    sched = RequestScheduler(bucket)
+    sent = []
+
+    def send(method, url, **kwargs):
+        sent.append(url)
+        return Response()
+
+    def request(url, priority):
+        with provider_priority(priority):
+            sched.request(send, 'GET', url)
+    threads = []
+    for i, (name, priority) in enumerate([('bg0', BACKGROUND), ('bg1', BACKGROUND), ('bg2', BACKGROUND), ('ui0', INTERACTIVE), ('ui1', INTERACTIVE)]):
+        threads.append(threading.Thread(target=request, args=(name, priority)))
+        threads[-1].start()
+        _wait_for(lambda: sum(sched.queue_depth().values()) == i + 1)
+    assert sched.queue_depth() == {'interactive': 2, 'prefetch': 0, 'background': 3}
+    bucket.tokens = 5
+    for thread in threads:
+        thread.join()
+    assert sent == ['ui0', 'ui1', 'bg0', 'bg1', 'bg2']
+
+
+def test_identical_gets_are_coalesced():
+    sched = RequestScheduler(TokenBucket(0, 1))
+    sent = []
+
+    def send(method, url, **kwargs):
+        sent.append(url)
+        time.sleep(0.1)
+        return Response()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sched.request(send, 'GET', '/v2/x', fields={'a': 1}, headers={'Authorization': 'k'})))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sent) == 1
+    assert len(results) == 10 and len({id(result) for result in results}) == 1
+    # Another API key is another request
+    sched.request(send, 'GET', '/v2/x', fields={'a': 1}, headers={'Authorization': 'other'})
+    assert len(sent) == 2
+
+
+def test_429_pauses_and_503_backs_off(monkeypatch):
+    monkeypatch.setattr(scheduler, 'BACKOFF', 0.1)
+    responses = [Response(429, {'Retry-After': '0.5'}), Response(503), Response(200)]
+    stamps = []
+
+    def send(method, url, **kwargs):
+        assert kwargs['retries'] is False
+        stamps.append(time.monotonic())
+        return responses.pop(0)
+    bucket = TokenBucket(0, 1)
+    start = time.monotonic()
+    assert RequestScheduler(bucket).request(send, 'GET', '/v2/x').status == 200
+    # Retry-After holds the whole bucket; the 503 backs off BACKOFF * 2 ** attempt
+    assert stamps[1] - start >= 0.5
+    assert stamps[2] - stamps[1] >= 0.2
+    assert stamps[2] - start < 2
+
+
+def test_unlimited_bucket_only_honours_pauses(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.db'))
+    assert cache.take_token('p', 0, 1) == 0.0
+    # No bucket row is written per request when the rate is unlimited
+    assert cache._connection().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0] == 0
+    cache.pause_bucket('p', 1.0)
+    assert 0.5 < cache.take_token('p', 0, 1) <= 1.0
+    bucket = TokenBucket(0, 1)
+    assert [bucket.take() for _ in range(100)] == [0.0] * 100
+    bucket.pause(1.0)
+    assert bucket.take() > 0.5
+
+
+def _worker(path, stamps):
+    sched = RequestScheduler(SharedTokenBucket(SharedCache(path), 'polygon', 20.0, 1))
+    for i in range(5):
+        sched.request(lambda method, url, **kwargs: stamps.append(time.time()) or Response(), 'GET', f'/{i}')
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_shared_bucket_spans_processes(tmp_path):
+    # Two workers of 5 requests at 20/s, burst 1: the 10 requests are spaced ~50 ms apart overall
+    path = str(tmp_path / 'cache.db')
+    SharedCache(path)
+    context = multiprocessing.get_context('fork')
+    with context.Manager() as manager:
+        stamps = manager.list()
+        processes = [context.Process(target=_worker, args=(path, stamps)) for _ in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+        stamps = sorted(stamps)
+    assert len(stamps) == 10
+    assert stamps[-1] - stamps[0] >= 9 / 20 * 0.9
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from lib.shared_cache import SharedCache
+
+
+def test_concurrent_callers_compute_once(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    # Two caches on one file stand in for two worker processes; their threads meet on the lease, not a local lock
+    caches = [SharedCache(path), SharedCache(path)]
+    calls = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'price': 101.5}
+
+    def ask(cache):
+        barrier.wait()
+        results.append(cache.get_or_compute('chain:AAPL', compute, ttl=60))
+    threads = [threading.Thread(target=ask, args=(caches[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{'price': 101.5}] * 8
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    # A worker that died mid-refill: its lease is never released, only expires
+    dead = SharedCache(path, lease_timeout=0.2)
+    assert dead._acquire_lease('chain:AAPL', 'dead-worker')
+    cache = SharedCache(path)
+    assert not cache._acquire_lease('chain:AAPL', 'other-worker')
+    start = time.monotonic()
+    assert cache.get_or_compute('chain:AAPL', lambda: 'fresh', ttl=60) == 'fresh'
+    assert time.monotonic() - start < 5
+    assert cache.get('chain:AAPL') == 'fresh'
+
+
+def test_rejected_results_are_not_stored(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.db'))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return []
+    assert cache.get_or_compute('chain:AAPL', compute, ttl=60, cacheable=bool) == []
+    assert cache.get('chain:AAPL', 'missing') == 'missing'
+    assert cache.get_or_compute('chain:AAPL', compute, ttl=60, cacheable=bool) == []
+    assert len(calls) == 2
+
+
+def test_key_locks_are_dropped_after_use(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.db'))
+    for i in range(50):
+        cache.get_or_compute(f'chain:{i}', lambda: i, ttl=60)
+    with cache._key_lock('chain:AAPL'):
+        assert list(cache._key_locks) == ['chain:AAPL']
+    assert not cache._key_locks
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+from mysql.connector.errors import PoolError
+
+import lib.sql_connection as sql_connection
+
+
+class FakePool:
+    # Hands out up to pool_size connections, raising PoolError like MySQLConnectionPool when they're all borrowed
+    def __init__(self, pool_size=None, **kwargs):
+        self.pool_size = pool_size
+        self.free = pool_size
+        self.lock = threading.Lock()
+
+    def get_connection(self):
+        with self.lock:
+            if not self.free:
+                raise PoolError("Failed getting connection; pool exhausted")
+            self.free -= 1
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def ping(self, **kwargs):
+        pass
+
+    def close(self):
+        with self.pool.lock:
+            self.pool.free += 1
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    monkeypatch.setattr(sql_connection.pooling, 'MySQLConnectionPool', FakePool)
+    monkeypatch.setattr(sql_connection, '_POOLS', {})
+    return sql_connection._POOLS
+
+
+def test_pool_size_is_fixed_at_creation(pools):
+    pool = sql_connection.get_connection_pool('user', 'pw', 'db')
+    assert pool.pool_size == sql_connection.POOL_SIZE
+    assert sql_connection.get_connection_pool('user', 'pw', 'db') is pool
+    assert sql_connection.get_connection_pool('user', 'pw', 'db', pool_size=sql_connection.POOL_SIZE) is pool
+    with pytest.raises(ValueError):
+        sql_connection.get_connection_pool('user', 'pw', 'db', pool_size=20)
+
+
+def test_exhausted_pool_waits_for_a_connection(pools):
+    with sql_connection.pooled_connection('user', 'pw', 'db', pool_size=1):
+        released = []
+
+        def borrow():
+            with sql_connection.pooled_connection('user', 'pw', 'db', timeout=5):
+                released.append(time.monotonic())
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        time.sleep(0.1)
+        assert not released
+        returned = time.monotonic()
+    thread.join(5)
+    assert released and released[0] >= returned
+
+
+def test_exhausted_pool_times_out(pools):
+    with sql_connection.pooled_connection('user', 'pw', 'db', pool_size=1):
+        start = time.monotonic()
+        with pytest.raises(PoolError):
+            with sql_connection.pooled_connection('user', 'pw', 'db', timeout=0.2):
+                pass
+        assert time.monotonic() - start >= 0.2
+
+
+class FakeCursor:
+    # Unbuffered MySQL cursor: typed description, rows served by fetchmany
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = rows
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+
+def test_chunk_dtypes_come_from_the_description():
+    import datetime
+    from mysql.connector import FieldType
+
+    description = [('id', FieldType.LONGLONG, None, None, None, None, False), ('oi', FieldType.LONGLONG, None, None, None, None, True),
+                   ('price', FieldType.NEWDECIMAL, None, None, None, None, True), ('name', FieldType.VAR_STRING, None, None, None, None, True),
+                   ('at', FieldType.DATETIME, None, None, None, None, True)]
+    from decimal import Decimal
+    rows = [(1, 10, Decimal('1.5'), 'a', datetime.datetime(2024, 1, 2)), (2, None, None, None, None), (3, 30, Decimal('2.25'), 'c', datetime.datetime(2024, 1, 3))]
+    chunks = list(sql_connection.iter_query_chunks(FakeCursor(description, rows), chunk_size=1, output='numpy'))
+    assert len(chunks) == 3
+    for chunk in chunks:
+        assert {name: array.dtype.str for name, array in chunk.items()} == {'id': '<i8', 'oi': '<f8', 'price': '<f8', 'name': '|O', 'at': '<M8[us]'}
+    assert chunks[1]['oi'][0] != chunks[1]['oi'][0] and chunks[1]['at'][0] != chunks[1]['at'][0]
+
+
+def test_sqlite_chunks_keep_the_first_chunks_dtypes():
+    import sqlite3
+
+    db_conn = sqlite3.connect(':memory:')
+    db_conn.execute("CREATE TABLE t (time BIGINT, oi BIGINT, bid DOUBLE, side TEXT)")
+    db_conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?)", [(1, 5, 1.0, 'CALL'), (2, 6, 2, 'PUT'), (3, None, None, None), (4, 7, 1.5, 'PUT')])
+    cursor = db_conn.execute("SELECT * FROM t ORDER BY time")
+    chunks = list(sql_connection.iter_query_chunks(cursor, chunk_size=2, dtypes={'time': 'int64'}))
+    assert chunks[0].dtypes.tolist() == chunks[1].dtypes.tolist()
+    assert chunks[0].dtypes.tolist()[:3] == ['int64', 'float64', 'float64']
+    assert chunks[1]['oi'].isna().tolist() == [True, False]
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.stats import (
+    INTRADAY_ESTIMATORS, black_scholes, ewma_variance, fit_garch, forecast_volatility, garch_variance,
+    get_realized_volatility, prob_above, prob_surface,
+)
+
+
+def _returns(n=2000, seed=0):
+    return np.random.default_rng(seed).normal(0, 0.01, n)
+
+
+def _simulate_garch(omega, alpha, beta, n, seed=0):
+    rng = np.random.default_rng(seed)
+    returns = np.empty(n)
+    variance = omega / (1 - alpha - beta)
+    for t in range(n):
+        returns[t] = rng.normal(0, np.sqrt(variance))
+        variance = omega + alpha * returns[t] ** 2 + beta * variance
+    return returns
+
+
+def test_ewma_variance_matches_loop():
+    returns, lam = _returns(), 0.94
+    expected = [returns.var()]
+    for r in returns:
+        expected.append(lam * expected[-1] + (1 - lam) * r ** 2)
+    np.testing.assert_allclose(ewma_variance(returns, lam), expected, rtol=1e-10)
+
+
+def test_garch_variance_matches_loop():
+    returns, omega, alpha, beta = _returns(), 2e-6, 0.08, 0.9
+    expected = [returns.var()]
+    for r in returns:
+        expected.append(omega + alpha * r ** 2 + beta * expected[-1])
+    np.testing.assert_allclose(garch_variance(returns, omega, alpha, beta), expected, rtol=1e-10)
+
+
+def test_fit_garch_recovers_parameters():
+    returns = _simulate_garch(2e-6, 0.1, 0.85, 5000)
+    fit = fit_garch(returns)
+    assert fit['converged']
+    assert fit['persistence'] == pytest.approx(0.95, abs=0.03)
+    assert fit['alpha'] == pytest.approx(0.1, abs=0.04)
+    assert fit['omega'] == pytest.approx(fit['long_run_variance'] * (1 - fit['persistence']))
+
+
+def test_fit_garch_warm_start_reuses_key():
+    returns = _simulate_garch(2e-6, 0.1, 0.85, 2000, seed=3)
+    cold = fit_garch(returns, key='TEST')
+    warm = fit_garch(returns, key='TEST')
+    assert warm['iterations'] <= cold['iterations']
+    assert warm['persistence'] == pytest.approx(cold['persistence'], abs=1e-3)
+
+
+def test_forecast_volatility_closed_form():
+    forecast = {'variance': 4e-4, 'long_run_variance': 1e-4, 'persistence': 0.9}
+    for h in (1, 5, 30):
+        steps = [forecast['long_run_variance'] + forecast['persistence'] ** (i - 1) * (forecast['variance'] - forecast['long_run_variance'])
+                 for i in range(1, h + 1)]
+        assert forecast_volatility(forecast, h) == pytest.approx(np.sqrt(np.mean(steps) * 252))
+    flat = {'variance': 4e-4, 'long_run_variance': 4e-4, 'persistence': 1.0}
+    np.testing.assert_allclose(forecast_volatility(flat, np.array([1, 10, 100])), np.sqrt(4e-4 * 252))
+
+
+def test_prob_surface_matches_pointwise_models():
+    stock_price, strikes, days = 100.0, np.linspace(70, 130, 25), np.array([5.0, 30.0, 90.0])
+    volatility = np.linspace(0.2, 0.4, 25)
+    surface = prob_surface(stock_price, strikes, days, volatility)
+    for i, j in [(0, 3), (1, 12), (1, 20), (2, 0), (2, 24)]:
+        strike, day, vol = strikes[j], days[i], volatility[j]
+        above = prob_above(stock_price, strike, day, vol)
+        assert surface['prob_itm'][i, j] == pytest.approx(above if strike >= stock_price else 1 - above, rel=1e-12)
+        # P(finish above K) is minus the slope of the Black-Scholes call price in the strike
+        h = 1e-4
+        prices, _ = black_scholes(stock_price, [strike - h, strike + h], day, vol, True)
+        assert above == pytest.approx(-(prices[1] - prices[0]) / (2 * h), abs=1e-6)
+        assert surface['prob_touch'][i, j] == pytest.approx(min(2 * surface['prob_itm'][i, j], 1.0))
+
+
+def test_prob_surface_is_monotonic_in_strike():
+    stock_price, strikes = 100.0, np.linspace(60, 140, 81)
+    surface = prob_surface(stock_price, strikes, np.array([7.0, 45.0, 180.0]), 0.3)
+    above = np.where(strikes >= stock_price, surface['prob_itm'], 1 - surface['prob_itm'])
+    # Non-strict: far from the money over a short expiry the probabilities saturate at 0 and 1
+    assert (np.diff(above, axis=1) <= 0).all()
+    assert (np.diff(above[:, 30:51], axis=1) < 0).all()
+    # Further OTM on either side is less likely to finish in the money
+    assert (np.diff(surface['prob_itm'][:, strikes >= stock_price], axis=1) <= 0).all()
+    assert (np.diff(surface['prob_itm'][:, strikes < stock_price], axis=1) >= 0).all()
+
+
+def _minute_sessions(dates, daily_vol, bars=390, seed=0):
+    # Regular-hours minute closes (9:30 ET = 14:30 UTC in winter) with i.i.d. returns of known variance per session,
+    # and a large overnight gap before every session that the estimators must leave out
+    rng = np.random.default_rng(seed)
+    frames, price = [], 100.0
+    for date in dates:
+        open_ms = int(pd.Timestamp(date + ' 14:30', tz='UTC').value // 1_000_000)
+        price *= 1.05
+        closes = price * np.exp(np.cumsum(rng.normal(0, daily_vol / np.sqrt(bars - 1), bars) * (np.arange(bars) > 0)))
+        price = closes[-1]
+        frames.append(pd.DataFrame({'datetime': open_ms + 60_000 * np.arange(bars), 'close': closes}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_realized_variance_matches_per_session_loop():
+    # Consecutive days, a weekend and a two-week halt between sessions
+    dates = ['2024-01-02', '2024-01-03', '2024-01-05', '2024-01-08', '2024-01-22', '2024-01-23']
+    bars = _minute_sessions(dates, 0.02)
+    expected = [np.sum(np.diff(np.log(session['close'])) ** 2) for _, session in bars.groupby(np.arange(len(bars)) // 390)]
+    result = get_realized_volatility(bars)
+    assert list(result.index.strftime('%Y-%m-%d')) == dates
+    np.testing.assert_allclose(result.to_numpy(), np.sqrt(np.array(expected) * 252), rtol=1e-10)
+    # Chunk boundaries falling mid-session, and an iterable of chunks, give the same sessions
+    for chunked in (get_realized_volatility(bars, chunk_bars=250),
+                    get_realized_volatility(bars[i:i + 1000] for i in range(0, len(bars), 1000))):
+        pd.testing.assert_series_equal(chunked, result)
+
+
+@pytest.mark.parametrize('estimator', INTRADAY_ESTIMATORS)
+def test_intraday_estimators_recover_known_variance(estimator):
+    dates = [str(day.date()) for day in pd.bdate_range('2024-01-02', periods=40)]
+    result = get_realized_volatility(_minute_sessions(dates, 0.015, seed=1), estimator=estimator, chunk_bars=1000)
+    assert len(result) == 40 and result.notna().all()
+    assert np.sqrt(np.mean(result ** 2) / 252) == pytest.approx(0.015, rel=0.05)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from lib.strategies import STRATEGY_COLUMNS, _short_legs, search_strategies
+
+
+def _chain(delta):
+    # Two expiries of puts and calls around a $100 stock, strikes 80..120
+    rows = []
+    for exp_days in (7, 14):
+        for strike in range(80, 125, 5):
+            for put_call in ('PUT', 'CALL'):
+                otm = strike < 100 if put_call == 'PUT' else strike > 100
+                mid = max(2.5 - abs(strike - 100) / 10, 0.1) + exp_days / 50
+                rows.append({'putCall': put_call, 'expDays': exp_days, 'expDate': pd.Timestamp('2024-01-05') + pd.Timedelta(days=exp_days),
+                             'strikePrice': float(strike), 'bid': mid - 0.05, 'ask': mid + 0.05,
+                             'delta': delta(strike, put_call) if otm else (0.6 if put_call == 'CALL' else -0.6)})
+    return pd.DataFrame(rows)
+
+
+def _delta(strike, put_call):
+    return (0.5 - abs(strike - 100) / 50) * (1 if put_call == 'CALL' else -1)
+
+
+def test_short_legs_excludes_unknown_delta():
+    chain = _chain(_delta)
+    chain.loc[(chain['putCall'] == 'PUT') & (chain['strikePrice'] == 90.0), 'delta'] = np.nan
+    legs = _short_legs(chain, 'PUT', 100.0, 0.3, 28)
+    assert not legs['sellable'][legs['strike'] == 90.0].any()
+    # |delta| 0.3 at 90 is within the limit once known; 85 (|delta| 0.2) is sellable either way
+    assert legs['sellable'][legs['strike'] == 85.0].all()
+
+
+def test_all_null_delta_column_has_no_short_legs():
+    chain = _chain(_delta)
+    chain['delta'] = pd.Series([None] * len(chain), dtype=object)
+    legs = _short_legs(chain, 'CALL', 100.0, 0.3, 28)
+    assert not legs['sellable'].any()
+    result = search_strategies(chain, 100.0, 0.25, 28)
+    assert result.empty and list(result.columns) == STRATEGY_COLUMNS
+
+
+def test_verticals_match_brute_force():
+    chain = _chain(_delta)
+    result = search_strategies(chain, 100.0, 0.25, 28, strategies=['Put Vertical', 'Call Vertical'], max_width=10.0, min_credit=0.05)
+    expected = set()
+    for (put_call, exp_days), leg in chain.groupby(['putCall', 'expDays']):
+        for _, short in leg.iterrows():
+            otm = short['strikePrice'] < 100 if put_call == 'PUT' else short['strikePrice'] > 100
+            if not (otm and short['bid'] > 0 and abs(short['delta']) <= 0.3):
+                continue
+            for _, long in leg.iterrows():
+                further = (0 < short['strikePrice'] - long['strikePrice'] <= 10) if put_call == 'PUT' else (0 < long['strikePrice'] - short['strikePrice'] <= 10)
+                credit = short['bid'] - long['ask']
+                if further and long['ask'] > 0 and 0.05 <= credit < abs(short['strikePrice'] - long['strikePrice']):
+                    expected.add((put_call, exp_days, short['strikePrice'], long['strikePrice'], round(credit, 9)))
+    found = {('PUT' if row.strategy == 'Put Vertical' else 'CALL', row.exp_days, row.short_put if row.strategy == 'Put Vertical' else row.short_call,
+              row.long_put if row.strategy == 'Put Vertical' else row.long_call, round(row.credit, 9)) for row in result.itertuples()}
+    assert expected and found == expected
+    assert result['return_on_risk'].is_monotonic_decreasing
+    assert ((result['pop'] >= 0) & (result['pop'] <= 1)).all()
+
+
+def test_condors_pair_verticals_of_one_expiry():
+    chain = _chain(_delta)
+    result = search_strategies(chain, 100.0, 0.25, 28, strategies=['Iron Condor'], max_width=10.0)
+    assert not result.empty
+    assert ((result['long_put'] < result['short_put']) & (result['short_put'] < result['short_call']) & (result['short_call'] < result['long_call'])).all()
+    assert (result['risk'] > 0).all()
+    np.testing.assert_allclose(result['breakeven_lo'], result['short_put'] - result['credit'])
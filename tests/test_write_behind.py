@@ -0,0 +1,62 @@
+import sys
+import threading
+
+from lib.write_behind import WriteBehindQueue, queue_from_env
+
+
+def test_batches_are_written_in_order():
+    written = []
+    queue = WriteBehindQueue({'rows': written.extend}, flush_interval=60)
+    for i in range(10):
+        assert queue.submit('rows', i)
+    assert queue.flush(timeout=5)
+    assert written == list(range(10))
+    queue.close()
+
+
+def test_fork_restart_starts_one_queue():
+    written = []
+    queue = WriteBehindQueue({'rows': written.extend}, flush_interval=60)
+    parent_thread = queue._thread
+    # As seen by a forked child: the queue was created under another pid
+    queue._pid = -1
+    barrier = threading.Barrier(8)
+    starts = []
+    start = queue._start
+
+    def counted_start():
+        starts.append(1)
+        start()
+    queue._start = counted_start
+
+    def submit(i):
+        barrier.wait()
+        queue.submit('rows', i)
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(starts) == 1
+    assert queue._thread is not parent_thread
+    assert queue.flush(timeout=5)
+    assert sorted(written) == list(range(8))
+    queue.close()
+
+
+def test_queue_from_env_builds_without_the_mysql_driver(tmp_path, monkeypatch):
+    # Block the driver and drop modules already imported with it, so the import chain runs as on a host without MySQL
+    monkeypatch.setitem(sys.modules, 'mysql', None)
+    monkeypatch.setitem(sys.modules, 'mysql.connector', None)
+    for name in ('lib.sql_connection', 'lib.chain_warehouse'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    monkeypatch.setenv('OPTIONS_WAREHOUSE_PATH', str(tmp_path / 'warehouse.db'))
+    queue = queue_from_env()
+    candles = [{'datetime': 1_700_000_000_000, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 100}]
+    assert queue.submit('candles', ('AAPL', 'day', candles))
+    assert queue.flush(timeout=5)
+    queue.close()
+    assert 'lib.sql_connection' not in sys.modules
+    from lib.chain_warehouse import OptionChainWarehouse
+    stored = OptionChainWarehouse(path=str(tmp_path / 'warehouse.db')).query_candles('AAPL', end_time=1_800_000_000_000)
+    assert stored['close'].tolist() == [1.5]
@@ -0,0 +1,6 @@
+# Production entry point: serve with a multi-worker WSGI server, e.g.
+#   gunicorn -c gunicorn.conf.py wsgi:server
+from dashboard import create_app, get_api_key
+
+app = create_app(get_api_key())
+server = app.server